@@ -0,0 +1,265 @@
+"""
+Suite de benchmarks de los endpoints calientes.
+
+Siembra una base SQLite con `seed_load`, ejecuta cada endpoint N veces con el
+test client de Flask (o contra un gunicorn local con --gunicorn) y reporta
+latencia p50/p95/p99, throughput y queries SQL por request.
+
+    $ python benchmarks/bench_endpoints.py --save benchmarks/baseline.json
+    $ python benchmarks/bench_endpoints.py --compare benchmarks/baseline.json --threshold 0.2
+
+Con --compare termina con codigo 1 si algun endpoint empeora su p95 mas del
+umbral o hace mas queries que en la linea base.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_endpoints.db")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + DB_PATH)
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+import stripe  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import event, select  # noqa: E402
+from app import app  # noqa: E402
+from api import routes  # noqa: E402
+from api.models import db, Usuario, Service, Appointment  # noqa: E402
+from api.passwords import hash_password  # noqa: E402
+from api.seed import SEED_PASSWORD, seed_load  # noqa: E402
+
+
+def seed(scale, reuse):
+    with app.app_context():
+        if reuse and os.path.exists(DB_PATH) and db.session.get(Usuario, 1):
+            return
+        db.drop_all()
+        db.create_all()
+        seed_load(scale=scale, log=lambda msg: print(msg))
+        db.session.add(Usuario(name="Admin", email="admin@bench.test", role="admin",
+                               is_admin=True, password=hash_password(SEED_PASSWORD)))
+        db.session.commit()
+
+
+def fixtures():
+    with app.app_context():
+        admin = db.session.execute(select(Usuario).where(Usuario.is_admin.is_(True))).scalar()
+        barber = db.session.execute(select(Usuario).where(Usuario.role == "barbero")).scalar()
+        client = db.session.execute(select(Usuario).where(Usuario.role == "cliente")).scalar()
+        service = db.session.execute(select(Service)).scalar()
+        # las citas nuevas van despues de la ultima del barbero (la base puede venir de otra corrida)
+        last = db.session.execute(select(db.func.max(Appointment.appointment_date))
+                                  .where(Appointment.barber_id == barber.user_id)).scalar()
+
+        def token(user):
+            return "Bearer " + create_access_token(
+                identity=str(user.user_id),
+                additional_claims={"role": user.role, "is_admin": bool(user.is_admin)},
+                expires_delta=timedelta(hours=2))
+
+        return {"admin": token(admin), "barber": token(barber), "client": token(client),
+                "barber_id": barber.user_id, "client_email": client.email,
+                "service_id": service.service_id,
+                "first_free_day": (last.replace(tzinfo=timezone.utc) if last else datetime.now(timezone.utc))
+                .replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=30)}
+
+
+def scenarios(fx):
+    """(nombre, funcion(i) -> (metodo, url, body, headers)) de cada endpoint."""
+    far_future = fx["first_free_day"]
+
+    def webhook(i):
+        event_body = {"id": f"evt_bench_{i}_{time.time_ns()}", "type": "checkout.session.completed",
+                      "data": {"object": {"id": f"cs_bench_{i}_{time.time_ns()}",
+                                          "metadata": {"kind": "direct", "amount": "12.00",
+                                                       "barber_id": str(fx["barber_id"])}}}}
+        return "POST", "/api/stripe/webhook", event_body, {"Stripe-Signature": "bench"}
+
+    return [
+        ("login", lambda i: ("POST", "/api/login",
+                             {"email": fx["client_email"], "password": SEED_PASSWORD}, {})),
+        ("services", lambda i: ("GET", "/api/services", None, {})),
+        ("barbers", lambda i: ("GET", "/api/barbers", None, {})),
+        ("appointments_mine", lambda i: ("GET", "/api/appointments/mine", None,
+                                         {"Authorization": fx["barber"]})),
+        ("create_appointment", lambda i: ("POST", "/api/appointments", {
+            "barber_id": fx["barber_id"], "service_id": fx["service_id"],
+            "appointment_date": (far_future + timedelta(days=i)).isoformat()},
+            {"Authorization": fx["client"]})),
+        ("admin_appointments", lambda i: ("GET", "/api/admin/appointments?limit=100", None,
+                                          {"Authorization": fx["admin"]})),
+        ("admin_payments", lambda i: ("GET", "/api/admin/payments?limit=100", None,
+                                      {"Authorization": fx["admin"]})),
+        ("stripe_webhook", webhook),
+    ]
+
+
+class FlaskClient:
+    """Test client + contador de queries SQL por request."""
+
+    def __init__(self):
+        self.client = app.test_client()
+        self.queries = 0
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._count)
+        # firma de Stripe simulada: el payload ya es el evento
+        routes.STRIPE_WEBHOOK_SECRET = "whsec_bench"
+        stripe.Webhook.construct_event = staticmethod(
+            lambda payload, sig_header, secret: json.loads(payload))
+
+    def _count(self, *args):
+        self.queries += 1
+
+    def request(self, method, url, body, headers):
+        res = self.client.open(url, method=method, json=body, headers=headers)
+        return res.status_code
+
+
+class HttpClient:
+    """Contra un gunicorn local (sin conteo de queries ni webhook simulado)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.queries = None
+
+    def request(self, method, url, body, headers):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + url, data=data, method=method,
+                                     headers={"Content-Type": "application/json", **headers})
+        try:
+            with urllib.request.urlopen(req) as res:
+                res.read()
+                return res.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def start_gunicorn(port, workers):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "wsgi", "--chdir", SRC,
+         "-b", f"127.0.0.1:{port}", "-w", str(workers)],
+        env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/services").read()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn no arranco")
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run(client, name, make_request, requests, warmup):
+    for i in range(warmup):
+        client.request(*make_request(-1 - i))
+    samples, statuses = [], set()
+    queries_before = client.queries
+    start = time.perf_counter()
+    for i in range(requests):
+        t0 = time.perf_counter()
+        statuses.add(client.request(*make_request(i)))
+        samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "queries_per_request": (round((client.queries - queries_before) / requests, 2)
+                                if client.queries is not None else None),
+        "statuses": sorted(statuses),
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+        if (current["queries_per_request"] is not None and base.get("queries_per_request") is not None
+                and current["queries_per_request"] > base["queries_per_request"]):
+            regressions.append(
+                f"{name}: queries {base['queries_per_request']} -> {current['queries_per_request']}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--scale", type=int, default=1)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--warmup", type=int, default=10)
+    ap.add_argument("--only", nargs="*", help="nombres de endpoints a ejecutar")
+    ap.add_argument("--reuse-db", action="store_true", help="no volver a sembrar si la base existe")
+    ap.add_argument("--gunicorn", action="store_true", help="medir contra gunicorn local")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--port", type=int, default=3101)
+    ap.add_argument("--save", metavar="JSON", help="guardar resultados como linea base")
+    ap.add_argument("--compare", metavar="JSON", help="comparar contra una linea base")
+    ap.add_argument("--threshold", type=float, default=0.2)
+    args = ap.parse_args()
+
+    seed(args.scale, args.reuse_db)
+    fx = fixtures()
+
+    proc = None
+    if args.gunicorn:
+        proc = start_gunicorn(args.port, args.workers)
+        client = HttpClient(f"http://127.0.0.1:{args.port}")
+    else:
+        client = FlaskClient()
+
+    results = {}
+    try:
+        for name, make_request in scenarios(fx):
+            if args.only and name not in args.only:
+                continue
+            if args.gunicorn and name == "stripe_webhook":
+                continue  # la firma simulada solo existe en el proceso del test client
+            results[name] = r = run(client, name, make_request, args.requests, args.warmup)
+            print(f"{name:20s} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+                  f"  {r['throughput_rps']:8.1f} req/s  queries {r['queries_per_request']}"
+                  f"  status {r['statuses']}")
+    finally:
+        if proc:
+            proc.terminate()
+
+    report = {
+        "meta": {"scale": args.scale, "requests": args.requests,
+                 "mode": "gunicorn" if args.gunicorn else "flask-test-client",
+                 "python": platform.python_version(), "machine": platform.node(),
+                 "date": datetime.now(timezone.utc).isoformat()},
+        "endpoints": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print("Linea base guardada en", args.save)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print("REGRESION", line)
+        if regressions:
+            sys.exit(1)
+        print("Sin regresiones (umbral", args.threshold, ")")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark de los indices de appointments/payments.
+
+Crea una base SQLite sembrada (~1M citas por defecto), ejecuta las consultas
+calientes de routes.py SIN indices y despues CON los indices de models.py,
+y muestra el plan (EXPLAIN) y la latencia de cada una.
+
+    $ python benchmarks/bench_indexes.py --appointments 1000000
+    $ python benchmarks/bench_indexes.py --url postgresql://... --appointments 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import create_engine, insert, select, union  # noqa: E402
+from sqlalchemy.schema import CreateIndex, DropIndex  # noqa: E402
+from api.models import db, Usuario, Service, Appointment, Payment  # noqa: E402
+
+BATCH = 50_000
+
+
+def seed(engine, n_appointments, seed_value):
+    rnd = random.Random(seed_value)
+    n_barbers = max(5, n_appointments // 5000)
+    n_clients = max(50, n_appointments // 50)
+    now = datetime.now(timezone.utc)
+
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        users = [{"user_id": i, "name": f"user{i}", "email": f"user{i}@bench.test",
+                  "password": "x", "role": "barbero" if i <= n_barbers else "cliente",
+                  "is_active": True, "created_at": now}
+                 for i in range(1, n_barbers + n_clients + 1)]
+        conn.execute(insert(Usuario), users)
+        conn.execute(insert(Service), [
+            {"service_id": i, "name": f"servicio{i}", "price": 10 + i, "duration_minutes": 30}
+            for i in range(1, 11)])
+
+        statuses = ("pendiente", "confirmada", "cancelada", "completada")
+        methods = ("efectivo", "tarjeta", "stripe")
+        appt_id = 0
+        while appt_id < n_appointments:
+            appts, pays = [], []
+            for _ in range(min(BATCH, n_appointments - appt_id)):
+                appt_id += 1
+                when = now - timedelta(minutes=30 * rnd.randrange(0, 3 * 365 * 24))
+                appts.append({
+                    "appointment_id": appt_id,
+                    "client_id": rnd.randint(n_barbers + 1, n_barbers + n_clients),
+                    "barber_id": rnd.randint(1, n_barbers),
+                    "service_id": rnd.randint(1, 10),
+                    "appointment_date": when,
+                    "status": rnd.choice(statuses),
+                })
+                if rnd.random() < 0.6:
+                    pays.append({
+                        "appointment_id": appt_id,
+                        "payer_user_id": appts[-1]["client_id"] if rnd.random() < 0.5 else None,
+                        "amount": 15,
+                        "method": rnd.choice(methods),
+                        "status": "pagado",
+                        "paid_at": when,
+                        "created_by_user_id": appts[-1]["barber_id"],
+                    })
+            conn.execute(insert(Appointment.__table__), appts)
+            conn.execute(insert(Payment.__table__), pays)
+    return n_barbers, n_clients
+
+
+def hot_queries(n_barbers, n_clients):
+    barber_id = n_barbers // 2 or 1
+    client_id = n_barbers + n_clients // 2
+    day = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0) - timedelta(days=30)
+    a, p = Appointment.__table__, Payment.__table__
+    return {
+        "my_appointments (barbero)": select(a).where(a.c.barber_id == barber_id)
+        .order_by(a.c.appointment_date.desc()),
+        "my_appointments (cliente)": select(a).where(a.c.client_id == client_id)
+        .order_by(a.c.appointment_date.desc()),
+        "admin_list_appointments ?status&date": select(a).where(
+            a.c.status == "pendiente",
+            a.c.appointment_date >= day,
+            a.c.appointment_date <= day + timedelta(days=1))
+        .order_by(a.c.appointment_date.desc()),
+        "admin_list_appointments (primera pagina)": select(a)
+        .order_by(a.c.appointment_date.desc()).limit(50),
+        "admin_recent_payments": select(p).order_by(p.c.paid_at.desc()).limit(10),
+        "payments_me": select(p).where(p.c.payment_id.in_(union(
+            select(p.c.payment_id).where(p.c.payer_user_id == client_id),
+            select(p.c.payment_id).join(a, p.c.appointment_id == a.c.appointment_id)
+            .where(a.c.client_id == client_id))))
+        .order_by(p.c.paid_at.desc()).limit(50),
+    }
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + str(compiled),
+            tuple(params[name] for name in compiled.positiontup)).fetchall()
+        return [row[-1] for row in rows]
+    return [row[0] for row in conn.exec_driver_sql("EXPLAIN " + str(compiled), params)]
+
+
+def timed(conn, stmt, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(stmt).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, stmt in queries.items():
+            results[name] = (explain(conn, stmt), timed(conn, stmt, repeat))
+    return results
+
+
+def indexes():
+    return [ix for table in (Appointment.__table__, Payment.__table__) for ix in table.indexes]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--url", default="sqlite:////tmp/bench_indexes.db")
+    ap.add_argument("--appointments", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    engine = create_engine(args.url)
+    start = time.perf_counter()
+    n_barbers, n_clients = seed(engine, args.appointments, args.seed)
+    print(f"Sembradas {args.appointments} citas en {time.perf_counter() - start:.1f}s")
+    queries = hot_queries(n_barbers, n_clients)
+
+    with engine.begin() as conn:
+        for ix in indexes():
+            conn.execute(DropIndex(ix, if_exists=True))
+        conn.exec_driver_sql("ANALYZE")
+    before = run(engine, queries, args.repeat)
+
+    with engine.begin() as conn:
+        for ix in indexes():
+            conn.execute(CreateIndex(ix))
+        conn.exec_driver_sql("ANALYZE")
+    after = run(engine, queries, args.repeat)
+
+    for name in queries:
+        plan_before, ms_before = before[name]
+        plan_after, ms_after = after[name]
+        print(f"\n== {name}")
+        print(f"   antes:   {ms_before:9.2f} ms  | " + " / ".join(plan_before))
+        print(f"   despues: {ms_after:9.2f} ms  | " + " / ".join(plan_after))
+
+
+if __name__ == "__main__":
+    main()
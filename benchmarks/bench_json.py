@@ -0,0 +1,120 @@
+"""
+Micro-benchmark de JSON: una lista de N citas (10k por defecto) con sus
+clientes, barberos y servicios anidados, como /api/admin/appointments.
+
+Compara, sin base de datos (objetos en memoria):
+  flask      proveedor por defecto de Flask + serialize() con float()/isoformat() a mano (antes)
+  stdlib     FastJSONProvider sin orjson + serialize() con valores crudos
+  orjson     FastJSONProvider con orjson (si esta instalado)
+y mide por separado serialize() (dicts) y la codificacion (app.json.response).
+
+    $ python benchmarks/bench_json.py --rows 10000 --repeat 7
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from api import json_provider  # noqa: E402
+from api.json_provider import FastJSONProvider  # noqa: E402
+from api.models import Appointment, Service, Usuario  # noqa: E402
+
+
+def make_appointments(rows, clients=40, barbers=5):
+    created = datetime(2024, 1, 1, 9, 30, 15, 123456, tzinfo=timezone.utc)
+    users = [Usuario(user_id=i, name=f"Usuario {i}", email=f"u{i}@example.com",
+                     role="barbero" if i <= barbers else "cliente", is_active=True,
+                     is_admin=False, phone="+58 412 5550000", address="Calle 1, Caracas",
+                     photo_url=f"https://example.com/photos/{i}.jpg",
+                     bio="Barbero con experiencia en cortes clasicos y degradados." if i <= barbers else None,
+                     specialties="fade, barba" if i <= barbers else None, created_at=created)
+             for i in range(1, barbers + clients + 1)]
+    services = [Service(service_id=i, name=f"Servicio {i}", price=Decimal("12.50") * i,
+                        duration_minutes=30) for i in range(1, 5)]
+    start = datetime(2025, 1, 1, 9, tzinfo=timezone.utc)
+    return [Appointment(appointment_id=i,
+                        client=users[barbers + i % clients], barber=users[i % barbers],
+                        service=services[i % len(services)],
+                        appointment_date=start + timedelta(minutes=30 * i),
+                        status="pendiente", notes=None)
+            for i in range(rows)]
+
+
+def legacy_serialize(a):
+    """serialize() como era antes: conversiones a mano en cada fila."""
+    def user(u):
+        return {"user_id": u.user_id, "name": u.name, "email": u.email, "role": u.role,
+                "is_active": u.is_active, "is_admin": bool(u.is_admin), "phone": u.phone,
+                "address": u.address, "photo_url": u.photo_url, "bio": u.bio,
+                "specialties": u.specialties, "created_at": u.created_at.isoformat()}
+    s = a.service
+    return {"appointment_id": a.appointment_id, "client": user(a.client), "barber": user(a.barber),
+            "service": {"service_id": s.service_id, "name": s.name, "price": float(s.price),
+                        "duration_minutes": s.duration_minutes},
+            "appointment_date": a.appointment_date.isoformat(), "status": a.status, "notes": a.notes}
+
+
+def measure(provider, serialize, appts, repeat):
+    ser, enc, size = [], [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        data = [serialize(a) for a in appts]
+        t1 = time.perf_counter()
+        body = provider.response({"ok": True, "data": data}).get_data()
+        t2 = time.perf_counter()
+        ser.append((t1 - t0) * 1000)
+        enc.append((t2 - t1) * 1000)
+        size = len(body)
+    return {"serialize": statistics.median(ser), "encode": statistics.median(enc),
+            "bytes": size, "body": body}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=7)
+    args = ap.parse_args()
+
+    app = Flask("bench_json")
+    appts = make_appointments(args.rows)
+    orjson = json_provider.orjson
+    cases = [("flask", DefaultJSONProvider(app), legacy_serialize, None),
+             ("stdlib", FastJSONProvider(app), Appointment.serialize, None)]
+    if orjson is not None:
+        cases.append(("orjson", FastJSONProvider(app), Appointment.serialize, orjson))
+    else:
+        print("orjson no esta instalado: solo flask y stdlib")
+
+    print(f"{args.rows} citas, mediana de {args.repeat} corridas\n")
+    print(f"{'caso':8} {'serialize ms':>13} {'encode ms':>10} {'total ms':>9} {'KB':>8} {'filas/s':>10}")
+    results = {}
+    with app.app_context():
+        for name, provider, serialize, encoder in cases:
+            json_provider.orjson = encoder
+            r = results[name] = measure(provider, serialize, appts, args.repeat)
+            total = r["serialize"] + r["encode"]
+            print(f"{name:8} {r['serialize']:13.1f} {r['encode']:10.1f} {total:9.1f} "
+                  f"{r['bytes'] / 1024:8.0f} {args.rows / total * 1000:10.0f}")
+        json_provider.orjson = orjson
+
+        # mismo contenido en los tres (el formato de bytes puede variar: espacios, \\u escapes)
+        parsed = {name: app.json.loads(r["body"]) for name, r in results.items()}
+        same = all(p == parsed["flask"] for p in parsed.values())
+        print("\nmismo JSON en todos los casos:", "si" if same else "NO")
+
+    base = results["flask"]["serialize"] + results["flask"]["encode"]
+    for name in results:
+        if name != "flask":
+            total = results[name]["serialize"] + results[name]["encode"]
+            print(f"{name}: {base / total:.2f}x respecto a flask")
+
+
+if __name__ == "__main__":
+    main()
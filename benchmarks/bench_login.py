@@ -0,0 +1,80 @@
+"""
+Benchmark de login: logins por segundo en un worker.
+
+Siembra usuarios en una base SQLite temporal y hace POST /api/login con el
+test client de Flask, con varios costos de bcrypt y varios hilos (como un
+worker gthread de gunicorn).
+
+    $ python benchmarks/bench_login.py --rounds 10 12 --threads 1 4 --requests 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_login.db")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + DB_PATH)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from app import app  # noqa: E402
+from api import passwords  # noqa: E402
+from api.models import db, Usuario  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+def seed(n_users, rounds):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        password_hash = passwords.hash_password(PASSWORD, rounds)
+        db.session.add_all([
+            Usuario(name=f"user{i}", email=f"user{i}@bench.test",
+                    password=password_hash, role="cliente")
+            for i in range(n_users)])
+        db.session.commit()
+
+
+def login(client, i, n_users):
+    res = client.post("/api/login", json={
+        "email": f"user{i % n_users}@bench.test", "password": PASSWORD})
+    assert res.status_code == 200, res.get_json()
+
+
+def run(requests, threads, n_users):
+    def worker(chunk):
+        client = app.test_client()
+        for i in chunk:
+            login(client, i, n_users)
+
+    chunks = [range(t, requests, threads) for t in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, chunks))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--executor", choices=["inline", "thread", "process"],
+                    default=passwords.HASH_EXECUTOR)
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--users", type=int, default=50)
+    args = ap.parse_args()
+
+    passwords.HASH_EXECUTOR = args.executor
+    print(f"executor={args.executor} pool={passwords.HASH_WORKERS}")
+    for rounds in args.rounds:
+        passwords.BCRYPT_ROUNDS = rounds
+        seed(args.users, rounds)
+        for threads in args.threads:
+            rate = run(args.requests, threads, args.users)
+            print(f"rounds={rounds:2d} threads={threads:2d}  {rate:8.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Stress del pool de conexiones sobre bases SQLite en archivo.
+
+N hilos (como un worker gthread) sacan una conexion, hacen una lectura y la
+retienen un rato (simula el trabajo del request). Se mide el throughput, la
+espera para obtener conexion (p50/p95/max), los timeouts y cuantas
+conexiones nuevas abrio el pool con cada configuracion.
+
+    $ python benchmarks/bench_pool.py --threads 32 --pool-size 5 10 --max-overflow 0 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.exc import TimeoutError as PoolTimeout  # noqa: E402
+from api.database import engine_options_from_env  # noqa: E402
+
+
+def make_db(path, rows):
+    engine = create_engine("sqlite:///" + path)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS items"))
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (name) VALUES (:name)"),
+                     [{"name": f"item {i}"} for i in range(rows)])
+    engine.dispose()
+
+
+def run(url, options, threads, requests, hold_ms):
+    engine = create_engine(url, **options)
+    connects = [0]
+    event.listen(engine.pool, "connect", lambda *a: connects.__setitem__(0, connects[0] + 1))
+    waits, timeouts = [], [0]
+    lock = threading.Lock()
+
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                waited = time.perf_counter() - t0
+                conn.execute(text("SELECT name FROM items WHERE id = :id"), {"id": i % 1000 + 1}).all()
+                time.sleep(hold_ms / 1000)
+        except PoolTimeout:
+            with lock:
+                timeouts[0] += 1
+            return
+        with lock:
+            waits.append(waited * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+
+    waits.sort()
+    return {
+        "rps": requests / elapsed,
+        "wait_p50": statistics.median(waits) if waits else 0,
+        "wait_p95": waits[int(len(waits) * 0.95) - 1] if waits else 0,
+        "wait_max": waits[-1] if waits else 0,
+        "timeouts": timeouts[0],
+        "connects": connects[0],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--hold-ms", type=float, default=5, help="tiempo con la conexion tomada")
+    ap.add_argument("--pool-size", type=int, nargs="+", default=[5, 10])
+    ap.add_argument("--max-overflow", type=int, nargs="+", default=[0, 10])
+    ap.add_argument("--pool-timeout", type=int, default=2)
+    ap.add_argument("--rows", type=int, default=1000)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), "bench_pool.db")
+    make_db(path, args.rows)
+    url = "sqlite:///" + path
+    print(f"{args.threads} hilos, {args.requests} requests, {args.hold_ms}ms con la conexion")
+    for pool_size in args.pool_size:
+        for max_overflow in args.max_overflow:
+            os.environ.update(DB_POOL_SIZE=str(pool_size), DB_MAX_OVERFLOW=str(max_overflow),
+                              DB_POOL_TIMEOUT=str(args.pool_timeout))
+            r = run(url, engine_options_from_env(url), args.threads, args.requests, args.hold_ms)
+            print(f"pool_size={pool_size:3d} max_overflow={max_overflow:3d}  {r['rps']:8.1f} req/s  "
+                  f"espera p50 {r['wait_p50']:7.2f} p95 {r['wait_p95']:7.2f} max {r['wait_max']:7.2f} ms  "
+                  f"timeouts {r['timeouts']}  conexiones {r['connects']}")
+
+
+if __name__ == "__main__":
+    main()
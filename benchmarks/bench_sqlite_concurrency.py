@@ -0,0 +1,129 @@
+"""
+Concurrencia de SQLite con y sin el modo produccion (api.database.tune_sqlite).
+
+Lanza procesos escritores (reservas: comprueba el hueco e inserta, en una
+transaccion) y procesos lectores (listados) contra el mismo archivo, como
+varios workers de gunicorn. Reporta escrituras por segundo, errores
+"database is locked" y latencia de lectura p50/p95/max.
+
+    $ python benchmarks/bench_sqlite_concurrency.py --writers 4 --readers 4 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from api.database import engine_options_from_env, tune_sqlite  # noqa: E402
+from api.utils import APIException  # noqa: E402
+
+PATH = os.path.join(tempfile.gettempdir(), "bench_sqlite_concurrency.db")
+URL = "sqlite:///" + PATH
+
+
+def make_engine(tuned):
+    engine = create_engine(URL, **engine_options_from_env(URL))
+    if tuned:
+        tune_sqlite(engine, PATH)
+    return engine
+
+
+def prepare(rows):
+    for suffix in ("", "-wal", "-shm", "-writer.lock"):
+        if os.path.exists(PATH + suffix):
+            os.remove(PATH + suffix)
+    engine = create_engine(URL)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bookings (id INTEGER PRIMARY KEY, barber_id INTEGER, "
+                          "slot INTEGER, status TEXT)"))
+        conn.execute(text("CREATE INDEX ix_bookings_barber_slot ON bookings (barber_id, slot)"))
+        conn.execute(text("INSERT INTO bookings (barber_id, slot, status) VALUES (:b, :s, 'pendiente')"),
+                     [{"b": i % 20, "s": i} for i in range(rows)])
+    engine.dispose()
+
+
+def writer(tuned, seconds, seed, out):
+    engine = make_engine(tuned)
+    rnd = random.Random(seed)
+    writes = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        barber, slot = rnd.randrange(20), rnd.randrange(10**9)
+        try:
+            with engine.begin() as conn:
+                taken = conn.execute(text("SELECT 1 FROM bookings WHERE barber_id = :b AND slot = :s"),
+                                     {"b": barber, "s": slot}).first()
+                if not taken:
+                    conn.execute(text("INSERT INTO bookings (barber_id, slot, status) "
+                                      "VALUES (:b, :s, 'pendiente')"), {"b": barber, "s": slot})
+                    conn.execute(text("UPDATE bookings SET status = 'confirmada' "
+                                      "WHERE barber_id = :b AND slot = :s"), {"b": barber, "s": slot})
+            writes += 1
+        except (OperationalError, APIException):
+            errors += 1
+    out.put(("writer", writes, errors, []))
+
+
+def reader(tuned, seconds, seed, out):
+    engine = make_engine(tuned)
+    rnd = random.Random(seed)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        t0 = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT * FROM bookings WHERE barber_id = :b "
+                                  "ORDER BY slot DESC LIMIT 100"), {"b": rnd.randrange(20)}).all()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        except OperationalError:
+            errors += 1
+    out.put(("reader", len(latencies), errors, latencies))
+
+
+def run(tuned, writers, readers, seconds, rows):
+    prepare(rows)
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=writer, args=(tuned, seconds, i, out)) for i in range(writers)]
+    procs += [ctx.Process(target=reader, args=(tuned, seconds, 100 + i, out)) for i in range(readers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    writes = sum(r[1] for r in results if r[0] == "writer")
+    write_errors = sum(r[2] for r in results if r[0] == "writer")
+    read_errors = sum(r[2] for r in results if r[0] == "reader")
+    latencies = sorted(l for r in results if r[0] == "reader" for l in r[3])
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{'tuned' if tuned else 'default':8s} {writes / seconds:8.1f} writes/s  errores escritura {write_errors:5d}  "
+          f"lecturas {len(latencies):7d} (errores {read_errors})  "
+          f"lectura p50 {statistics.median(latencies) if latencies else 0:6.2f} p95 {p95:6.2f} "
+          f"max {latencies[-1] if latencies else 0:7.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--rows", type=int, default=50000)
+    ap.add_argument("--mode", choices=("both", "default", "tuned"), default="both")
+    args = ap.parse_args()
+
+    for tuned in (False, True):
+        if args.mode == "both" or args.mode == ("tuned" if tuned else "default"):
+            run(tuned, args.writers, args.readers, args.seconds, args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""add barber_day_agenda
+
+Revision ID: b91e4c7d2a06
+Revises: 5f2d8a6c3e97
+Create Date: 2026-10-18 19:12:53.381042
+
+"""
+import math
+import os
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b91e4c7d2a06'
+down_revision = '5f2d8a6c3e97'
+branch_labels = None
+depends_on = None
+
+
+def _backfill(agenda):
+    """Llena la tabla con las citas que ya existen (mismo calculo que rebuild_agenda)."""
+    zone = ZoneInfo(os.getenv("SHOP_TIMEZONE", "UTC"))
+    slot_minutes = int(os.getenv("AGENDA_SLOT_MINUTES", 15))
+    slots_per_day = 24 * 60 // slot_minutes
+    appointments = sa.table('appointments', sa.column('appointment_id', sa.Integer),
+                            sa.column('barber_id', sa.Integer), sa.column('service_id', sa.Integer),
+                            sa.column('appointment_date', sa.DateTime(timezone=True)),
+                            sa.column('status', sa.String))
+    services = sa.table('services', sa.column('service_id', sa.Integer),
+                        sa.column('duration_minutes', sa.Integer))
+    q = (sa.select(appointments.c.appointment_id, appointments.c.barber_id,
+                   appointments.c.appointment_date, services.c.duration_minutes)
+         .select_from(appointments.join(
+             services, appointments.c.service_id == services.c.service_id))
+         .where(appointments.c.status != 'cancelada')
+         .order_by(appointments.c.appointment_date))
+
+    def wall_minutes(dt, day):
+        # minutos de reloj local desde las 00:00 de day, acotados a [0, 24h]
+        local = dt.astimezone(zone)
+        if local.date() != day:
+            return 0 if local.date() < day else 24 * 60
+        return local.hour * 60 + local.minute + (local.second + local.microsecond / 1e6) / 60
+
+    # dias locales de la barberia (SHOP_TIMEZONE)
+    days = defaultdict(lambda: (bytearray(-(-slots_per_day // 8)), []))
+    for appointment_id, barber_id, start, minutes in op.get_bind().execute(q):
+        if start.tzinfo is None:  # SQLite: sin tz, es UTC
+            start = start.replace(tzinfo=timezone.utc)
+        end = start + timedelta(minutes=minutes)
+        day = start.astimezone(zone).date()
+        days[(barber_id, day)][1].append(appointment_id)
+        while datetime.combine(day, time(0), tzinfo=zone) < end:
+            bitmap = days[(barber_id, day)][0]
+            first = int(wall_minutes(start, day) // slot_minutes)
+            last = min(slots_per_day, math.ceil(wall_minutes(end, day) / slot_minutes))
+            for slot in range(first, last):
+                bitmap[slot // 8] |= 0x80 >> (slot % 8)
+            day += timedelta(days=1)
+
+    rows = [{"barber_id": barber_id, "day": day, "slots": bytes(bitmap), "appointment_ids": ids}
+            for (barber_id, day), (bitmap, ids) in days.items() if any(bitmap)]
+    for i in range(0, len(rows), 5000):
+        op.bulk_insert(agenda, rows[i:i + 5000])
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    agenda = op.create_table('barber_day_agenda',
+    sa.Column('barber_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('slots', sa.LargeBinary(), nullable=False),
+    sa.Column('appointment_ids', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['barber_id'], ['usuarios.user_id'], name='fk_barber_day_agenda_barber_id'),
+    sa.PrimaryKeyConstraint('barber_id', 'day')
+    )
+    # ### end Alembic commands ###
+    _backfill(agenda)
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('barber_day_agenda')
+    # ### end Alembic commands ###
@@ -0,0 +1,51 @@
+"""add indexes for appointment and payment hot queries
+
+Revision ID: c3f1a9d27b64
+Revises: 5a630b9671fa
+Create Date: 2026-10-18 10:12:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1a9d27b64'
+down_revision = '5a630b9671fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('appointments', schema=None) as batch_op:
+        batch_op.create_index('ix_appointments_barber_id_appointment_date',
+                              ['barber_id', 'appointment_date'])
+        batch_op.create_index('ix_appointments_client_id_appointment_date',
+                              ['client_id', 'appointment_date'])
+        batch_op.create_index('ix_appointments_status_appointment_date',
+                              ['status', 'appointment_date'])
+        batch_op.create_index('ix_appointments_appointment_date',
+                              ['appointment_date'])
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_paid_at', ['paid_at'])
+        batch_op.create_index('ix_payments_status_paid_at',
+                              ['status', 'paid_at'])
+        batch_op.create_index('ix_payments_payer_user_id_paid_at',
+                              ['payer_user_id', 'paid_at'])
+        batch_op.create_index('ix_payments_appointment_id',
+                              ['appointment_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_appointment_id')
+        batch_op.drop_index('ix_payments_payer_user_id_paid_at')
+        batch_op.drop_index('ix_payments_status_paid_at')
+        batch_op.drop_index('ix_payments_paid_at')
+
+    with op.batch_alter_table('appointments', schema=None) as batch_op:
+        batch_op.drop_index('ix_appointments_appointment_date')
+        batch_op.drop_index('ix_appointments_status_appointment_date')
+        batch_op.drop_index('ix_appointments_client_id_appointment_date')
+        batch_op.drop_index('ix_appointments_barber_id_appointment_date')
@@ -7,4 +7,7 @@ npm run build
 
 pipenv install
 
+# .br/.gz de dist/ para servirlos sin comprimir en cada request
+pipenv run precompress
+
 pipenv run upgrade
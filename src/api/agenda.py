@@ -0,0 +1,219 @@
+"""
+Agenda compacta por barbero y dia (barber_day_agenda).
+
+Cada dia local de la barberia (SHOP_TIMEZONE, como los reportes de ventas)
+es un bitmap de 24h de reloj en franjas de AGENDA_SLOT_MINUTES desde las
+00:00 locales (15 min -> 96 bits = 12 bytes) mas la lista de ids de las
+citas activas que empiezan ese dia. Una semana son unos 100 bytes de bitmaps.
+
+Se mantiene en la misma transaccion que las citas: un after_flush recalcula
+los dias (barbero, dia) que toco el flush, incluidos los de las citas futuras
+de un servicio al que le cambia la duracion. Los INSERT por Core (reserva
+masiva, seed-load) no pasan por el hook: llaman a refresh_days/rebuild_agenda.
+"""
+import base64
+import math
+import os
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import delete, event, inspect, select
+from sqlalchemy.orm import Session
+from api.availability import FREE_STATUSES, to_utc
+from api.database import dialect_insert
+from api.models import db, Appointment, Service, BarberDayAgenda
+from api.sales import shop_zone
+
+AGENDA_SLOT_MINUTES = int(os.getenv("AGENDA_SLOT_MINUTES", 15))
+SLOTS_PER_DAY = 24 * 60 // AGENDA_SLOT_MINUTES
+AGENDA_FIELDS = ("barber_id", "appointment_date", "status", "service_id")
+MAX_AGENDA_DAYS = 62
+
+
+def _day_start(day):
+    """00:00 locales del dia, en UTC."""
+    return datetime.combine(day, time(0), tzinfo=shop_zone()).astimezone(timezone.utc)
+
+
+def local_day(dt):
+    """Dia local de la barberia de una fecha de la base."""
+    return to_utc(dt).astimezone(shop_zone()).date()
+
+
+def _wall_minutes(dt, day):
+    """Minutos de reloj local desde las 00:00 de day, acotados a [0, 24h]."""
+    local = dt.astimezone(shop_zone())
+    if local.date() != day:
+        return 0 if local.date() < day else 24 * 60
+    return local.hour * 60 + local.minute + (local.second + local.microsecond / 1e6) / 60
+
+
+def mark(bitmap, day, start, end):
+    """Marca en el bitmap del dia las franjas que toca [start, end)."""
+    first = int(_wall_minutes(start, day) // AGENDA_SLOT_MINUTES)
+    last = min(SLOTS_PER_DAY, math.ceil(_wall_minutes(end, day) / AGENDA_SLOT_MINUTES))
+    for slot in range(first, last):
+        bitmap[slot // 8] |= 0x80 >> (slot % 8)
+
+
+def _longest_service(conn):
+    minutes = conn.execute(select(db.func.max(Service.duration_minutes))).scalar()
+    return timedelta(minutes=minutes or 0)
+
+
+def compute_days(conn, barber_id, days):
+    """{dia: (bitmap, [appointment_id, ...])} de los dias pedidos, leyendo la base."""
+    days = sorted(set(days))
+    if not days:
+        return {}
+    q = (
+        select(Appointment.appointment_id, Appointment.appointment_date,
+               Service.duration_minutes)
+        .join(Service, Appointment.service_id == Service.service_id)
+        .where(Appointment.barber_id == barber_id,
+               Appointment.status.not_in(FREE_STATUSES),
+               # las que empiezan el dia anterior pueden terminar en el primero
+               Appointment.appointment_date >= _day_start(days[0]) - _longest_service(conn),
+               Appointment.appointment_date < _day_start(days[-1]) + timedelta(days=1))
+        .order_by(Appointment.appointment_date)
+    )
+    wanted = set(days)
+    result = {day: (bytearray(-(-SLOTS_PER_DAY // 8)), []) for day in days}
+    for appointment_id, appointment_date, duration_minutes in conn.execute(q):
+        start = to_utc(appointment_date)
+        end = start + timedelta(minutes=duration_minutes)
+        day = local_day(start)
+        if day in wanted:
+            result[day][1].append(appointment_id)
+        while _day_start(day) < end:
+            if day in wanted:
+                mark(result[day][0], day, start, end)
+            day += timedelta(days=1)
+    return result
+
+
+def refresh_days(conn, barber_id, days):
+    """Recalcula y guarda (upsert) los dias; los que quedan vacios se borran."""
+    table = BarberDayAgenda.__table__
+    computed = compute_days(conn, barber_id, days)
+    empty = [day for day, (_, ids) in computed.items() if not any(computed[day][0])]
+    rows = [{"barber_id": barber_id, "day": day, "slots": bytes(bitmap), "appointment_ids": ids}
+            for day, (bitmap, ids) in computed.items() if day not in empty]
+    if empty:
+        conn.execute(delete(table).where(table.c.barber_id == barber_id, table.c.day.in_(empty)))
+    if not rows:
+        return
+    insert = dialect_insert(conn)
+    if insert is not None:
+        stmt = insert(table)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.barber_id, table.c.day],
+            set_={"slots": stmt.excluded.slots, "appointment_ids": stmt.excluded.appointment_ids}), rows)
+    else:
+        conn.execute(delete(table).where(table.c.barber_id == barber_id,
+                                         table.c.day.in_([row["day"] for row in rows])))
+        conn.execute(table.insert(), rows)
+
+
+def _touched_days(session):
+    """{barber_id: {dias}} que cambian con este flush (valores nuevos y previos)."""
+    touched = defaultdict(set)
+    longest = None
+
+    def add(barber_id, appointment_date):
+        nonlocal longest
+        if barber_id is None or appointment_date is None:
+            return
+        start = to_utc(appointment_date)
+        day = local_day(start)
+        touched[barber_id].add(day)
+        if longest is None:
+            longest = _longest_service(session.connection())
+        # si puede pasar de medianoche tambien cambia el dia siguiente
+        if local_day(start + longest) != day:
+            touched[barber_id].add(day + timedelta(days=1))
+
+    def values(appt, old):
+        state = inspect(appt)
+        out = {}
+        for field in ("barber_id", "appointment_date"):
+            history = state.attrs[field].history
+            out[field] = history.deleted[0] if old and history.deleted else getattr(appt, field)
+        return out
+
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            add(obj.barber_id, obj.appointment_date)
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and session.is_modified(obj):
+            state = inspect(obj)
+            if any(state.attrs[f].history.has_changes() for f in AGENDA_FIELDS):
+                old, new = values(obj, True), values(obj, False)
+                add(old["barber_id"], old["appointment_date"])
+                add(new["barber_id"], new["appointment_date"])
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            old = values(obj, True)
+            add(old["barber_id"], old["appointment_date"])
+
+    # otra duracion cambia los bitmaps de las citas futuras del servicio
+    changed = [obj.service_id for obj in session.dirty
+               if isinstance(obj, Service) and session.is_modified(obj)
+               and inspect(obj).attrs["duration_minutes"].history.has_changes()]
+    if changed:
+        today = _day_start(local_day(datetime.now(timezone.utc)))
+        q = (select(Appointment.barber_id, Appointment.appointment_date)
+             .where(Appointment.service_id.in_(changed),
+                    Appointment.appointment_date >= today,
+                    Appointment.status.not_in(FREE_STATUSES)))
+        for barber_id, appointment_date in session.connection().execute(q):
+            day = local_day(appointment_date)
+            # la duracion anterior pudo pasar de medianoche aunque la nueva no
+            touched[barber_id].update((day, day + timedelta(days=1)))
+    return touched
+
+
+def _after_flush(session, flush_context):
+    if not any(isinstance(obj, (Appointment, Service))
+               for obj in (*session.new, *session.dirty, *session.deleted)):
+        return
+    conn = session.connection()
+    for barber_id, days in _touched_days(session).items():
+        refresh_days(conn, barber_id, days)
+
+
+def setup_agenda(app):
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+
+def rebuild_agenda(batch_days=31):
+    """Recalcula barber_day_agenda desde appointments (por barbero, en bloques de dias)."""
+    conn = db.session.connection()
+    conn.execute(delete(BarberDayAgenda.__table__))
+    ranges = conn.execute(
+        select(Appointment.barber_id, db.func.min(Appointment.appointment_date),
+               db.func.max(Appointment.appointment_date))
+        .group_by(Appointment.barber_id)).all()
+    for barber_id, first, last in ranges:
+        day, last_day = local_day(first), local_day(last) + timedelta(days=1)
+        while day <= last_day:
+            block = [day + timedelta(days=i) for i in range(batch_days)
+                     if day + timedelta(days=i) <= last_day]
+            refresh_days(conn, barber_id, block)
+            day += timedelta(days=batch_days)
+    db.session.commit()
+    return len(ranges)
+
+
+def load_agenda(barber_id, day_from, day_to):
+    """Dias con citas en [day_from, day_to], con Core (sin ORM); el bitmap va en base64."""
+    table = BarberDayAgenda.__table__
+    rows = db.session.execute(
+        select(table.c.day, table.c.slots, table.c.appointment_ids)
+        .where(table.c.barber_id == barber_id, table.c.day >= day_from, table.c.day <= day_to)
+        .order_by(table.c.day)).all()
+    return [{"day": day,
+             "slots": base64.b64encode(slots).decode("ascii"),
+             "appointment_ids": appointment_ids}
+            for day, slots, appointment_ids in rows]
@@ -1,26 +1,60 @@
 # src/api/auth.py
 
+import os
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask import jsonify, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from sqlalchemy import select
 from api.models import db, Usuario
+from api.cache import backend
+
+# segundos que se cachea is_active/is_admin de cada usuario (desactivar a alguien tarda como maximo esto)
+AUTH_STATUS_TTL = int(os.getenv("AUTH_STATUS_TTL", 30))
+
+
+def jwt_user_id():
+    """user_id del JWT de la request (sin ir a la base), o None."""
+    try:
+        return int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return None
 
 
 def get_current_user():
     """
     Devuelve el usuario autenticado según el JWT.
     En tu login usas identity=str(user_id), por eso convertimos a int.
+    Se busca una sola vez por request (queda en flask.g).
     """
-    user_id = get_jwt_identity()
-    if not user_id:
-        return None
+    if "current_user" in g:
+        return g.current_user
 
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        return None
+    user = None
+    user_id = jwt_user_id()
+    if user_id:
+        user = db.session.get(Usuario, user_id)
+        # un usuario desactivado deja de estar autenticado
+        if user and user.is_active is False:
+            user = None
 
-    return db.session.get(Usuario, user_id)
+    g.current_user = user
+    return user
+
+
+def user_status(user_id):
+    """
+    (is_active, is_admin) del usuario, cacheado AUTH_STATUS_TTL segundos.
+    Las rutas que cambian usuarios llaman a invalidate("auth").
+    """
+    key = f"auth:{backend.generation('auth')}:{user_id}"
+    status = backend.get(key)
+    if status is None:
+        row = db.session.execute(
+            select(Usuario.is_active, Usuario.is_admin)
+            .where(Usuario.user_id == user_id)).first()
+        status = (bool(row.is_active), bool(row.is_admin)) if row else (False, False)
+        backend.set(key, status, AUTH_STATUS_TTL)
+    return status
 
 
 def require_roles(*allowed_roles):
@@ -29,17 +63,29 @@ def require_roles(*allowed_roles):
     Ejemplo:
         @require_roles("admin")
         def ruta_admin(): ...
+    Autoriza con los claims del token (role, is_admin) sin cargar el usuario;
+    solo consulta el estado activo/admin cacheado.
     """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             verify_jwt_in_request()  # valida que exista un JWT válido
-            user = get_current_user()
+            claims = get_jwt()
 
-            if not user:
-                return jsonify({"ok": False, "message": "Usuario no autenticado"}), 401
+            if "is_admin" in claims:
+                user_id = jwt_user_id()
+                is_active, is_admin = user_status(user_id) if user_id else (False, False)
+                if not is_active:
+                    return jsonify({"ok": False, "message": "Usuario no autenticado"}), 401
+                is_admin = is_admin and bool(claims.get("is_admin"))
+            else:
+                # tokens sin claims: camino lento, leemos el usuario
+                user = get_current_user()
+                if not user:
+                    return jsonify({"ok": False, "message": "Usuario no autenticado"}), 401
+                is_admin = bool(user.is_admin)
 
-            if not user.is_admin:
+            if not is_admin:
             #if user.role not in allowed_roles:
                 return jsonify({
                     "ok": False,
@@ -49,7 +95,3 @@ def require_roles(*allowed_roles):
             return fn(*args, **kwargs)
         return wrapper
     return decorator
-
-
-
-
@@ -0,0 +1,227 @@
+"""
+Motor de disponibilidad de barberos.
+
+Cada barbero tiene un indice de intervalos ordenado por inicio
+(inicio = appointment_date, fin = inicio + Service.duration_minutes).
+Con bisect encontramos las citas que tocan una ventana en O(log n + k)
+y con un barrido sacamos los huecos libres del dia.
+El horario (SHOP_OPEN_HOUR a SHOP_CLOSE_HOUR) es hora local de la barberia
+(SHOP_TIMEZONE, la misma zona de los reportes de ventas); el indice es UTC.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time as day_time, timedelta, timezone
+
+from sqlalchemy import select, update
+from api.models import db, Appointment, Service, Usuario
+from api.sales import shop_zone
+
+SHOP_OPEN_HOUR = int(os.getenv("SHOP_OPEN_HOUR", 9))
+SHOP_CLOSE_HOUR = int(os.getenv("SHOP_CLOSE_HOUR", 19))
+SLOT_STEP_MINUTES = int(os.getenv("AVAILABILITY_STEP_MINUTES", 15))
+# duracion / paso maximos que se aceptan: el horario de un dia
+SHOP_WINDOW_MINUTES = (SHOP_CLOSE_HOUR - SHOP_OPEN_HOUR) * 60
+# cada cuanto se recarga el indice desde la base (citas creadas por otros workers)
+INDEX_TTL_SECONDS = int(os.getenv("AVAILABILITY_INDEX_TTL", 30))
+
+# estados que NO ocupan la agenda del barbero
+FREE_STATUSES = ("cancelada",)
+
+
+def to_utc(dt):
+    """SQLite devuelve fechas sin tz; las tratamos como UTC."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+class BarberIntervalIndex:
+    """
+    Intervalos (inicio, fin, appointment_id) ordenados por inicio.
+
+    Copy-on-write: add/remove arman listas nuevas y cambian la tupla
+    _snapshot de una vez, asi un lector concurrente (otro hilo) siempre ve
+    un estado completo sin tomar el lock.
+    """
+
+    def __init__(self, intervals=()):
+        items = sorted(intervals)
+        longest = max((end - start for start, end, _ in items), default=timedelta(0))
+        # (items, starts, duracion maxima)
+        self._snapshot = (items, [item[0] for item in items], longest)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._snapshot[0])
+
+    def add(self, start, end, appointment_id):
+        items, starts, longest = self._snapshot
+        i = bisect_right(starts, start)
+        self._snapshot = (items[:i] + [(start, end, appointment_id)] + items[i:],
+                          starts[:i] + [start] + starts[i:],
+                          max(longest, end - start))
+
+    def remove(self, start, appointment_id):
+        items, starts, longest = self._snapshot
+        i = bisect_left(starts, start)
+        while i < len(starts) and starts[i] == start:
+            if items[i][2] == appointment_id:
+                self._snapshot = (items[:i] + items[i + 1:], starts[:i] + starts[i + 1:], longest)
+                return True
+            i += 1
+        return False
+
+    def overlapping(self, start, end):
+        """Intervalos que se solapan con [start, end)."""
+        items, starts, longest = self._snapshot
+        # ningun intervalo que empiece antes de start - longest puede llegar a start
+        lo = bisect_left(starts, start - longest)
+        hi = bisect_left(starts, end)
+        return [item for item in items[lo:hi] if item[1] > start]
+
+    def free_slots(self, window_start, window_end, duration, step):
+        """Barrido sobre las citas de la ventana: devuelve huecos (inicio, fin)."""
+        if step <= timedelta(0) or duration <= timedelta(0):
+            raise ValueError("duration y step deben ser positivos")
+        slots = []
+        cursor = window_start
+        busy = self.overlapping(window_start, window_end)
+        # centinela para cerrar el ultimo hueco
+        busy.append((window_end, window_end, None))
+        for busy_start, busy_end, _ in busy:
+            gap_end = min(busy_start, window_end)
+            while cursor + duration <= gap_end:
+                slots.append((cursor, cursor + duration))
+                cursor += step
+            if busy_end > cursor:
+                cursor = _align(busy_end, window_start, step)
+        return slots
+
+
+def _align(dt, origin, step):
+    """Redondea dt hacia arriba a la rejilla origin + n * step."""
+    steps = -(-(dt - origin) // step)
+    return origin + steps * step
+
+
+def load_index(barber_id, since=None, until=None):
+    """Construye el indice del barbero desde la base (solo citas activas)."""
+    q = (
+        select(Appointment.appointment_id, Appointment.appointment_date,
+               Service.duration_minutes)
+        .join(Service, Appointment.service_id == Service.service_id)
+        .where(Appointment.barber_id == barber_id,
+               Appointment.status.not_in(FREE_STATUSES))
+    )
+    if since is not None:
+        q = q.where(Appointment.appointment_date >= since)
+    if until is not None:
+        q = q.where(Appointment.appointment_date < until)
+
+    intervals = []
+    for appointment_id, appointment_date, duration_minutes in db.session.execute(q):
+        start = to_utc(appointment_date)
+        intervals.append(
+            (start, start + timedelta(minutes=duration_minutes), appointment_id))
+    return BarberIntervalIndex(intervals)
+
+
+def max_service_duration():
+    longest = db.session.execute(
+        select(db.func.max(Service.duration_minutes))).scalar()
+    return timedelta(minutes=longest or 0)
+
+
+def load_window(barber_id, start, end):
+    """Indice fresco (leido de la base) con todo lo que puede chocar con [start, end)."""
+    start, end = to_utc(start), to_utc(end)
+    return load_index(barber_id, since=start - max_service_duration(), until=end)
+
+
+def lock_barber(barber_id):
+    """
+    Serializa las reservas del barbero hasta el commit: UPDATE sin cambios de
+    su fila (PostgreSQL la bloquea; SQLite toma el lock de escritura), asi el
+    find_conflicts siguiente y el INSERT son atomicos frente a otra reserva.
+    """
+    db.session.execute(
+        update(Usuario).where(Usuario.user_id == barber_id)
+        .values(is_active=Usuario.is_active))
+
+
+def find_conflicts(barber_id, start, end):
+    """Citas activas del barbero que chocan con [start, end), leidas de la base."""
+    return load_window(barber_id, start, end).overlapping(to_utc(start), to_utc(end))
+
+
+# ==========
+# Registro de indices en memoria (uno por barbero y proceso)
+# ==========
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _index_horizon():
+    # solo indexamos desde ayer: el historico no afecta a la disponibilidad
+    return datetime.now(timezone.utc) - timedelta(days=1)
+
+
+def get_index(barber_id):
+    index = _indexes.get(barber_id)
+    if index is None or time.monotonic() - index.loaded_at > INDEX_TTL_SECONDS:
+        index = load_index(barber_id, since=_index_horizon())
+        with _lock:
+            _indexes[barber_id] = index
+    return index
+
+
+def index_interval(barber_id, start, end, appointment_id):
+    index = _indexes.get(barber_id)
+    if index is None:
+        return
+    with _lock:
+        index.add(to_utc(start), to_utc(end), appointment_id)
+
+
+def index_appointment(appt):
+    """Llamar despues de commit al crear/reactivar una cita."""
+    if appt.status in FREE_STATUSES:
+        return
+    start = to_utc(appt.appointment_date)
+    index_interval(appt.barber_id, start,
+                   start + timedelta(minutes=appt.service.duration_minutes),
+                   appt.appointment_id)
+
+
+def unindex_appointment(appt):
+    """Llamar despues de commit al cancelar/borrar una cita."""
+    index = _indexes.get(appt.barber_id)
+    if index is None:
+        return
+    with _lock:
+        index.remove(to_utc(appt.appointment_date), appt.appointment_id)
+
+
+def day_window(day):
+    """Horario del dia (local de la barberia) como (inicio, fin) en UTC."""
+    midnight = datetime.combine(day, day_time(0), tzinfo=shop_zone())
+    # suma en hora de pared: con cambio de horario las 09:00 siguen siendo las 09:00
+    start = midnight + timedelta(hours=SHOP_OPEN_HOUR)
+    end = midnight + timedelta(hours=SHOP_CLOSE_HOUR)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def free_slots(barber_id, day, duration_minutes, step_minutes=None):
+    window_start, window_end = day_window(day)
+    # no se reservan huecos en el pasado
+    window_start = max(window_start, _align(
+        datetime.now(timezone.utc), window_start,
+        timedelta(minutes=step_minutes or SLOT_STEP_MINUTES)))
+    if window_start >= window_end:
+        return []
+    return get_index(barber_id).free_slots(
+        window_start, window_end,
+        timedelta(minutes=duration_minutes),
+        timedelta(minutes=step_minutes or SLOT_STEP_MINUTES))
@@ -0,0 +1,234 @@
+"""
+Cache de respuestas para endpoints publicos que casi no cambian
+(catalogo de servicios, lista de barberos).
+
+- TTL por entrada (CACHE_TTL) e invalidacion explicita por namespace.
+- ETag fuerte (sha256 del cuerpo) y 304 Not Modified con If-None-Match.
+- Backend enchufable (CACHE_BACKEND):
+    memory      -> LRU por proceso de CACHE_MAX_ENTRIES respuestas (por defecto)
+    filesystem  -> archivos JSON en CACHE_DIR (privado, 0700), compartido entre
+                   workers de gunicorn
+
+La invalidacion sube la "generacion" del namespace; las claves llevan la
+generacion, asi una respuesta calculada con datos viejos nunca se vuelve a leer.
+La clave usa solo los parametros que la vista lee (ver cached_response): un
+?x=<aleatorio> no crea entradas nuevas.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "cache"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", 300))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+# parametros con listas separadas por coma: el orden y los repetidos no cambian la respuesta
+LIST_ARGS = {"fields", "expand"}
+
+
+class MemoryBackend:
+    """LRU: al pasar de max_entries se descarta la entrada usada hace mas tiempo."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def generation(self, namespace):
+        return self._generations.get(namespace, 0)
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self.generation(namespace) + 1
+            prefix = namespace + ":"
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, bytes):
+        return {"__b64__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"{type(value).__name__} no se puede guardar en el cache")
+
+
+def _json_object(obj):
+    if len(obj) == 1 and "__b64__" in obj:
+        return base64.b64decode(obj["__b64__"])
+    return obj
+
+
+def private_directory(directory):
+    """Crea el directorio con 0700 y se niega a usar uno de otro usuario o abierto a otros."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} es de otro usuario")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{directory} tiene permisos de escritura para otros usuarios")
+    return directory
+
+
+class FileSystemBackend:
+    """
+    Un archivo JSON por entrada (bytes en base64, nunca pickle); escrituras
+    atomicas con os.replace.
+    """
+
+    def __init__(self, directory):
+        self.directory = private_directory(directory)
+
+    def _namespace_dir(self, namespace):
+        return os.path.join(self.directory, namespace)
+
+    def _path(self, key):
+        namespace = key.split(":", 1)[0]
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self._namespace_dir(namespace), name)
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                expires_at, value = json.load(f, object_hook=_json_object)
+        except (OSError, ValueError, TypeError):
+            return None
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self._write(self._path(key), json.dumps(
+            [time.time() + ttl, value], default=_json_default).encode())
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def generation(self, namespace):
+        try:
+            with open(self._namespace_dir(namespace) + ".gen") as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def invalidate(self, namespace):
+        # generacion con reloj en ns: no hace falta leer-incrementar entre procesos
+        self._write(self._namespace_dir(namespace) + ".gen",
+                    str(time.time_ns()).encode())
+        directory = self._namespace_dir(namespace)
+        for name in os.listdir(directory) if os.path.isdir(directory) else ():
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def make_backend(name=CACHE_BACKEND):
+    if name == "filesystem":
+        try:
+            return FileSystemBackend(CACHE_DIR)
+        except PermissionError as e:
+            logger.warning("cache filesystem desactivado (%s): se usa memory", e)
+    return MemoryBackend()
+
+
+backend = make_backend()
+
+
+def invalidate(*namespaces):
+    for namespace in namespaces:
+        backend.invalidate(namespace)
+
+
+def cache_key(namespace, args):
+    """namespace:generacion:ruta?args, con solo los `args` que usa la vista, normalizados."""
+    params = []
+    for name in sorted(args):
+        value = request.args.get(name)
+        if value is None:
+            continue
+        if name in LIST_ARGS:
+            value = ",".join(sorted({p.strip() for p in value.split(",") if p.strip()}))
+        params.append((name, value.strip()))
+    return f"{namespace}:{backend.generation(namespace)}:{request.path}?{urlencode(params)}"
+
+
+def cached_response(namespace, ttl=None, args=()):
+    """
+    Decorador para rutas GET: guarda las respuestas 200 por ruta y por los
+    parametros `args` que lee la vista, y responde 304 si el cliente ya
+    tiene el ETag vigente.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*a, **kwargs):
+            key = cache_key(namespace, args)
+            entry = backend.get(key)
+            if entry is None:
+                response = make_response(fn(*a, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = {
+                    "body": body,
+                    "mimetype": response.mimetype,
+                    "etag": hashlib.sha256(body).hexdigest()[:32]
+                }
+                backend.set(key, entry, ttl or CACHE_TTL)
+
+            response = current_app.response_class(
+                entry["body"], mimetype=entry["mimetype"])
+            response.set_etag(entry["etag"])
+            # el navegador puede guardar la respuesta pero debe revalidar con el ETag
+            response.headers["Cache-Control"] = "no-cache"
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,154 @@
+"""
+Sesiones de Stripe Checkout fuera del request (outbox).
+
+Las rutas guardan un CheckoutJob con los kwargs de
+stripe.checkout.Session.create (dueño = usuario del JWT) y responden ya
+202 con job_id y poll_url; no esperan a Stripe dentro del request.
+El dueño consulta GET /api/stripe/checkout/jobs/<job_id> (con su JWT)
+hasta que trae checkout_url; ?wait= espera como mucho
+CHECKOUT_POLL_MAX_SECONDS, un poll corto que no retiene al worker de gunicorn.
+
+El worker reclama cada job con un UPDATE condicional (varios procesos no
+procesan el mismo), llama a Stripe con timeout y con idempotency_key =
+job_id (un reintento nunca crea dos sesiones) y reintenta los errores de
+red con backoff hasta CHECKOUT_MAX_ATTEMPTS.
+"""
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import stripe
+from flask import jsonify, url_for
+from sqlalchemy import and_, or_, select, update
+from api.models import db, CheckoutJob
+from api.workers import BackgroundWorker
+
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", 10))
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", 3))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", 1))
+# p. ej. http://localhost:12111 para el servidor falso (flask fake-stripe)
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+
+CHECKOUT_POLL_MAX_SECONDS = 1.0
+CHECKOUT_MAX_ATTEMPTS = int(os.getenv("CHECKOUT_MAX_ATTEMPTS", 5))
+CHECKOUT_BATCH_SIZE = 10
+# un job "procesando" mas viejo que esto quedo huerfano (worker muerto)
+STALE_AFTER = timedelta(seconds=STRIPE_TIMEOUT * (STRIPE_MAX_NETWORK_RETRIES + 1) + 60)
+
+RETRYABLE_ERRORS = (stripe.APIConnectionError, stripe.RateLimitError, stripe.APIError)
+
+
+def configure_stripe():
+    stripe.default_http_client = stripe.RequestsClient(
+        timeout=(STRIPE_CONNECT_TIMEOUT, STRIPE_TIMEOUT))
+    stripe.max_network_retries = STRIPE_MAX_NETWORK_RETRIES
+    if STRIPE_API_BASE:
+        stripe.api_base = STRIPE_API_BASE
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _claimable(now):
+    return or_(
+        and_(CheckoutJob.status == "pendiente", CheckoutJob.available_at <= now),
+        and_(CheckoutJob.status == "procesando", CheckoutJob.updated_at < now - STALE_AFTER),
+    )
+
+
+def _finish(job_id, **values):
+    db.session.execute(
+        update(CheckoutJob).where(CheckoutJob.job_id == job_id)
+        .values(updated_at=_now(), **values))
+    db.session.commit()
+
+
+def process_checkout_jobs(limit=CHECKOUT_BATCH_SIZE):
+    """Crea las sesiones de hasta `limit` jobs; devuelve cuantos reclamo."""
+    now = _now()
+    job_ids = db.session.execute(
+        select(CheckoutJob.job_id).where(_claimable(now))
+        .order_by(CheckoutJob.available_at).limit(limit)).scalars().all()
+
+    claimed = 0
+    for job_id in job_ids:
+        result = db.session.execute(
+            update(CheckoutJob)
+            .where(CheckoutJob.job_id == job_id, _claimable(now))
+            .values(status="procesando", attempts=CheckoutJob.attempts + 1, updated_at=_now()))
+        db.session.commit()
+        if result.rowcount != 1:
+            continue  # otro worker lo tomo
+        claimed += 1
+
+        job = db.session.get(CheckoutJob, job_id)
+        params, attempts = dict(job.params), job.attempts
+        db.session.commit()  # no mantener la transaccion abierta durante la llamada a Stripe
+        try:
+            session = stripe.checkout.Session.create(
+                **params, idempotency_key=f"checkout-job-{job_id}")
+        except RETRYABLE_ERRORS as e:
+            if attempts < CHECKOUT_MAX_ATTEMPTS:
+                _finish(job_id, status="pendiente", error=str(e),
+                        available_at=_now() + timedelta(seconds=2 ** attempts))
+            else:
+                _finish(job_id, status="error", error=str(e))
+        except Exception as e:
+            _finish(job_id, status="error", error=str(e))
+        else:
+            _finish(job_id, status="listo", error=None,
+                    session_id=session.id, checkout_url=session.url)
+    return claimed
+
+
+checkout_worker = BackgroundWorker(
+    "checkout", process_checkout_jobs, interval=5.0,
+    enabled=os.getenv("CHECKOUT_WORKER", "thread") != "off")
+
+
+def enqueue_checkout(created_by_user_id=None, **params):
+    """Guarda el job (kwargs de stripe.checkout.Session.create) y despierta al worker."""
+    job = CheckoutJob(job_id=str(uuid.uuid4()), params=params,
+                      created_by_user_id=created_by_user_id)
+    db.session.add(job)
+    db.session.commit()
+    checkout_worker.notify()
+    return job
+
+
+def wait_for_job(job_id, timeout):
+    """Relee el job hasta que termine o pase `timeout` segundos."""
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while True:
+        job = db.session.execute(
+            select(CheckoutJob).where(CheckoutJob.job_id == job_id)
+            .execution_options(populate_existing=True)).scalar()
+        db.session.commit()
+        if job is None or job.status in ("listo", "error") or time.monotonic() >= deadline:
+            return job
+        time.sleep(min(delay, max(0, deadline - time.monotonic())))
+        delay = min(delay * 2, 0.25)
+
+
+def checkout_response(job):
+    """202 con poll_url mientras el job no termina; checkout_url/session_id si ya termino."""
+    if job.status == "listo":
+        return jsonify({"ok": True, "checkout_url": job.checkout_url,
+                        "session_id": job.session_id, "job_id": job.job_id}), 200
+    if job.status == "error":
+        return jsonify({"ok": False, "message": f"Stripe error: {job.error}",
+                        "job_id": job.job_id}), 500
+    return jsonify({
+        "ok": True,
+        "job_id": job.job_id,
+        "status": job.status,
+        "poll_url": url_for("api.stripe_checkout_job", job_id=job.job_id)
+    }), 202
+
+
+def setup_checkout(app):
+    configure_stripe()
+    checkout_worker.init_app(app)
@@ -1,6 +1,16 @@
 
+import os
+import time
 import click
 from api.models import db, User
+from api.checkout import checkout_worker
+from api.fake_stripe import FakeStripe
+from api.webhooks import webhook_worker
+from api.idempotency import purge_expired
+from api.agenda import rebuild_agenda
+from api.compression import precompress_dir
+from api.rollup import rebuild_rollup
+from api.seed import seed_load
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -31,4 +41,79 @@ def setup_commands(app):
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    @app.cli.command("rebuild-sales-rollup")
+    def rebuild_sales_rollup():
+        """ Recalcula daily_sales_rollup desde cero: $ flask rebuild-sales-rollup """
+        print("Rebuilding daily_sales_rollup")
+        rows = rebuild_rollup()
+        print("daily_sales_rollup rebuilt:", rows, "rows")
+
+    @app.cli.command("rebuild-agenda")
+    def rebuild_agenda_command():
+        """ Recalcula barber_day_agenda desde las citas: $ flask rebuild-agenda """
+        print("Rebuilding barber_day_agenda")
+        barbers = rebuild_agenda()
+        print("barber_day_agenda rebuilt for", barbers, "barbers")
+
+    @app.cli.command("seed-load")
+    @click.option("--scale", default=1, help="10 barberos, 2000 clientes y ~55k citas (3 anos) por unidad")
+    @click.option("--seed", default=42, help="semilla para datos reproducibles")
+    @click.option("--years", default=3, help="anos de historico de citas")
+    @click.option("--batch-size", default=10000)
+    def seed_load_command(scale, seed, years, batch_size):
+        """ Carga datos sinteticos para pruebas de carga: $ flask seed-load --scale 15 """
+        print("Seeding scale", scale, "seed", seed, "years", years)
+        start = time.perf_counter()
+        seed_load(scale=scale, seed=seed, years=years, batch_size=batch_size)
+        print("Rebuilding daily_sales_rollup")
+        rebuild_rollup()
+        print("Rebuilding barber_day_agenda")
+        rebuild_agenda()
+        print(f"Seed loaded in {time.perf_counter() - start:.1f}s")
+
+    @app.cli.command("checkout-worker")
+    def checkout_worker_command():
+        """ Crea las sesiones de Stripe encoladas (con CHECKOUT_WORKER=off): $ flask checkout-worker """
+        print("Checkout worker running")
+        checkout_worker.app = app
+        checkout_worker.run_forever()
+
+    @app.cli.command("webhook-worker")
+    def webhook_worker_command():
+        """ Procesa el inbox de webhooks de Stripe (con WEBHOOK_WORKER=off): $ flask webhook-worker """
+        print("Webhook worker running")
+        webhook_worker.app = app
+        webhook_worker.run_forever()
+
+    @app.cli.command("purge-idempotency-keys")
+    def purge_idempotency_keys():
+        """ Borra las Idempotency-Key vencidas: $ flask purge-idempotency-keys """
+        total = 0
+        while True:
+            deleted = purge_expired()
+            if not deleted:
+                break
+            total += deleted
+        print("Idempotency keys purged:", total)
+
+    @app.cli.command("precompress-dist")
+    @click.option("--dir", "directory", default=os.path.join(os.path.dirname(__file__), "..", "..", "dist"))
+    def precompress_dist(directory):
+        """ Deja .br/.gz junto a los assets del build (tras npm run build): $ flask precompress-dist """
+        print("Precompressing", os.path.abspath(directory))
+        written = precompress_dir(directory)
+        print("Precompressed files written:", written)
+
+    @app.cli.command("fake-stripe")
+    @click.option("--port", default=12111)
+    @click.option("--webhook-url", default="http://localhost:3001/api/stripe/webhook")
+    @click.option("--delay-ms", default=0, help="latencia simulada al crear sesiones")
+    def fake_stripe_command(port, webhook_url, delay_ms):
+        """ Stripe falso para probar el checkout sin red: $ flask fake-stripe """
+        fake = FakeStripe(port=port, webhook_url=webhook_url,
+                          webhook_secret=os.getenv("STRIPE_WEBHOOK_SECRET"), delay_ms=delay_ms)
+        print("Fake Stripe on", fake.base_url, "-> webhook", webhook_url)
+        print("Backend: STRIPE_API_BASE=" + fake.base_url, "STRIPE_SECRET_KEY=sk_test_fake")
+        fake.serve_forever()
@@ -0,0 +1,149 @@
+"""
+Compresion gzip/brotli de las respuestas.
+
+API (blueprint api): las respuestas de al menos COMPRESS_MIN_SIZE bytes
+con un tipo de texto (JSON, HTML...) se comprimen segun Accept-Encoding
+(br si esta instalado el modulo brotli, si no gzip). No se tocan las
+respuestas en streaming (NDJSON), las que ya traen Content-Encoding ni
+los 304. El ETag del cache lleva el sufijo de la codificacion
+("<etag>-gzip") y el If-None-Match se compara sin el sufijo.
+
+Estaticos (dist/): `flask precompress-dist` (en el build) deja junto a
+cada asset un .br y un .gz comprimidos al maximo y serve_any_other_file
+manda el que acepte el cliente tal cual, sin comprimir en cada request.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # sin brotli: solo gzip
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+COMPRESS_MIMETYPES = {
+    "application/json", "application/javascript", "application/xml",
+    "image/svg+xml", "text/css", "text/html", "text/javascript", "text/plain", "text/xml",
+}
+# extensiones que se precomprimen en dist/ (imagenes y fuentes ya vienen comprimidas)
+PRECOMPRESS_EXTENSIONS = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".wasm"}
+# codificacion -> extension del archivo precomprimido, en orden de preferencia
+STATIC_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_ETAG_SUFFIX = re.compile(r'-(?:br|gzip)"')
+
+
+def negotiate(accept_encoding, available):
+    """La primera de `available` que el cliente acepta (q > 0), o None."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def _encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if static else COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _strip_etag_suffix():
+    value = request.environ.get("HTTP_IF_NONE_MATCH")
+    if value and request.blueprint == "api":
+        request.environ["HTTP_IF_NONE_MATCH"] = _ETAG_SUFFIX.sub('"', value)
+
+
+def _compress_response(response):
+    if request.blueprint != "api" or response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = negotiate(request.headers.get("Accept-Encoding"), _encodings())
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def send_static(directory, path):
+    """send_from_directory que prefiere el .br/.gz precomprimido si el cliente lo acepta."""
+    base = os.path.join(directory, path)
+    available = [encoding for encoding, ext in STATIC_ENCODINGS if os.path.isfile(base + ext)]
+    encoding = negotiate(request.headers.get("Accept-Encoding"), available)
+    if encoding is None:
+        response = send_from_directory(directory, path)
+    else:
+        ext = dict(STATIC_ENCODINGS)[encoding]
+        response = send_from_directory(
+            directory, path + ext,
+            mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream")
+        response.headers["Content-Encoding"] = encoding
+    if available:
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+def precompress_dir(directory, min_size=COMPRESS_MIN_SIZE):
+    """Escribe <archivo>.br y <archivo>.gz de los assets; devuelve cuantos archivos escribio."""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in PRECOMPRESS_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < min_size:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            mtime = os.path.getmtime(path)
+            for encoding in _encodings():
+                target = path + dict(STATIC_ENCODINGS)[encoding]
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                compressed = compress(data, encoding, static=True)
+                if len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)  # uno viejo de un build anterior
+                    continue
+                with open(target, "wb") as f:
+                    f.write(compressed)
+                written += 1
+    return written
+
+
+def setup_compression(app):
+    app.before_request(_strip_etag_suffix)
+    app.after_request(_compress_response)
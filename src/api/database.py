@@ -0,0 +1,241 @@
+"""
+Opciones del engine de SQLAlchemy desde el entorno.
+
+    DB_POOL_SIZE          conexiones permanentes por proceso (5)
+    DB_MAX_OVERFLOW       conexiones extra en picos (10)
+    DB_POOL_TIMEOUT       segundos esperando una conexion libre (30)
+    DB_POOL_RECYCLE       segundos antes de reciclar una conexion (1800)
+    DB_POOL_PRE_PING      1/0, prueba la conexion al sacarla del pool (1)
+    DB_QUERY_CACHE_SIZE   sentencias compiladas cacheadas por engine (500)
+    DB_CONNECT_TIMEOUT    segundos para abrir la conexion (PostgreSQL, 10)
+    DB_STATEMENT_TIMEOUT_MS  corta queries colgadas (PostgreSQL, 0 = sin limite)
+    DB_POOL_LOG_SECONDS   cada cuanto se loguean las estadisticas del pool (60, 0 = nunca)
+
+Con pre_ping y recycle no se reutilizan conexiones que el servidor
+(p. ej. PostgreSQL de Render) cerro tras un rato sin uso.
+
+Modo produccion de SQLite (SQLITE_TUNING=1 por defecto, 0 lo apaga):
+    - PRAGMAs al conectar: WAL, synchronous=NORMAL, busy_timeout, mmap_size, cache_size.
+    - Un solo escritor: la primera sentencia de escritura de una transaccion
+      toma un lock (Lock del proceso + flock sobre <db>-writer.lock, compartido
+      por todos los workers de gunicorn). El lock es de la conexion y se suelta
+      cuando vuelve al pool, ya hecho el COMMIT/ROLLBACK real. Las lecturas
+      no lo toman y con WAL nunca esperan a un escritor.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from api.models import db
+from api.utils import APIException
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _env_bool(name, default):
+    return os.getenv(name, "1" if default else "0").lower() in ("1", "true", "yes")
+
+
+def _is_memory_sqlite(url):
+    return url.startswith("sqlite") and (url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url)
+
+
+def engine_options_from_env(url):
+    """Diccionario para app.config["SQLALCHEMY_ENGINE_OPTIONS"]."""
+    options = {
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "query_cache_size": _env_int("DB_QUERY_CACHE_SIZE", 500),
+    }
+    # SQLite en memoria usa SingletonThreadPool: no admite overflow ni timeout
+    if not _is_memory_sqlite(url):
+        options.update({
+            "pool_size": _env_int("DB_POOL_SIZE", 5),
+            "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        })
+    if url.startswith("postgresql"):
+        connect_args = {"connect_timeout": _env_int("DB_CONNECT_TIMEOUT", 10)}
+        statement_timeout = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+        if statement_timeout:
+            connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+        options["connect_args"] = connect_args
+    return options
+
+
+def dialect_insert(conn):
+    """insert() con on_conflict_* del dialecto (postgresql/sqlite), o None en otros motores."""
+    return {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(conn.dialect.name)
+
+
+class PoolStats:
+    """Cuenta eventos del pool y los loguea con pool.status() cada `interval` segundos."""
+
+    def __init__(self, engine, interval):
+        self.engine = engine
+        self.interval = interval
+        self.counts = {"connect": 0, "checkout": 0, "invalidate": 0}
+        self._last_log = time.monotonic()
+        self._lock = threading.Lock()
+        pool = engine.pool
+        event.listen(pool, "connect", lambda *a: self._count("connect"))
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "invalidate", lambda *a: self._count("invalidate"))
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _on_checkout(self, *args):
+        self._count("checkout")
+        pool = self.engine.pool
+        # max_overflow=-1 es overflow ilimitado
+        if (isinstance(pool, QueuePool) and pool._max_overflow >= 0
+                and pool.checkedout() >= pool.size() + pool._max_overflow):
+            logger.warning("db pool saturado: %s", pool.status())
+        if self.interval and time.monotonic() - self._last_log >= self.interval:
+            self.log()
+
+    def log(self):
+        with self._lock:
+            counts, self.counts = self.counts, dict.fromkeys(self.counts, 0)
+            self._last_log = time.monotonic()
+        logger.info("db pool %s | ultimos %ss: checkouts=%d conexiones_nuevas=%d invalidadas=%d",
+                    self.engine.pool.status(), self.interval,
+                    counts["checkout"], counts["connect"], counts["invalidate"])
+
+
+def setup_pool_logging(app):
+    interval = _env_int("DB_POOL_LOG_SECONDS", 60)
+    if not interval:
+        return None
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    with app.app_context():
+        return PoolStats(db.engine, interval)
+
+
+# ==========
+# SQLite
+# ==========
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_MMAP_SIZE = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_CACHE_KB = _env_int("SQLITE_CACHE_KB", 64000)
+
+WRITE_KEYWORDS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
+
+def sqlite_file(url):
+    """Ruta del archivo de una URL sqlite (None si es en memoria u otro motor)."""
+    if not url.startswith("sqlite") or _is_memory_sqlite(url):
+        return None
+    return make_url(url).database
+
+
+class WriteLock:
+    """
+    Lock de escritor: threading.Lock entre hilos + flock entre procesos.
+    Lo tiene una conexion, no un hilo: se puede soltar desde cualquier hilo
+    (p. ej. el que devuelve al pool una conexion recolectada por el GC).
+    """
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._fd = None
+        self._fd_pid = None
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        if not self._lock.acquire(timeout=self.timeout):
+            raise self._busy()
+        try:
+            if fcntl is not None:
+                if self._fd is None or self._fd_pid != os.getpid():
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    self._fd_pid = os.getpid()
+                delay = 0.001
+                while True:
+                    try:
+                        fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            raise self._busy()
+                        time.sleep(delay)
+                        delay = min(delay * 2, 0.005)
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def release(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def _busy(self):
+        return APIException("Base de datos ocupada, intenta de nuevo", 503, {"ok": False})
+
+
+def tune_sqlite(engine, path):
+    """PRAGMAs de produccion y escritor serializado para un engine sqlite en archivo."""
+    lock = WriteLock(path + "-writer.lock", SQLITE_BUSY_TIMEOUT_MS / 1000)
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        # busy_timeout primero: pasar a WAL necesita un lock exclusivo momentaneo
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        cursor.close()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _take_writer(conn, cursor, statement, parameters, context, executemany):
+        # conn.info es el de la conexion del pool: el lock queda atado a ella
+        if conn.info.get("sqlite_writer"):
+            return
+        if statement.lstrip()[:7].upper().startswith(WRITE_KEYWORDS):
+            # antes de que pysqlite abra la transaccion (BEGIN implicito antes del DML)
+            lock.acquire()
+            conn.info["sqlite_writer"] = True
+
+    @event.listens_for(engine.pool, "checkin")
+    def _release(dbapi_conn, record):
+        # checkin llega despues del COMMIT/ROLLBACK de la DBAPI (y del reset del pool):
+        # el siguiente escritor nunca entra con la transaccion anterior a medio confirmar
+        if record is not None and record.info.pop("sqlite_writer", False):
+            lock.release()
+
+    return lock
+
+
+def setup_sqlite(app):
+    path = sqlite_file(app.config["SQLALCHEMY_DATABASE_URI"])
+    if path is None or not _env_bool("SQLITE_TUNING", True):
+        return None
+    with app.app_context():
+        if not os.path.isabs(path):
+            # flask-sqlalchemy resuelve las rutas relativas dentro de instance/
+            path = db.engine.url.database
+        return tune_sqlite(db.engine, path)
@@ -0,0 +1,159 @@
+"""
+Servidor HTTP que imita lo que usamos de Stripe, para probar el flujo sin red.
+
+    $ flask fake-stripe --port 12111 --webhook-url http://localhost:3001/api/stripe/webhook
+    # y en el backend: STRIPE_API_BASE=http://localhost:12111 STRIPE_SECRET_KEY=sk_test_fake
+
+- POST /v1/checkout/sessions crea la sesion (respeta Idempotency-Key y
+  puede tardar --delay-ms para simular a Stripe lento).
+- GET /v1/checkout/sessions/<id> la devuelve.
+- GET /pay/<id> "paga": envia checkout.session.completed firmado con
+  STRIPE_WEBHOOK_SECRET al webhook y redirige a success_url.
+"""
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+_METADATA_KEY = re.compile(r"^metadata\[(.+)\]$")
+_LINE_ITEM_KEY = re.compile(r"^line_items\[(\d+)\]\[(.+)\]$")
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Cabecera Stripe-Signature (t=...,v1=HMAC-SHA256) como la firma Stripe."""
+    timestamp = int(timestamp or time.time())
+    signed = f"{timestamp}.{payload}".encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def _session_from_form(form, base_url):
+    metadata, amounts = {}, {}
+    for key, value in form:
+        match = _METADATA_KEY.match(key)
+        if match:
+            metadata[match.group(1)] = value
+            continue
+        match = _LINE_ITEM_KEY.match(key)
+        if match:
+            item = amounts.setdefault(match.group(1), {"unit_amount": 0, "quantity": 1})
+            if match.group(2) == "price_data][unit_amount":
+                item["unit_amount"] = int(value)
+            elif match.group(2) == "quantity":
+                item["quantity"] = int(value)
+    fields = dict(form)
+    session_id = "cs_test_fake_" + uuid.uuid4().hex
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "mode": fields.get("mode", "payment"),
+        "status": "open",
+        "payment_status": "unpaid",
+        "amount_total": sum(i["unit_amount"] * i["quantity"] for i in amounts.values()),
+        "currency": "usd",
+        "metadata": metadata,
+        "success_url": fields.get("success_url"),
+        "cancel_url": fields.get("cancel_url"),
+        "url": f"{base_url}/pay/{session_id}",
+    }
+
+
+class FakeStripe:
+    def __init__(self, host="127.0.0.1", port=12111, webhook_url=None,
+                 webhook_secret=None, delay_ms=0):
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.delay_ms = delay_ms
+        self.sessions = {}
+        self.idempotency = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if self.path != "/v1/checkout/sessions":
+                    return self._json(404, {"error": {"message": "Unrecognized request URL"}})
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse_qsl(self.rfile.read(length).decode(), keep_blank_values=True)
+                if fake.delay_ms:
+                    time.sleep(fake.delay_ms / 1000)
+                key = self.headers.get("Idempotency-Key")
+                with fake._lock:
+                    if key and key in fake.idempotency:
+                        return self._json(200, fake.sessions[fake.idempotency[key]])
+                    session = _session_from_form(form, fake.base_url)
+                    fake.sessions[session["id"]] = session
+                    if key:
+                        fake.idempotency[key] = session["id"]
+                return self._json(200, session)
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if parts[:3] == ["v1", "checkout", "sessions"] and len(parts) == 4:
+                    session = fake.sessions.get(parts[3])
+                    if not session:
+                        return self._json(404, {"error": {"message": "No such checkout.session"}})
+                    return self._json(200, session)
+                if parts[0] == "pay" and len(parts) == 2 and parts[1] in fake.sessions:
+                    session = fake.pay(parts[1])
+                    self.send_response(303)
+                    self.send_header("Location", (session["success_url"] or "/").replace(
+                        "{CHECKOUT_SESSION_ID}", session["id"]))
+                    self.end_headers()
+                    return None
+                return self._json(404, {"error": {"message": "Not found"}})
+
+            def log_message(self, fmt, *args):
+                print("[fake-stripe]", fmt % args)
+
+        return Handler
+
+    def pay(self, session_id):
+        """Marca la sesion como pagada y envia el webhook firmado."""
+        session = self.sessions[session_id]
+        session.update(status="complete", payment_status="paid")
+        if self.webhook_url:
+            event = {"id": "evt_fake_" + uuid.uuid4().hex, "object": "event",
+                     "type": "checkout.session.completed", "created": int(time.time()),
+                     "data": {"object": session}}
+            payload = json.dumps(event)
+            headers = {"Content-Type": "application/json"}
+            if self.webhook_secret:
+                headers["Stripe-Signature"] = sign_payload(payload, self.webhook_secret)
+            request = urllib.request.Request(self.webhook_url, data=payload.encode(),
+                                             headers=headers, method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=10) as res:
+                    print("[fake-stripe] webhook", res.status)
+            except OSError as e:
+                print("[fake-stripe] webhook fallo:", e)
+        return session
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def start(self):
+        """En un hilo (para scripts y benchmarks); devuelve self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self.server.shutdown()
@@ -0,0 +1,230 @@
+"""
+Campos a pedido en los listados y detalles: ?fields= y ?expand=.
+
+    ?fields=appointment_id,status,appointment_date   solo esos campos
+    ?fields=appointment_id,client.name               client anidado con solo name
+    ?expand=service                                  campos por defecto, pero de las
+                                                     relaciones solo se anida service
+                                                     (client y barber salen como
+                                                     client_id / barber_id)
+    ?expand=appointment.service                      relaciones de relaciones
+    ?shape=normalized                                las filas solo llevan las FK y cada
+                                                     usuario/servicio sale una vez en
+                                                     "included" (?fields[usuarios]=name);
+                                                     no se combina con ?format=ndjson
+
+Sin ninguno de los dos la salida es la de siempre. Con alguno, una relacion
+solo se anida si se nombra en fields o en expand. La SQL sigue a lo pedido:
+load_only con las columnas necesarias y un selectinload solo por relacion
+anidada (tambien con load_only).
+
+Cada modelo declara:
+    SERIALIZE_FIELDS    campo -> Field(columnas, valor)
+    SERIALIZE_RELATIONS relacion anidable -> campo FK que la reemplaza si no se expande
+    SERIALIZE_DEFAULT   campos (y relaciones anidadas) de serialize() sin parametros
+"""
+from operator import attrgetter
+
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+from api.utils import APIException
+
+MAX_PATH_DEPTH = 3
+# tablas que ?shape=normalized saca a "included" en vez de repetirlas por fila
+INCLUDED_TYPES = ("usuarios", "services")
+
+
+class Field:
+    """Un campo de serialize(): columnas que necesita y como se calcula."""
+
+    __slots__ = ("columns", "getter", "related")
+
+    def __init__(self, columns, getter=None, related=None):
+        self.columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        self.getter = getter or attrgetter(self.columns[0])
+        # relaciones que lee el getter: {relacion: (columnas, ...)}
+        self.related = related or {}
+
+
+class FieldSet:
+    """Campos elegidos de un modelo (y de sus relaciones anidadas)."""
+
+    def __init__(self, model, names, children):
+        self.model = model
+        self.names = names
+        self.children = children
+        self._plan = [(name, None, children[name]) if name in children
+                      else (name, model.SERIALIZE_FIELDS[name].getter, None)
+                      for name in names]
+
+    def dump(self, obj):
+        out = {}
+        for name, getter, child in self._plan:
+            if child is None:
+                out[name] = getter(obj)
+            else:
+                value = getattr(obj, name)
+                out[name] = None if value is None else child.dump(value)
+        return out
+
+    def options(self, *columns):
+        """load_only + selectinload para cargar solo lo que dump() va a leer."""
+        mapper = inspect(self.model)
+        keep = set(columns)
+        related = {}
+        for name in self.names:
+            if name in self.children:
+                keep.update(c.key for c in mapper.relationships[name].local_columns)
+                continue
+            field = self.model.SERIALIZE_FIELDS[name]
+            keep.update(field.columns)
+            for rel, rel_columns in field.related.items():
+                keep.update(c.key for c in mapper.relationships[rel].local_columns)
+                related.setdefault(rel, set()).update(rel_columns)
+
+        opts = [load_only(*[getattr(self.model, c) for c in sorted(keep)])]
+        for rel in dict.fromkeys([*self.children, *related]):
+            attr = getattr(self.model, rel)
+            child = self.children.get(rel)
+            if child is not None:
+                opts.append(selectinload(attr).options(*child.options(*related.get(rel, ()))))
+            else:
+                target = mapper.relationships[rel].mapper.class_
+                opts.append(selectinload(attr).load_only(
+                    *[getattr(target, c) for c in sorted(related[rel])]))
+        return tuple(opts)
+
+
+_defaults = {}
+
+
+def default_fieldset(model):
+    """El FieldSet de serialize() sin parametros (la salida de siempre)."""
+    fieldset = _defaults.get(model)
+    if fieldset is None:
+        mapper = inspect(model)
+        children = {name: default_fieldset(mapper.relationships[name].mapper.class_)
+                    for name in model.SERIALIZE_DEFAULT if name in model.SERIALIZE_RELATIONS}
+        fieldset = _defaults[model] = FieldSet(model, list(model.SERIALIZE_DEFAULT), children)
+    return fieldset
+
+
+def _split(paths):
+    """['a', 'b.c', 'b.d'] -> (['a'], {'b': ['c', 'd']})"""
+    direct, nested = [], {}
+    for path in paths:
+        head, _, rest = path.partition(".")
+        if rest:
+            nested.setdefault(head, []).append(rest)
+        elif head not in direct:
+            direct.append(head)
+    return direct, nested
+
+
+def build_fieldset(model, fields, expand, prefix=""):
+    """FieldSet a partir de rutas ya separadas (["client.name", ...])."""
+    relations = model.SERIALIZE_RELATIONS
+    direct, nested = _split(fields)
+    expanded, expand_nested = _split(expand)
+    for head in expand_nested:
+        if head not in expanded:
+            expanded.append(head)
+
+    if direct or nested:
+        names = direct + [head for head in nested if head not in direct]
+    else:
+        # campos por defecto; las relaciones no pedidas quedan como su FK
+        names = [name if name not in relations or name in expanded else relations[name]
+                 for name in model.SERIALIZE_DEFAULT]
+    names += [rel for rel in expanded if rel not in names]
+
+    for name in names:
+        if name not in model.SERIALIZE_FIELDS and name not in relations:
+            raise APIException(f"Campo desconocido: {prefix}{name}", 400, {"ok": False})
+    for head in nested:
+        if head not in relations:
+            raise APIException(f"No es una relación: {prefix}{head}", 400, {"ok": False})
+
+    mapper = inspect(model)
+    children = {
+        rel: build_fieldset(mapper.relationships[rel].mapper.class_,
+                            nested.get(rel, []), expand_nested.get(rel, []),
+                            f"{prefix}{rel}.")
+        for rel in names if rel in relations
+    }
+    return FieldSet(model, names, children)
+
+
+def _paths(arg):
+    paths = [p.strip() for p in (request.args.get(arg) or "").split(",") if p.strip()]
+    for path in paths:
+        if path.count(".") >= MAX_PATH_DEPTH:
+            raise APIException(f"{arg}: ruta demasiado larga: {path}", 400, {"ok": False})
+    return paths
+
+
+def wants_normalized():
+    if request.args.get("shape") != "normalized":
+        return False
+    # NDJSON manda fila por fila: no hay donde poner "included"
+    if request.args.get("format") == "ndjson":
+        raise APIException("shape=normalized no se puede usar con format=ndjson", 400, {"ok": False})
+    return True
+
+
+def _included_relations(model):
+    """{relacion: modelo} de las relaciones que van a "included"."""
+    mapper = inspect(model)
+    return {rel: mapper.relationships[rel].mapper.class_ for rel in model.SERIALIZE_RELATIONS
+            if mapper.relationships[rel].mapper.class_.__tablename__ in INCLUDED_TYPES}
+
+
+def normalized_fieldset(model, fields):
+    """Filas de ?shape=normalized: sin anidar, con las FK de lo que va a included."""
+    relations = model.SERIALIZE_RELATIONS
+    if any("." in path for path in fields) or _paths("expand"):
+        raise APIException("shape=normalized no anida relaciones (usa fields[usuarios]=...)",
+                           400, {"ok": False})
+    if fields:
+        names = [relations.get(name, name) for name in fields]
+    else:
+        # los campos calculados desde una relacion (created_by_name) salen de included
+        names = [relations.get(name, name) for name in model.SERIALIZE_DEFAULT
+                 if not (name in model.SERIALIZE_FIELDS and model.SERIALIZE_FIELDS[name].related)]
+        names += [relations[rel] for rel in _included_relations(model)]
+    return build_fieldset(model, list(dict.fromkeys(names)), [])
+
+
+def requested_fields(model, normalized=False):
+    """FieldSet de ?fields=&expand=, o None si no vino ninguno (salida por defecto)."""
+    fields, expand = _paths("fields"), _paths("expand")
+    if normalized:
+        return normalized_fieldset(model, fields)
+    if not fields and not expand:
+        return None
+    return build_fieldset(model, fields, expand)
+
+
+def load_included(fieldset, rows):
+    """
+    {"usuarios": {"3": {...}}, "services": {...}} con las entidades que
+    referencian las FK de las filas: una query IN por tipo.
+    """
+    ids = {}
+    for rel, target in _included_relations(fieldset.model).items():
+        fk = fieldset.model.SERIALIZE_RELATIONS[rel]
+        if fk in fieldset.names:
+            ids.setdefault(target, set()).update(
+                value for value in map(attrgetter(fk), rows) if value is not None)
+
+    included = {}
+    for target, target_ids in ids.items():
+        paths = _paths(f"fields[{target.__tablename__}]")
+        target_fields = build_fieldset(target, paths, []) if paths else default_fieldset(target)
+        pk = inspect(target).primary_key[0]
+        entities = (target.query.options(*target_fields.options())
+                    .filter(pk.in_(sorted(target_ids))).all()) if target_ids else []
+        included[target.__tablename__] = {
+            str(getattr(entity, pk.key)): target_fields.dump(entity) for entity in entities}
+    return included
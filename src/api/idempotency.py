@@ -0,0 +1,194 @@
+"""
+Cabecera Idempotency-Key para los POST que crean cosas (citas, pagos, checkouts).
+
+La primera peticion con una clave la "reserva" (INSERT ... ON CONFLICT DO
+NOTHING en idempotency_keys) y al terminar guarda su respuesta. Un
+reintento con la misma clave:
+    - misma ruta, usuario y cuerpo, ya terminada -> la respuesta guardada
+      (Idempotent-Replayed: true), sin tocar citas ni pagos
+    - la primera todavia en curso                -> 409 + Retry-After
+    - otro cuerpo                                -> 422
+Una reserva "procesando" de mas de IDEMPOTENCY_LEASE_SECONDS se da por
+abandonada (el proceso murio sin liberarla) y el reintento la toma.
+Las respuestas 5xx no se guardan (el cliente puede reintentar de verdad).
+Las claves vencen a las IDEMPOTENCY_TTL_HOURS y un worker las borra por lotes.
+
+El alcance de la clave es "METODO /ruta usuario"; sin token el usuario es
+"anon:<ip del cliente>", asi dos anonimos no comparten claves (la ruta ya
+lleva el id de la cita en /stripe/checkout/appointment/<id>).
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from api.availability import to_utc
+from api.database import dialect_insert
+from api.models import db, IdempotencyKey
+from api.workers import BackgroundWorker
+
+IDEMPOTENCY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", 24)))
+IDEMPOTENCY_PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", 3600))
+# mas que el timeout de gunicorn: una peticion viva nunca pierde su reserva
+IDEMPOTENCY_LEASE = timedelta(seconds=float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 120)))
+PURGE_BATCH_SIZE = 5000
+MAX_KEY_LENGTH = 255
+
+
+def _scope():
+    try:
+        verify_jwt_in_request(optional=True)
+        user = get_jwt_identity()
+    except Exception:
+        user = None  # token invalido: la ruta decidira si lo rechaza
+    if not user:
+        user = f"anon:{request.access_route[0] if request.access_route else request.remote_addr}"
+    return f"{request.method} {request.path} {user}"[:255]
+
+
+def _claim(scope, key, fingerprint):
+    """True si esta peticion reservo la clave."""
+    now = datetime.now(timezone.utc)
+    values = {"scope": scope, "key": key, "fingerprint": fingerprint,
+              "status": "procesando", "created_at": now, "expires_at": now + IDEMPOTENCY_TTL}
+    table = IdempotencyKey.__table__
+    insert = dialect_insert(db.session.connection())
+    if insert is not None:
+        result = db.session.execute(
+            insert(table).values(**values)
+            .on_conflict_do_nothing(index_elements=[table.c.scope, table.c.key]))
+        claimed = result.rowcount == 1
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(**values))
+            claimed = True
+        except IntegrityError:
+            claimed = False
+    db.session.commit()
+    return claimed
+
+
+def _where(scope, key):
+    return (IdempotencyKey.scope == scope) & (IdempotencyKey.key == key)
+
+
+def _reclaim(scope, key, fingerprint):
+    """
+    True si esta peticion tomo una clave vencida o una reserva "procesando"
+    abandonada. El UPDATE lleva la condicion: de dos reintentos a la vez
+    solo uno la cumple.
+    """
+    now = datetime.now(timezone.utc)
+    stale = ((IdempotencyKey.expires_at <= now)
+             | ((IdempotencyKey.status == "procesando")
+                & (IdempotencyKey.created_at < now - IDEMPOTENCY_LEASE)))
+    result = db.session.execute(
+        update(IdempotencyKey).where(_where(scope, key), stale).values(
+            fingerprint=fingerprint, status="procesando", response_status=None,
+            response_body=None, response_mimetype=None,
+            created_at=now, expires_at=now + IDEMPOTENCY_TTL)
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _release(scope, key):
+    db.session.rollback()
+    db.session.execute(delete(IdempotencyKey).where(_where(scope, key)))
+    db.session.commit()
+
+
+def _existing(scope, key):
+    record = db.session.execute(
+        select(IdempotencyKey).where(_where(scope, key))
+        .execution_options(populate_existing=True)).scalar()
+    db.session.commit()
+    return record
+
+
+def _replay(record):
+    response = current_app.response_class(
+        record.response_body, status=record.response_status,
+        mimetype=record.response_mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(fn):
+    """Decorador: soporte de Idempotency-Key (va debajo de @jwt_required)."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"ok": False, "message": f"Idempotency-Key de más de {MAX_KEY_LENGTH} caracteres"}), 400
+
+        scope = _scope()
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        if not _claim(scope, key, fingerprint):
+            record = _existing(scope, key)
+            now = datetime.now(timezone.utc)
+            if record is not None and to_utc(record.expires_at) <= now:
+                # vencida pero aun sin purgar: se trata como nueva
+                record = None if _reclaim(scope, key, fingerprint) else _existing(scope, key)
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    return jsonify({"ok": False, "message": "Idempotency-Key ya usada con otro cuerpo"}), 422
+                if record.status != "listo":
+                    abandoned = to_utc(record.created_at) < now - IDEMPOTENCY_LEASE
+                    if not (abandoned and _reclaim(scope, key, fingerprint)):
+                        response = jsonify({"ok": False, "message": "Petición en curso con esta Idempotency-Key"})
+                        response.status_code = 409
+                        response.headers["Retry-After"] = "1"
+                        return response
+                else:
+                    return _replay(record)
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            _release(scope, key)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            _release(scope, key)
+            return response
+
+        db.session.rollback()  # lo que haya dejado la ruta sin confirmar no se guarda aqui
+        db.session.execute(
+            update(IdempotencyKey).where(_where(scope, key)).values(
+                status="listo",
+                response_status=response.status_code,
+                response_body=response.get_data(as_text=True),
+                response_mimetype=response.mimetype))
+        db.session.commit()
+        return response
+    return wrapper
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE):
+    """Borra un lote de claves vencidas; devuelve cuantas borro."""
+    expired = (select(IdempotencyKey.scope, IdempotencyKey.key)
+               .where(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+               .limit(batch_size))
+    rows = db.session.execute(expired).all()
+    if rows:
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.expires_at < datetime.now(timezone.utc),
+            IdempotencyKey.key.in_({key for _, key in rows}),
+            IdempotencyKey.scope.in_({scope for scope, _ in rows})))
+    db.session.commit()
+    return len(rows)
+
+
+idempotency_purger = BackgroundWorker(
+    "idempotency-purge", purge_expired, interval=IDEMPOTENCY_PURGE_SECONDS)
+
+
+def setup_idempotency(app):
+    idempotency_purger.init_app(app)
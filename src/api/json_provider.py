@@ -0,0 +1,94 @@
+"""
+Proveedor JSON de la app (app.json): lo usan jsonify, las respuestas NDJSON
+y request.get_json().
+
+Con orjson instalado (pip install orjson) codifica en C y arma la respuesta
+directamente en bytes; si no, usa el json de la libreria estandar. En los
+dos casos codifica igual:
+    Decimal            -> numero (10.5, no "10.5")
+    datetime / date    -> ISO 8601 ("2030-01-07T10:00:00+00:00")
+    Enum               -> su value
+    UUID               -> texto
+asi los modelos pueden devolver los valores de la base sin convertirlos.
+"""
+import dataclasses
+import decimal
+import enum
+import json
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # sin orjson: json de la libreria estandar
+    orjson = None
+
+
+def _default(o):
+    """Tipos que el encoder no conoce (stdlib: todos estos; orjson: Decimal y poco mas)."""
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, enum.Enum):
+        return o.value
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def _orjson_option(self, indent):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _pretty(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def _encode(self, obj, indent=False):
+        """bytes con orjson, o None si no se puede (enteros de mas de 64 bits, etc.)."""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=_default, option=self._orjson_option(indent))
+        except TypeError:  # orjson.JSONEncodeError
+            return None
+
+    def dumps(self, obj, **kwargs):
+        # con opciones propias del json estandar (cls, separators...) se respeta el estandar
+        if not kwargs:
+            data = self._encode(obj)
+            if data is not None:
+                return data.decode()
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # el estandar da el mismo error con su mensaje de siempre
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self._pretty()
+        data = self._encode(obj, indent=pretty)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b"\n", mimetype=self.mimetype)
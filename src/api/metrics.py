@@ -0,0 +1,238 @@
+"""
+Metricas estilo Prometheus para el blueprint api (GET /api/metrics).
+
+Por endpoint, metodo y status:
+    http_request_duration_seconds   histograma de latencia
+    db_statements_per_request       histograma de sentencias SQL por request
+    db_time_per_request_seconds     histograma de tiempo en SQL por request
+y http_requests_in_flight por endpoint.
+
+Multi-proceso (gunicorn): con METRICS_DIR cada worker vuelca su estado a
+METRICS_DIR/metrics_<pid>.json (escritura atomica, como mucho cada
+METRICS_FLUSH_SECONDS) y el scrape suma los archivos de todos los workers.
+Los contadores de workers muertos se conservan; su in_flight no.
+Vaciar METRICS_DIR al arrancar gunicorn (igual que con prometheus_client).
+"""
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 1))
+# si esta definido, /api/metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+HISTOGRAMS = {
+    "http_request_duration_seconds": ("Latencia de los requests del api", LATENCY_BUCKETS),
+    "db_statements_per_request": ("Sentencias SQL ejecutadas por request", STATEMENT_BUCKETS),
+    "db_time_per_request_seconds": ("Tiempo en SQL por request", LATENCY_BUCKETS),
+}
+IN_FLIGHT = "http_requests_in_flight"
+
+
+def _label_key(labels):
+    return json.dumps(sorted(labels.items()))
+
+
+class Registry:
+    """Estado de este proceso: {metrica: {labels_json: {buckets, sum, count}}}."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.in_flight = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = _label_key(labels)
+        with self._lock:
+            item = self.histograms[name].get(key)
+            if item is None:
+                item = self.histograms[name][key] = {
+                    "buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    item["buckets"][i] += 1
+            item["sum"] += value
+            item["count"] += 1
+
+    def add_in_flight(self, endpoint, delta):
+        key = _label_key({"endpoint": endpoint})
+        with self._lock:
+            self.in_flight[key] = self.in_flight.get(key, 0) + delta
+
+    def snapshot(self):
+        with self._lock:
+            return {"pid": self.pid,
+                    "histograms": json.loads(json.dumps(self.histograms)),
+                    "in_flight": dict(self.in_flight)}
+
+    # ---- multi-proceso ----
+
+    def _path(self):
+        return os.path.join(METRICS_DIR, f"metrics_{self.pid}.json")
+
+    def flush(self, force=False):
+        if not METRICS_DIR:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < METRICS_FLUSH_SECONDS:
+            return
+        self._last_flush = now
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = self._path()
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+
+registry = Registry()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Estados de todos los procesos (o solo el propio sin METRICS_DIR)."""
+    if not METRICS_DIR:
+        return [registry.snapshot()]
+    registry.flush(force=True)
+    states = []
+    for name in os.listdir(METRICS_DIR):
+        if not (name.startswith("metrics_") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not _pid_alive(state["pid"]):
+            state["in_flight"] = {}
+        states.append(state)
+    return states
+
+
+def _labels_text(key, extra=None):
+    labels = json.loads(key) + (extra or [])
+    return ",".join(f'{k}="{v}"' for k, v in labels)
+
+
+def render(states):
+    """Formato de texto de Prometheus (version 0.0.4)."""
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        merged = {}
+        for state in states:
+            for key, item in state["histograms"].get(name, {}).items():
+                acc = merged.setdefault(key, {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0})
+                acc["buckets"] = [a + b for a, b in zip(acc["buckets"], item["buckets"])]
+                acc["sum"] += item["sum"]
+                acc["count"] += item["count"]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key in sorted(merged):
+            item = merged[key]
+            for bound, count in zip(buckets, item["buckets"]):
+                lines.append(f"{name}_bucket{{{_labels_text(key, [['le', str(bound)]])}}} {count}")
+            lines.append(f"{name}_bucket{{{_labels_text(key, [['le', '+Inf']])}}} {item['count']}")
+            lines.append(f"{name}_sum{{{_labels_text(key)}}} {item['sum']:.6f}")
+            lines.append(f"{name}_count{{{_labels_text(key)}}} {item['count']}")
+
+    in_flight = {}
+    for state in states:
+        for key, value in state["in_flight"].items():
+            in_flight[key] = in_flight.get(key, 0) + value
+    lines.append(f"# HELP {IN_FLIGHT} Requests del api en curso")
+    lines.append(f"# TYPE {IN_FLIGHT} gauge")
+    for key in sorted(in_flight):
+        lines.append(f"{IN_FLIGHT}{{{_labels_text(key)}}} {in_flight[key]}")
+    return "\n".join(lines) + "\n"
+
+
+# ==========
+# Hooks
+# ==========
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sql = g.get("_metrics_sql") if has_request_context() else None
+    if sql is None:
+        return
+    sql[0] += 1
+    sql[1] += time.perf_counter() - getattr(context, "_metrics_started", time.perf_counter())
+
+
+def _endpoint():
+    return request.endpoint or "unknown"
+
+
+def _start_request():
+    if request.blueprint != "api":
+        return
+    if registry.pid != os.getpid():
+        # worker hecho con fork despues de importar (gunicorn --preload): empieza de cero
+        registry.__init__()
+    g._metrics_started = time.perf_counter()
+    g._metrics_sql = [0, 0.0]
+    registry.add_in_flight(_endpoint(), 1)
+
+
+def _finish_request(status):
+    started = g.pop("_metrics_started", None)
+    if started is None:
+        return
+    statements, sql_seconds = g.pop("_metrics_sql", [0, 0.0])
+    endpoint = _endpoint()
+    labels = {"endpoint": endpoint, "method": request.method, "status": str(status)}
+    registry.observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+    registry.observe("db_statements_per_request", labels, statements)
+    registry.observe("db_time_per_request_seconds", labels, sql_seconds)
+    registry.add_in_flight(endpoint, -1)
+    registry.flush()
+
+
+def _after_request(response):
+    _finish_request(response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    # si after_request no llego a correr (excepcion no manejada)
+    _finish_request(500)
+
+
+def metrics_view():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render(collect()), mimetype="text/plain; version=0.0.4")
+
+
+def setup_metrics(app):
+    # escucha en la clase Engine: cubre el engine de db y cualquier otro
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/api/metrics", "metrics", metrics_view, methods=["GET"])
@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, DateTime, ForeignKey, Enum, Numeric, UniqueConstraint
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from datetime import datetime, timezone
+from sqlalchemy import String, Boolean, Date, DateTime, ForeignKey, Enum, Numeric, UniqueConstraint, Index, JSON, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload
+from datetime import date, datetime, timezone
 from typing import List, Optional
+from api.fields import Field, default_fieldset
 db = SQLAlchemy()
 
 ROLE_ENUM = Enum("cliente", "barbero", "admin",
@@ -23,6 +24,18 @@ PAYMENT_STATUS_ENUM = Enum(
     native_enum=False
 )
 
+JOB_STATUS_ENUM = Enum(
+    "pendiente", "procesando", "listo", "error",
+    name="job_status_enum",
+    native_enum=False
+)
+
+WEBHOOK_STATUS_ENUM = Enum(
+    "pendiente", "procesado", "ignorado", "error",
+    name="webhook_status_enum",
+    native_enum=False
+)
+
 # Borrar este modelo
 
 
@@ -79,21 +92,30 @@ class Usuario(db.Model):
         cascade="all, delete-orphan"
     )
 
-    def serialize(self):
-        return {
-            "user_id": self.user_id,
-            "name": self.name,
-            "email": self.email,
-            "role": self.role,
-            "is_active": self.is_active,
-            "is_admin": bool(self.is_admin),   # <-- importante
-            "phone": self.phone,
-            "address": self.address,
-            "photo_url": self.photo_url,
-            "bio": self.bio,
-            "specialties": self.specialties,
-            "created_at": self.created_at.isoformat()
-        }
+    # serialize() y ?fields= (ver api/fields.py); Decimal y fechas los codifica app.json
+    SERIALIZE_FIELDS = {
+        "user_id": Field("user_id"),
+        "name": Field("name"),
+        "email": Field("email"),
+        "role": Field("role"),
+        "is_active": Field("is_active"),
+        "is_admin": Field("is_admin", lambda u: bool(u.is_admin)),   # <-- importante
+        "phone": Field("phone"),
+        "address": Field("address"),
+        "photo_url": Field("photo_url"),
+        "bio": Field("bio"),
+        "specialties": Field("specialties"),
+        "created_at": Field("created_at"),
+    }
+    SERIALIZE_RELATIONS = {}
+    SERIALIZE_DEFAULT = tuple(SERIALIZE_FIELDS)
+
+    @staticmethod
+    def serialize_loader(fieldset=None):
+        return fieldset.options() if fieldset else ()
+
+    def serialize(self, fieldset=None):
+        return (fieldset or default_fieldset(Usuario)).dump(self)
 
 
 class Service(db.Model):
@@ -103,26 +125,48 @@ class Service(db.Model):
     price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     duration_minutes: Mapped[int] = mapped_column(nullable=False, default=30)
 
-    def serialize(self):
-        return {
-            "service_id": self.service_id,
-            "name": self.name,
-            "price": float(self.price),
-            "duration_minutes": self.duration_minutes
-        }
+    SERIALIZE_FIELDS = {
+        "service_id": Field("service_id"),
+        "name": Field("name"),
+        "price": Field("price"),
+        "duration_minutes": Field("duration_minutes"),
+    }
+    SERIALIZE_RELATIONS = {}
+    SERIALIZE_DEFAULT = tuple(SERIALIZE_FIELDS)
+
+    @staticmethod
+    def serialize_loader(fieldset=None):
+        return fieldset.options() if fieldset else ()
+
+    def serialize(self, fieldset=None):
+        return (fieldset or default_fieldset(Service)).dump(self)
 
 
 class Appointment(db.Model):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # agenda del barbero / disponibilidad / citas del cliente
+        # (columnas simples: el B-tree sirve igual para ORDER BY ... DESC)
+        Index("ix_appointments_barber_id_appointment_date",
+              "barber_id", "appointment_date"),
+        Index("ix_appointments_client_id_appointment_date",
+              "client_id", "appointment_date"),
+        # listado admin: ?status=&date=
+        Index("ix_appointments_status_appointment_date",
+              "status", "appointment_date"),
+        Index("ix_appointments_appointment_date", "appointment_date"),
+    )
     appointment_id: Mapped[int] = mapped_column(primary_key=True)
     client_id: Mapped[int] = mapped_column(
         ForeignKey("usuarios.user_id"), nullable=False)
+    # active_history: los after_flush de rollup.py y agenda.py necesitan el valor
+    # anterior aunque el objeto venga expirado de un commit
     barber_id: Mapped[int] = mapped_column(
-        ForeignKey("usuarios.user_id"), nullable=False)
+        ForeignKey("usuarios.user_id"), nullable=False, active_history=True)
     service_id: Mapped[int] = mapped_column(
         ForeignKey("services.service_id"), nullable=False)
     appointment_date: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False)
+        DateTime(timezone=True), nullable=False, active_history=True)
     status: Mapped[str] = mapped_column(
         STATUS_ENUM, nullable=False, default="pendiente")
     notes: Mapped[Optional[str]] = mapped_column(db.Text)
@@ -139,16 +183,33 @@ class Appointment(db.Model):
     )
     service: Mapped["Service"] = relationship("Service")
 
-    def serialize(self):
-        return {
-            "appointment_id": self.appointment_id,
-            "client": self.client.serialize(),
-            "barber": self.barber.serialize(),
-            "service": self.service.serialize(),
-            "appointment_date": self.appointment_date.isoformat(),
-            "status": self.status,
-            "notes": self.notes
-        }
+    SERIALIZE_FIELDS = {
+        "appointment_id": Field("appointment_id"),
+        "client_id": Field("client_id"),
+        "barber_id": Field("barber_id"),
+        "service_id": Field("service_id"),
+        "appointment_date": Field("appointment_date"),
+        "status": Field("status"),
+        "notes": Field("notes"),
+    }
+    SERIALIZE_RELATIONS = {"client": "client_id", "barber": "barber_id", "service": "service_id"}
+    SERIALIZE_DEFAULT = ("appointment_id", "client", "barber", "service",
+                         "appointment_date", "status", "notes")
+
+    @staticmethod
+    def serialize_loader(fieldset=None):
+        """Opciones de carga para listar con serialize() sin N+1 (1 query por relacion)."""
+        if fieldset:
+            # appointment_date: clave del cursor de los listados
+            return fieldset.options("appointment_date")
+        return (
+            selectinload(Appointment.client),
+            selectinload(Appointment.barber),
+            selectinload(Appointment.service),
+        )
+
+    def serialize(self, fieldset=None):
+        return (fieldset or default_fieldset(Appointment)).dump(self)
 
 
 class Payment(db.Model):
@@ -156,13 +217,21 @@ class Payment(db.Model):
     __table_args__ = (
         UniqueConstraint("stripe_session_id",
                          name="uq_payments_stripe_session_id"),
+        # pagos recientes / ventas por fecha
+        Index("ix_payments_paid_at", "paid_at"),
+        Index("ix_payments_status_paid_at", "status", "paid_at"),
+        # mis pagos
+        Index("ix_payments_payer_user_id_paid_at",
+              "payer_user_id", "paid_at"),
+        Index("ix_payments_appointment_id", "appointment_id"),
     )
     payment_id: Mapped[int] = mapped_column(primary_key=True)
     # permitir pagos SIN cita
+    # (active_history en los campos de ROLLUP_FIELDS: ver rollup.py)
     appointment_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey("appointments.appointment_id",
                    name="fk_payments_appointment_id"),
-        nullable=True
+        nullable=True, active_history=True
     )
     #  quién pagó (cliente) ojo analizar bien esto
 
@@ -173,17 +242,17 @@ class Payment(db.Model):
         ),
         nullable=True
     )
-    amount: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
+    amount: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False, active_history=True)
     method: Mapped[str] = mapped_column(
-        PAYMENT_METHOD_ENUM, nullable=False, default="efectivo"
+        PAYMENT_METHOD_ENUM, nullable=False, default="efectivo", active_history=True
     )
     status: Mapped[str] = mapped_column(
-        PAYMENT_STATUS_ENUM, nullable=False, default="pagado"  # pendiente chap
+        PAYMENT_STATUS_ENUM, nullable=False, default="pagado", active_history=True  # pendiente chap
     )
     paid_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
-        nullable=False
+        nullable=False, active_history=True
     )
     # usuario que cobró: admin o barbero
     created_by_user_id: Mapped[int] = mapped_column(
@@ -209,15 +278,173 @@ class Payment(db.Model):
     created_by: Mapped["Usuario"] = relationship(
         "Usuario", foreign_keys=[created_by_user_id])
 
+    SERIALIZE_FIELDS = {
+        "payment_id": Field("payment_id"),
+        "appointment_id": Field("appointment_id"),
+        "payer_user_id": Field("payer_user_id"),
+        "amount": Field("amount"),
+        "method": Field("method"),
+        "status": Field("status"),
+        "paid_at": Field("paid_at"),
+        "created_by_user_id": Field("created_by_user_id"),
+        "created_by_name": Field("created_by_user_id",
+                                 lambda p: p.created_by.name if p.created_by else None,
+                                 related={"created_by": ("name",)}),
+        "notes": Field("notes"),
+    }
+    SERIALIZE_RELATIONS = {"appointment": "appointment_id", "payer": "payer_user_id",
+                           "created_by": "created_by_user_id"}
+    SERIALIZE_DEFAULT = ("payment_id", "appointment_id", "amount", "method", "status", "paid_at",
+                         "created_by_user_id", "created_by_name", "notes")
+
+    @staticmethod
+    def serialize_loader(fieldset=None):
+        """Opciones de carga para listar con serialize() sin N+1."""
+        if fieldset:
+            return fieldset.options("paid_at")
+        return (selectinload(Payment.created_by),)
+
+    def serialize(self, fieldset=None):
+        return (fieldset or default_fieldset(Payment)).dump(self)
+
+
+class DailySalesRollup(db.Model):
+    """Ventas acumuladas por dia (zona de la barberia), barbero, metodo y estado."""
+    __tablename__ = "daily_sales_rollup"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # 0 = pago sin cita (pago directo)
+    barber_id: Mapped[int] = mapped_column(primary_key=True, default=0)
+    method: Mapped[str] = mapped_column(
+        PAYMENT_METHOD_ENUM, primary_key=True)
+    status: Mapped[str] = mapped_column(
+        PAYMENT_STATUS_ENUM, primary_key=True)
+    count: Mapped[int] = mapped_column(nullable=False, default=0)
+    total: Mapped[float] = mapped_column(
+        Numeric(12, 2), nullable=False, default=0)
+
     def serialize(self):
         return {
-            "payment_id": self.payment_id,
-            "appointment_id": self.appointment_id,
-            "amount": float(self.amount),
+            "day": self.day,
+            "barber_id": self.barber_id,
             "method": self.method,
             "status": self.status,
-            "paid_at": self.paid_at.isoformat() if self.paid_at else None,
-            "created_by_user_id": self.created_by_user_id,
-            "created_by_name": self.created_by.name if self.created_by else None,
-            "notes": self.notes
+            "count": self.count,
+            "total": self.total
         }
+
+
+class CheckoutJob(db.Model):
+    """Outbox: sesiones de Stripe Checkout que crea el worker fuera del request."""
+    __tablename__ = "checkout_jobs"
+    __table_args__ = (
+        # cola del worker
+        Index("ix_checkout_jobs_status_available_at", "status", "available_at"),
+    )
+    # uuid (no adivinable); ademas solo lo consulta su dueño (created_by_user_id)
+    job_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    status: Mapped[str] = mapped_column(
+        JOB_STATUS_ENUM, nullable=False, default="pendiente")
+    # kwargs de stripe.checkout.Session.create
+    params: Mapped[dict] = mapped_column(JSON, nullable=False)
+    created_by_user_id: Mapped[Optional[int]] = mapped_column(nullable=True)
+    session_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    checkout_url: Mapped[Optional[str]] = mapped_column(db.Text, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(db.Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+
+    def serialize(self):
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "checkout_url": self.checkout_url,
+            "session_id": self.session_id,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at
+        }
+
+
+class StripeWebhookEvent(db.Model):
+    """Inbox de webhooks de Stripe: el evento crudo, procesado despues por el worker."""
+    __tablename__ = "stripe_webhook_events"
+    __table_args__ = (
+        # cola del worker
+        Index("ix_stripe_webhook_events_status_received_at", "status", "received_at"),
+    )
+    # evt_... de Stripe: un reintento del mismo evento no crea otra fila
+    event_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    type: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[str] = mapped_column(db.Text, nullable=False)
+    status: Mapped[str] = mapped_column(
+        WEBHOOK_STATUS_ENUM, nullable=False, default="pendiente")
+    error: Mapped[Optional[str]] = mapped_column(db.Text, nullable=True)
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    processed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True)
+
+    def serialize(self):
+        return {
+            "event_id": self.event_id,
+            "type": self.type,
+            "status": self.status,
+            "error": self.error,
+            "received_at": self.received_at,
+            "processed_at": self.processed_at
+        }
+
+
+class IdempotencyKey(db.Model):
+    """Primera respuesta de un POST con Idempotency-Key, para contestar los reintentos."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # purga periodica de vencidas
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+    # "METODO /ruta usuario": la misma clave en otra ruta u otro usuario es otra entrada
+    scope: Mapped[str] = mapped_column(String(255), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # sha256 del cuerpo: la misma clave con otro cuerpo es un error del cliente
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    # procesando | listo
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="procesando")
+    response_status: Mapped[Optional[int]] = mapped_column(nullable=True)
+    response_body: Mapped[Optional[str]] = mapped_column(db.Text, nullable=True)
+    response_mimetype: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class BarberDayAgenda(db.Model):
+    """Ocupacion precalculada de un barbero en un dia local (SHOP_TIMEZONE): un bit por franja de AGENDA_SLOT_MINUTES."""
+    __tablename__ = "barber_day_agenda"
+    barber_id: Mapped[int] = mapped_column(
+        ForeignKey("usuarios.user_id", name="fk_barber_day_agenda_barber_id"),
+        primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # bit i (MSB primero) = franja [00:00 + i*slot, 00:00 + (i+1)*slot) ocupada, en hora local
+    slots: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    # ids de las citas activas que empiezan ese dia, por hora
+    appointment_ids: Mapped[list] = mapped_column(JSON, nullable=False)
@@ -0,0 +1,92 @@
+"""
+Paginacion por cursor (keyset) para los listados.
+
+En vez de OFFSET usamos la clave de orden del ultimo registro devuelto:
+  WHERE (fecha, id) < (:fecha, :id) ORDER BY fecha DESC, id DESC LIMIT n
+asi cada pagina cuesta lo mismo aunque la tabla crezca.
+El cursor es opaco para el cliente (base64 de la clave).
+Solo se pagina si el cliente lo pide (?limit= o ?cursor=); sin ellos la
+lista sale completa como antes, asi los clientes viejos no pierden filas.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+
+from dateutil import parser
+from flask import request
+from sqlalchemy import and_, or_
+from api.utils import APIException
+
+DEFAULT_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 500))
+
+
+def wants_page():
+    return "limit" in request.args or "cursor" in request.args
+
+
+def page_size():
+    """?limit=N acotado a [1, MAX_PAGE_SIZE]."""
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    raw = [{"dt": v.isoformat()} if isinstance(v, datetime) else v
+           for v in values]
+    return base64.urlsafe_b64encode(
+        json.dumps(raw, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [parser.isoparse(v["dt"]) if isinstance(v, dict) else v
+                  for v in raw]
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise APIException("cursor inválido", 400, {"ok": False})
+    if len(values) != size:
+        raise APIException("cursor inválido", 400, {"ok": False})
+    return values
+
+
+def _after(keys, values):
+    """Condicion "viene despues de values" para el orden dado por keys."""
+    column, descending = keys[0]
+    value = values[0]
+    beyond = column < value if descending else column > value
+    if len(keys) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(keys[1:], values[1:])))
+
+
+def order_keyset(query, keys):
+    """Aplica el orden de keys y, si viene ?cursor=, arranca despues de el."""
+    cursor = request.args.get("cursor")
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, len(keys))))
+    return query.order_by(*[column.desc() if descending else column.asc()
+                            for column, descending in keys])
+
+
+def paginate(query, keys, limit=None):
+    """
+    Aplica orden + cursor a una query ORM.
+    keys: lista de (columna, descendente), la ultima debe ser unica (PK).
+    Devuelve (filas, next_cursor); next_cursor es None en la ultima pagina
+    o si no se pidio paginar (todas las filas).
+    """
+    if limit is None and not wants_page():
+        return order_keyset(query, keys).all(), None
+    limit = limit or page_size()
+    rows = order_keyset(query, keys).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(
+            [getattr(rows[-1], column.key) for column, _ in keys])
+    return rows, next_cursor
@@ -0,0 +1,98 @@
+"""
+Hash y verificacion de passwords con bcrypt.
+
+- Costo configurable (BCRYPT_LOG_ROUNDS) y rehash transparente en el login
+  cuando el hash guardado tiene otro costo (needs_rehash).
+- El trabajo de bcrypt corre en un pool acotado (PASSWORD_HASH_EXECUTOR =
+  thread | process | inline) con un limite de operaciones en curso
+  (PASSWORD_HASH_MAX_PENDING): en una avalancha de logins los requests que
+  no consiguen turno a tiempo reciben 503 en vez de acaparar workers.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import bcrypt
+from api.utils import APIException
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 16))
+HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_MAX_PENDING)
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                pool = ProcessPoolExecutor if HASH_EXECUTOR == "process" else ThreadPoolExecutor
+                _executor = pool(max_workers=HASH_WORKERS)
+    return _executor
+
+
+def _busy():
+    return APIException("Servidor ocupado, intenta de nuevo", 503, {"ok": False})
+
+
+def _run(fn, *args):
+    if HASH_EXECUTOR == "inline":
+        return fn(*args)
+    if not _slots.acquire(timeout=HASH_TIMEOUT):
+        raise _busy()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # el turno se libera cuando el trabajo termina (o se cancela), no cuando nos
+    # cansamos de esperar: asi nunca hay mas de HASH_MAX_PENDING en el pool
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()  # si todavia estaba en cola no llega a correr
+        raise _busy()
+
+
+def _to_bytes(value):
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+def hash_password(password, rounds=None):
+    """Devuelve el hash bcrypt (str) con el costo configurado."""
+    return _run(_hashpw, _to_bytes(password), rounds or BCRYPT_ROUNDS).decode("utf-8")
+
+
+def check_password(password_hash, password):
+    """Mismo orden de argumentos que flask_bcrypt.check_password_hash."""
+    try:
+        return _run(_checkpw, _to_bytes(password), _to_bytes(password_hash))
+    except ValueError:
+        # hash con formato invalido
+        return False
+
+
+def hash_cost(password_hash):
+    try:
+        return int(password_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    return hash_cost(password_hash) != BCRYPT_ROUNDS
@@ -0,0 +1,159 @@
+"""
+Log de queries lentas con el endpoint que las ejecuto.
+
+Con eventos del engine de `db` se mide cada sentencia. Por sentencia solo
+se suma el tiempo bajo su SQL tal cual (las compiladas se repiten
+identicas, es un acceso a un dict); normalizar (literales -> ?, listas IN
+colapsadas) y sacar la huella se hace al pedir el top, que junta las
+sentencias por huella, o al loguear una que pasa de SLOW_QUERY_MS (con la
+forma de los parametros, la duracion, el endpoint y las filas si el driver
+las conoce: en un SELECT de SQLite rowcount es -1).
+
+Los agregados son por proceso; GET /api/admin/slow-queries muestra el top N.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from api.models import db
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# tope de sentencias distintas en memoria
+QUERY_LOG_MAX_FINGERPRINTS = int(os.getenv("QUERY_LOG_MAX_FINGERPRINTS", 1000))
+
+ORDER_CHOICES = ("total", "max", "count", "slow")
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_POSTCOMPILE = re.compile(r"__\[POSTCOMPILE_\w+\]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(statement):
+    sql = _STRING.sub("?", statement)
+    sql = _POSTCOMPILE.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _shape(params):
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [type(value).__name__ for value in params]
+    return type(params).__name__
+
+
+def params_shape(parameters, executemany):
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "row": _shape(rows[0]) if rows else None}
+    return _shape(parameters)
+
+
+class QueryStats:
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement, endpoint, elapsed_ms, slow):
+        with self._lock:
+            item = self._stats.get(statement)
+            if item is None:
+                if len(self._stats) >= QUERY_LOG_MAX_FINGERPRINTS:
+                    return
+                item = self._stats[statement] = {
+                    "count": 0, "slow_count": 0, "total_ms": 0.0, "max_ms": 0.0, "endpoints": {}}
+            item["count"] += 1
+            item["total_ms"] += elapsed_ms
+            item["max_ms"] = max(item["max_ms"], elapsed_ms)
+            if slow:
+                item["slow_count"] += 1
+            endpoints = item["endpoints"]
+            endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+
+    def by_fingerprint(self):
+        """Agregados por huella (varias sentencias pueden normalizar igual)."""
+        with self._lock:
+            raw = [(statement, {**item, "endpoints": dict(item["endpoints"])})
+                   for statement, item in self._stats.items()]
+        groups = {}
+        for statement, item in raw:
+            normalized = normalize(statement)
+            key = fingerprint(normalized)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = {"fingerprint": key, "sql": normalized, **item}
+                continue
+            for field in ("count", "slow_count", "total_ms"):
+                group[field] += item[field]
+            group["max_ms"] = max(group["max_ms"], item["max_ms"])
+            for endpoint, count in item["endpoints"].items():
+                group["endpoints"][endpoint] = group["endpoints"].get(endpoint, 0) + count
+        return list(groups.values())
+
+    def top(self, limit=20, order="total"):
+        field = {"total": "total_ms", "max": "max_ms", "count": "count", "slow": "slow_count"}[order]
+        items = sorted(self.by_fingerprint(), key=lambda item: item[field], reverse=True)[:limit]
+        return [{
+            **item,
+            "total_ms": round(item["total_ms"], 3),
+            "max_ms": round(item["max_ms"], 3),
+            "avg_ms": round(item["total_ms"] / item["count"], 3),
+            "endpoints": dict(sorted(item["endpoints"].items(), key=lambda e: -e[1])),
+        } for item in items]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+stats = QueryStats()
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or request.path
+    return "(sin request)"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._querylog_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_querylog_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    slow = elapsed_ms >= SLOW_QUERY_MS
+    endpoint = _endpoint()
+    stats.record(statement, endpoint, elapsed_ms, slow)
+    if slow:
+        normalized = normalize(statement)
+        # -1 = el driver no lo sabe (SELECT en SQLite): no se loguea
+        rows = cursor.rowcount
+        logger.warning(
+            "slow query %.1fms [%s] endpoint=%s%s params=%s sql=%s",
+            elapsed_ms, fingerprint(normalized), endpoint,
+            f" rows={rows}" if rows is not None and rows >= 0 else "",
+            params_shape(parameters, executemany), normalized)
+
+
+def setup_query_log(app):
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,190 @@
+"""
+Tabla daily_sales_rollup mantenida de forma incremental.
+
+Cada flush que inserta, modifica o borra un Payment aplica el delta
+(count, total) a su fila (dia, barbero, metodo, estado) con un upsert,
+en la misma transaccion que el pago. Si una cita cambia de barbero, sus
+pagos pasan de la fila del barbero anterior a la del nuevo. Asi los
+reportes leen unas cientos de filas en vez de recorrer payments.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from api.availability import to_utc
+from api.models import db, Appointment, Payment, DailySalesRollup
+from api.sales import shop_zone
+
+ROLLUP_FIELDS = ("appointment_id", "amount", "method", "status", "paid_at")
+
+
+def _barber_for(conn, appointment_id, cache):
+    if not appointment_id:
+        return 0
+    if appointment_id not in cache:
+        cache[appointment_id] = conn.execute(
+            select(Appointment.barber_id)
+            .where(Appointment.appointment_id == appointment_id)).scalar() or 0
+    return cache[appointment_id]
+
+
+def rollup_key(conn, values, zone, cache):
+    """(day, barber_id, method, status) a partir de los valores de un pago."""
+    day = to_utc(values["paid_at"]).astimezone(zone).date()
+    return (day, _barber_for(conn, values["appointment_id"], cache),
+            values["method"], values["status"])
+
+
+def apply_deltas(conn, deltas):
+    """deltas: {(day, barber_id, method, status): [count, total]} -> upsert."""
+    rows = [{"day": day, "barber_id": barber_id, "method": method, "status": status,
+             "count": count, "total": total}
+            for (day, barber_id, method, status), (count, total) in deltas.items()
+            if count or total]
+    if not rows:
+        return
+
+    table = DailySalesRollup.__table__
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.barber_id,
+                            table.c.method, table.c.status],
+            set_={"count": table.c.count + stmt.excluded.count,
+                  "total": table.c.total + stmt.excluded.total})
+        conn.execute(stmt, rows)
+        return
+
+    # otros motores: update y, si no existia, insert
+    for row in rows:
+        key = ((table.c.day == row["day"]) & (table.c.barber_id == row["barber_id"])
+               & (table.c.method == row["method"]) & (table.c.status == row["status"]))
+        updated = conn.execute(table.update().where(key).values(
+            count=table.c.count + row["count"],
+            total=table.c.total + row["total"]))
+        if not updated.rowcount:
+            conn.execute(table.insert().values(**row))
+
+
+def _values(payment, old):
+    """Valores actuales del pago, o los previos al flush si old=True."""
+    state = inspect(payment)
+    values = {}
+    for field in ROLLUP_FIELDS:
+        history = state.attrs[field].history
+        if old and history.deleted:
+            values[field] = history.deleted[0]
+        else:
+            values[field] = getattr(payment, field)
+    return values
+
+
+def _amount(value):
+    return Decimal(str(value or 0))
+
+
+def moved_appointments(session):
+    """{appointment_id: (barbero anterior, barbero nuevo)} de las citas que cambian de barbero."""
+    moved = {}
+    for obj in session.dirty:
+        if isinstance(obj, Appointment):
+            history = inspect(obj).attrs["barber_id"].history
+            if history.deleted and history.deleted[0] != obj.barber_id:
+                moved[obj.appointment_id] = (history.deleted[0], obj.barber_id)
+    return moved
+
+
+def payment_deltas(session):
+    conn = session.connection()
+    zone = shop_zone()
+    moved = moved_appointments(session)
+    # tras el flush la base ya tiene el barbero nuevo: los valores previos usan el anterior
+    cache = {}
+    old_cache = {appointment_id: old for appointment_id, (old, _) in moved.items()}
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+
+    def add(values, sign, barbers):
+        delta = deltas[rollup_key(conn, values, zone, barbers)]
+        delta[0] += sign
+        delta[1] += sign * _amount(values["amount"])
+
+    touched = set()
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            add(_values(obj, old=False), 1, cache)
+    for obj in session.dirty:
+        if isinstance(obj, Payment) and session.is_modified(obj):
+            touched.add(obj.payment_id)
+            state = inspect(obj)
+            if (any(state.attrs[f].history.has_changes() for f in ROLLUP_FIELDS)
+                    or obj.appointment_id in moved):
+                add(_values(obj, old=True), -1, old_cache)
+                add(_values(obj, old=False), 1, cache)
+    for obj in session.deleted:
+        if isinstance(obj, Payment):
+            touched.add(obj.payment_id)
+            add(_values(obj, old=True), -1, old_cache)
+
+    if moved:
+        # los pagos que no cambiaron en este flush se mueven tal cual
+        q = (select(Payment.paid_at, Payment.appointment_id, Payment.method,
+                    Payment.status, Payment.amount)
+             .where(Payment.appointment_id.in_(list(moved))))
+        if touched:
+            q = q.where(Payment.payment_id.not_in(touched))
+        for row in conn.execute(q):
+            values = dict(row._mapping)
+            add(values, -1, old_cache)
+            add(values, 1, cache)
+    return deltas
+
+
+def inserted_deltas(conn, rows):
+    """Deltas de pagos insertados con Core (no pasan por el after_flush)."""
+    zone = shop_zone()
+    cache = {}
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for values in rows:
+        delta = deltas[rollup_key(conn, values, zone, cache)]
+        delta[0] += 1
+        delta[1] += _amount(values["amount"])
+    return deltas
+
+
+def _after_flush(session, flush_context):
+    if not any(isinstance(obj, (Payment, Appointment))
+               for obj in (*session.new, *session.dirty, *session.deleted)):
+        return
+    apply_deltas(session.connection(), payment_deltas(session))
+
+
+def setup_sales_rollup(app):
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+
+def rebuild_rollup(batch_size=5000):
+    """Recalcula daily_sales_rollup desde payments (una sola pasada)."""
+    conn = db.session.connection()
+    zone = shop_zone()
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    q = (
+        select(Payment.paid_at, func.coalesce(Appointment.barber_id, 0),
+               Payment.method, Payment.status, Payment.amount)
+        .outerjoin(Appointment, Payment.appointment_id == Appointment.appointment_id)
+        .execution_options(yield_per=batch_size)
+    )
+    for paid_at, barber_id, method, status, amount in conn.execute(q):
+        delta = deltas[(to_utc(paid_at).astimezone(zone).date(),
+                        barber_id, method, status)]
+        delta[0] += 1
+        delta[1] += _amount(amount)
+
+    conn.execute(DailySalesRollup.__table__.delete())
+    apply_deltas(conn, deltas)
+    db.session.commit()
+    return len(deltas)
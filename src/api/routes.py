@@ -2,24 +2,36 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 from flask import Flask, request, jsonify, url_for, Blueprint
-from api.models import db, User, Usuario, Service, Appointment, Payment
+from api.models import db, User, Usuario, Service, Appointment, Payment, CheckoutJob
 from api.utils import generate_sitemap, APIException
 from flask_cors import CORS
 from sqlalchemy.exc import SQLAlchemyError
-from api.auth import get_current_user, require_roles
+from api.auth import jwt_user_id, get_current_user, require_roles, user_status
+from api.passwords import check_password, hash_password, needs_rehash
+from api.pagination import order_keyset, page_size, paginate
+from api.cache import cached_response, invalidate
+from api.streaming import ndjson_response, wants_ndjson
+from api.fields import load_included, requested_fields, wants_normalized
+from api.sales import GROUP_BY_CHOICES, SHOP_TIMEZONE, aggregate_rollup, aggregate_sales, local_day_bounds, shop_zone
+from api.querylog import ORDER_CHOICES, stats as query_stats
+from api.webhooks import store_event, webhook_worker
+from api.idempotency import idempotent
+from api.agenda import AGENDA_SLOT_MINUTES, MAX_AGENDA_DAYS, load_agenda, local_day, refresh_days
+from api.checkout import CHECKOUT_POLL_MAX_SECONDS, checkout_response, enqueue_checkout, wait_for_job
+from api.availability import SHOP_WINDOW_MINUTES, find_conflicts, free_slots, index_appointment, index_interval, load_window, lock_barber, to_utc, unindex_appointment
 
 # importaciones nuevas
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 
 from datetime import timedelta, timezone, datetime
 from dateutil import parser
 
-from sqlalchemy import or_
+from sqlalchemy import insert, or_, select, union
 # ==========
 # Stripe config
 # ==========
 import os
+import json
 import stripe
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -43,7 +55,6 @@ CORS(api)
 
 # nuevas instancias necesarias
 jwt = JWTManager()
-bcrypt = Bcrypt()
 
 
 # def validate_required(data, required_fields):
@@ -84,7 +95,7 @@ def add_user():
         user = User.query.filter_by(email=existente).first()
         if user:
             return jsonify({"data": user.serialize(), "ok": False, "message": f"Usuario {existente} ya esta Registrado Verifique...", "details": "none"}), 404
-        password_hash = bcrypt.generate_password_hash(pw).decode("utf-8")
+        password_hash = hash_password(pw)
         print("clean_data", clean_data, "password", password_hash)
         clean_data["password"] = password_hash
         new_user = User(**clean_data)
@@ -150,8 +161,12 @@ def login():
         if not login_user:
             return jsonify({"message": "Invalid email"}), 404
         password_from_db = login_user.password
-        resultado = bcrypt.check_password_hash(password_from_db, password)
+        resultado = check_password(password_from_db, password)
         if resultado:
+            # el costo de bcrypt cambio: guardamos el hash nuevo aprovechando el password en claro
+            if needs_rehash(password_from_db):
+                login_user.password = hash_password(password)
+                db.session.commit()
             # pueden ser "hours", "minutes", "days", "seconds"
             expires = timedelta(days=1)
             user_id = login_user.user_id
@@ -166,6 +181,8 @@ def login():
             return jsonify({"access_token": access_token, "ok": True, "user": login_user.serialize()}), 200
         else:
             return jsonify({"message": "invalid password/email", "ok": False}), 404
+    except APIException:
+        raise  # 503 del pool de hashing
     except Exception as e:
         return jsonify({"message": "se registro un error", "details": str(e)}), 500
 
@@ -173,8 +190,10 @@ def login():
 ########## ########## ########## ##########     (RUTAS - TABLA USUARIO)     ########## ########## ########## ##########
 @api.route("/usuarios", methods=["GET"])
 def all_usuarios():
-    data = Usuario.query.all()
-    return jsonify({"data": [user.serialize() for user in data], "message": "mensage", "ok": True, "details": "none"}), 200
+    fieldset = requested_fields(Usuario)
+    data, next_cursor = paginate(Usuario.query.options(*Usuario.serialize_loader(fieldset)),
+                                 [(Usuario.user_id, False)])
+    return jsonify({"data": [user.serialize(fieldset) for user in data], "next_cursor": next_cursor, "message": "mensage", "ok": True, "details": "none"}), 200
 
 
 @api.route("/usuario/cliente", methods=["POST"])  # cliente creado por cliente
@@ -198,7 +217,7 @@ def add_usuario_cliente():
         user = Usuario.query.filter_by(email=existente).first()
         if user:
             return jsonify({"data": Usuario.serialize(), "ok": False, "message": f"Usuario {existente} ya esta Registrado Verifique...", "details": "none"}), 404
-        password_hash = bcrypt.generate_password_hash(pw).decode("utf-8")
+        password_hash = hash_password(pw)
         clean_data["password"] = password_hash
         new_user = Usuario(**clean_data)
         db.session.add(new_user)
@@ -207,6 +226,8 @@ def add_usuario_cliente():
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({"message": "Error en la base de datos", "details": str(e), "ok": False, "data": "none"}), 500
+    except APIException:
+        raise
     except Exception as e:
         return jsonify({"message": "Error en el servidor", "details": str(e), "ok": False, "data": "none"}), 500
 
@@ -234,15 +255,18 @@ def add_usuario_barber_admin():
         user = Usuario.query.filter_by(email=existente).first()
         if user:
             return jsonify({"data": Usuario.serialize(), "ok": False, "message": f"Usuario {existente} ya esta Registrado Verifique...", "details": "none"}), 404
-        password_hash = bcrypt.generate_password_hash(pw).decode("utf-8")
+        password_hash = hash_password(pw)
         clean_data["password"] = password_hash
         new_user = Usuario(**clean_data)
         db.session.add(new_user)
         db.session.commit()
+        invalidate("barbers")
         return jsonify({"data": new_user.serialize(), "ok": True, "message": "Usuario Creado Sastifactoriamente", "details": "none"}), 201
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({"message": "Error en la base de datos", "details": str(e), "ok": False, "data": "none"}), 500
+    except APIException:
+        raise
     except Exception as e:
         return jsonify({"message": "Error en el servidor", "details": str(e), "ok": False, "data": "none"}), 500
 
@@ -286,7 +310,7 @@ def admin_create_user():
         }), 409
 
     # Hash del password
-    password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+    password_hash = hash_password(password)
 
     new_user = Usuario(
         name=name,
@@ -301,6 +325,7 @@ def admin_create_user():
     try:
         db.session.add(new_user)
         db.session.commit()
+        invalidate("barbers")
         return jsonify({
             "ok": True,
             "message": "Usuario creado correctamente",
@@ -320,10 +345,16 @@ def admin_create_user():
 @api.route("/admin/users", methods=["GET"])  # admin lista usuarios
 @require_roles()
 def admin_list_users():
-    users = Usuario.query.order_by(Usuario.user_id.desc()).all()
+    fieldset = requested_fields(Usuario)
+    q = Usuario.query.options(*Usuario.serialize_loader(fieldset))
+    keys = [(Usuario.user_id, True)]
+    if wants_ndjson():
+        return ndjson_response(order_keyset(q, keys), lambda u: u.serialize(fieldset))
+    users, next_cursor = paginate(q, keys)
     return jsonify({
         "ok": True,
-        "data": [u.serialize() for u in users]
+        "data": [u.serialize(fieldset) for u in users],
+        "next_cursor": next_cursor
     }), 200
 
 
@@ -347,21 +378,22 @@ def update_usuario(user_id):
     usuario.specialties = data.get("specialties")
 
     if data.get("password"):
-        usuario.password = bcrypt.generate_password_hash(
-            data["password"].decode("utf-8"))
+        usuario.password = hash_password(data["password"])
 
     db.session.commit()
+    invalidate("barbers", "auth")
 
     return jsonify({"ok": True, "result": usuario.serialize()}), 200
 
 
 @api.route("/usuario/<int:user_id>", methods=["GET"])
 def get_usuario(user_id):
-    usuario = Usuario.query.get(user_id)
+    fieldset = requested_fields(Usuario)
+    usuario = db.session.get(Usuario, user_id, options=Usuario.serialize_loader(fieldset))
     if not usuario:
         return jsonify({"ok": False, "message": "Usuario no encontrado"}), 404
 
-    return jsonify({"ok": True, "result": usuario.serialize()}), 200
+    return jsonify({"ok": True, "result": usuario.serialize(fieldset)}), 200
 
 
 @api.route("/admin/user/<int:id>", methods=["DELETE"])
@@ -381,6 +413,7 @@ def admin_delete_user(id):
 
     db.session.delete(user)
     db.session.commit()
+    invalidate("barbers", "auth")
     return jsonify({"ok": True, "message": "Usuario eliminado"}), 200
 
 ########## ########## ########## ##########     (FIN  - TABLA USUARIO)     ########## ########## ########## ##########
@@ -393,17 +426,21 @@ def admin_delete_user(id):
 
 
 @api.route("/services", methods=["GET"])  # listar todos los servicios
+@cached_response("services", args=("fields", "expand"))
 def list_services():
-    services = Service.query.all()
-    return jsonify({"ok": True, "data": [s.serialize() for s in services]}), 200
+    fieldset = requested_fields(Service)
+    services = Service.query.options(*Service.serialize_loader(fieldset)).all()
+    return jsonify({"ok": True, "data": [s.serialize(fieldset) for s in services]}), 200
 
 
 @api.route("/services/<int:service_id>", methods=["GET"])
+@cached_response("services", args=("fields", "expand"))
 def get_service(service_id):
-    service = db.session.get(Service, service_id)
+    fieldset = requested_fields(Service)
+    service = db.session.get(Service, service_id, options=Service.serialize_loader(fieldset))
     if not service:
         return jsonify({"ok": False, "message": "Servicio no encontrado"}), 404
-    return jsonify({"ok": True, "data": service.serialize()}), 200
+    return jsonify({"ok": True, "data": service.serialize(fieldset)}), 200
 
 
 # crear servicios solo usuarios admonistradores
@@ -432,6 +469,7 @@ def create_service():
     )
     db.session.add(service)
     db.session.commit()
+    invalidate("services")
     return jsonify({"ok": True, "data": service.serialize()}), 201
 
 #######
@@ -463,6 +501,7 @@ def update_service(service_id):
         service.duration_minutes = int(data.get("duration_minutes"))
 
     db.session.commit()
+    invalidate("services")
     return jsonify({"ok": True, "data": service.serialize()}), 200
 
 
@@ -485,6 +524,7 @@ def delete_service(service_id):
 
     db.session.delete(service)
     db.session.commit()
+    invalidate("services")
     return jsonify({"ok": True, "message": "Servicio eliminado"}), 200
 
 ########## ########## ########## ##########     (FIN - TABLA SERVICIOS)     ########## ########## ########## ##########
@@ -496,11 +536,91 @@ def delete_service(service_id):
 
 @api.route("/barbers", methods=["GET"])  # listar barberos
 # @jwt_required()
+@cached_response("barbers", args=("fields", "expand", "limit", "cursor"))
 def list_barbers():
-    barbers = Usuario.query.filter(
+    fieldset = requested_fields(Usuario)
+    barbers, next_cursor = paginate(Usuario.query.options(*Usuario.serialize_loader(fieldset)).filter(
         # modificar porque cambie is_admin
-        Usuario.role.in_(["barbero", "admin"])).all()
-    return jsonify({"ok": True, "data": [b.serialize() for b in barbers]}), 200
+        Usuario.role.in_(["barbero", "admin"])), [(Usuario.user_id, False)])
+    return jsonify({"ok": True, "data": [b.serialize(fieldset) for b in barbers], "next_cursor": next_cursor}), 200
+
+
+# huecos libres de un barbero: ?date=YYYY-MM-DD&service_id=1 (o &duration=30)
+@api.route("/barbers/<int:barber_id>/availability", methods=["GET"])
+def barber_availability(barber_id):
+    barber = db.session.get(Usuario, barber_id)
+    if not barber or barber.role not in ("barbero", "admin"):
+        return jsonify({"ok": False, "message": "Barbero inválido"}), 404
+
+    date_str = request.args.get("date")
+    if not date_str:
+        return jsonify({"ok": False, "message": "date es requerido (usa YYYY-MM-DD)"}), 400
+    try:
+        day = parser.isoparse(date_str).date()
+    except Exception:
+        return jsonify({"ok": False, "message": "date inválida (usa YYYY-MM-DD)"}), 400
+
+    duration = request.args.get("duration", 30, type=int)
+    service_id = request.args.get("service_id", type=int)
+    if service_id:
+        service = db.session.get(Service, service_id)
+        if not service:
+            return jsonify({"ok": False, "message": "Servicio inválido"}), 400
+        duration = service.duration_minutes
+    if duration <= 0 or duration > SHOP_WINDOW_MINUTES:
+        return jsonify({"ok": False, "message": f"duration debe estar entre 1 y {SHOP_WINDOW_MINUTES} minutos"}), 400
+    step = request.args.get("step", type=int)
+    if step is not None and not 0 < step <= SHOP_WINDOW_MINUTES:
+        return jsonify({"ok": False, "message": f"step debe estar entre 1 y {SHOP_WINDOW_MINUTES} minutos"}), 400
+
+    slots = free_slots(barber_id, day, duration, step)
+    return jsonify({
+        "ok": True,
+        "data": {
+            "barber_id": barber_id,
+            "date": day,
+            "duration_minutes": duration,
+            "slots": [{"start": start, "end": end} for start, end in slots]
+        }
+    }), 200
+
+
+# agenda compacta del barbero: ?from=YYYY-MM-DD&to=YYYY-MM-DD (7 dias por defecto)
+# dias locales de la barberia (SHOP_TIMEZONE); cada dia: bitmap en base64
+# (bit i = franja de AGENDA_SLOT_MINUTES desde las 00:00 locales) + ids de citas
+@api.route("/barbers/<int:barber_id>/agenda", methods=["GET"])
+@jwt_required()
+def barber_agenda(barber_id):
+    user_id = jwt_user_id()
+    is_active, is_admin = user_status(user_id) if user_id else (False, False)
+    if not is_active:
+        return jsonify({"ok": False, "message": "Usuario no autenticado"}), 401
+    if user_id != barber_id and not (is_admin and get_jwt().get("is_admin", True)):
+        return jsonify({"ok": False, "message": "No autorizado"}), 403
+
+    try:
+        day_from = parser.isoparse(request.args["from"]).date() if request.args.get("from") \
+            else local_day(datetime.now(timezone.utc))
+        day_to = parser.isoparse(request.args["to"]).date() if request.args.get("to") \
+            else day_from + timedelta(days=6)
+    except Exception:
+        return jsonify({"ok": False, "message": "from/to inválidas (usa YYYY-MM-DD)"}), 400
+    if day_to < day_from:
+        return jsonify({"ok": False, "message": "to debe ser posterior a from"}), 400
+    if (day_to - day_from).days >= MAX_AGENDA_DAYS:
+        return jsonify({"ok": False, "message": f"Máximo {MAX_AGENDA_DAYS} días por consulta"}), 400
+
+    return jsonify({
+        "ok": True,
+        "data": {
+            "barber_id": barber_id,
+            "from": day_from,
+            "to": day_to,
+            "slot_minutes": AGENDA_SLOT_MINUTES,
+            # solo los dias con alguna cita
+            "days": load_agenda(barber_id, day_from, day_to)
+        }
+    }), 200
 
 ########## ########## ########## ##########     (FINAL - TABLA BARBEROS)     ########## ########## ########## ##########
 
@@ -513,6 +633,7 @@ def list_barbers():
 
 @api.route("/appointments", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_appointment():
     user = get_current_user()
     if not user:
@@ -542,6 +663,12 @@ def create_appointment():
     except Exception:
         return jsonify({"ok": False, "message": "appointment_date debe ser ISO8601 válido"}), 400
 
+    # chequeo e INSERT en la misma transaccion, con el barbero bloqueado
+    lock_barber(barber.user_id)
+    if find_conflicts(barber.user_id, dt, dt + timedelta(minutes=service.duration_minutes)):
+        db.session.rollback()
+        return jsonify({"ok": False, "message": "El barbero ya tiene una cita en ese horario"}), 409
+
     appt = Appointment(
         client_id=user.user_id,
         barber_id=barber.user_id,
@@ -551,10 +678,140 @@ def create_appointment():
     )
     db.session.add(appt)
     db.session.commit()
+    index_appointment(appt)
 
     return jsonify({"ok": True, "data": appt.serialize()}), 201
 
 
+MAX_BULK_APPOINTMENTS = int(os.getenv("MAX_BULK_APPOINTMENTS", 60))
+MAX_RECURRENCE_EVERY_DAYS = 366
+
+
+def _bulk_slots(data):
+    """Lista de fechas (str) desde "slots" o desde "recurrence": {start, every_days, count}."""
+    if data.get("slots") is not None:
+        return list(data.get("slots"))
+    rule = data.get("recurrence") or {}
+    start = parser.isoparse(rule["start"])
+    count = int(rule["count"])
+    every_days = int(rule.get("every_days", 14))
+    # se valida antes de generar las fechas: un count enorme no llega a expandirse
+    if not 1 <= count <= MAX_BULK_APPOINTMENTS:
+        raise APIException(f"recurrence.count debe estar entre 1 y {MAX_BULK_APPOINTMENTS}",
+                           400, {"ok": False})
+    if not 1 <= every_days <= MAX_RECURRENCE_EVERY_DAYS:
+        raise APIException(f"recurrence.every_days debe estar entre 1 y {MAX_RECURRENCE_EVERY_DAYS}",
+                           400, {"ok": False})
+    return [(start + timedelta(days=every_days * i)).isoformat() for i in range(count)]
+
+
+# reservar varias citas de una vez (temporada / cita recurrente)
+# body: {barber_id, service_id, slots: [iso, ...]}  o  {barber_id, service_id, recurrence: {start, every_days, count}}
+@api.route("/appointments/bulk", methods=["POST"])
+@jwt_required()
+@idempotent
+def create_appointments_bulk():
+    user = get_current_user()
+    if not user:
+        return jsonify({"ok": False, "message": "Token inválido"}), 401
+
+    if user.role != "cliente":
+        return jsonify({"ok": False, "message": "Solo clientes pueden crear citas"}), 403
+
+    data = request.get_json() or {}
+    barber_id = data.get("barber_id")
+    service_id = data.get("service_id")
+    if not barber_id or not service_id:
+        return jsonify({"ok": False, "message": "barber_id, service_id y slots o recurrence son requeridos"}), 400
+
+    barber = db.session.get(Usuario, int(barber_id))
+    if not barber or barber.role not in ("barbero", "admin"):
+        return jsonify({"ok": False, "message": "Barbero inválido"}), 400
+
+    service = db.session.get(Service, int(service_id))
+    if not service:
+        return jsonify({"ok": False, "message": "Servicio inválido"}), 400
+
+    try:
+        requested = _bulk_slots(data)
+    except APIException:
+        raise
+    except Exception:
+        return jsonify({"ok": False, "message": "recurrence inválida: {start, every_days, count}"}), 400
+    if not requested:
+        return jsonify({"ok": False, "message": "slots o recurrence son requeridos"}), 400
+    if len(requested) > MAX_BULK_APPOINTMENTS:
+        return jsonify({"ok": False, "message": f"Máximo {MAX_BULK_APPOINTMENTS} citas por reserva"}), 400
+
+    duration = timedelta(minutes=service.duration_minutes)
+    results = []
+    parsed = []
+    for date_str in requested:
+        try:
+            parsed.append((to_utc(parser.isoparse(date_str)), len(results)))
+            results.append({"appointment_date": date_str, "ok": True})
+        except Exception:
+            results.append({"appointment_date": date_str, "ok": False,
+                            "message": "appointment_date debe ser ISO8601 válido"})
+    if not parsed:
+        # ninguna fecha valida: es un error del cliente, no un choque de horarios
+        return jsonify({
+            "ok": False,
+            "message": "appointment_date debe ser ISO8601 válido",
+            "data": {"created": 0, "rejected": len(results), "results": results}
+        }), 400
+
+    # una sola lectura de la agenda del barbero para todo el rango pedido
+    rows = []
+    parsed.sort()
+    # el chequeo y el INSERT con el barbero bloqueado (otra reserva espera al commit)
+    lock_barber(barber.user_id)
+    index = load_window(barber.user_id, parsed[0][0], parsed[-1][0] + duration)
+    for start, i in parsed:
+        if index.overlapping(start, start + duration):
+            results[i].update(ok=False, message="El barbero ya tiene una cita en ese horario")
+            continue
+        # los huecos aceptados tambien cuentan para los siguientes de la lista
+        index.add(start, start + duration, None)
+        rows.append((i, {
+            "client_id": user.user_id,
+            "barber_id": barber.user_id,
+            "service_id": service.service_id,
+            "appointment_date": start,
+            "status": "pendiente"
+        }))
+
+    if rows:
+        # un INSERT multi-fila y un solo commit; los ids se emparejan por fecha
+        # (no hay dos aceptadas con la misma hora porque chocarian)
+        inserted = db.session.execute(
+            insert(Appointment.__table__).returning(
+                Appointment.appointment_id, Appointment.appointment_date),
+            [values for _, values in rows]).all()
+        # el INSERT por Core no pasa por el after_flush de la agenda
+        refresh_days(db.session.connection(), barber.user_id,
+                     {local_day(values["appointment_date"]) for _, values in rows}
+                     | {local_day(values["appointment_date"] + duration) for _, values in rows})
+        db.session.commit()
+        ids_by_date = {to_utc(date): appointment_id for appointment_id, date in inserted}
+        for i, values in rows:
+            appointment_id = ids_by_date[values["appointment_date"]]
+            results[i]["appointment_id"] = appointment_id
+            index_interval(barber.user_id, values["appointment_date"],
+                           values["appointment_date"] + duration, appointment_id)
+    else:
+        db.session.rollback()  # suelta el bloqueo del barbero
+
+    return jsonify({
+        "ok": bool(rows),
+        "data": {
+            "created": len(rows),
+            "rejected": len(results) - len(rows),
+            "results": results
+        }
+    }), 201 if rows else 409
+
+
 # ver las citas cliente ve las suyas barberos las de ellos y aqui deberia el admin verlas todas
 @api.route("/appointments/mine", methods=["GET"])
 @jwt_required()
@@ -564,16 +821,21 @@ def my_appointments():
     if not user:
         return jsonify({"ok": False, "message": "Token inválido"}), 401
 
+    normalized = wants_normalized()
+    fieldset = requested_fields(Appointment, normalized)
     if user.role == "cliente":
-        appts = Appointment.query.filter_by(client_id=user.user_id).order_by(
-            Appointment.appointment_date.desc()).all()
+        appts = Appointment.query.options(*Appointment.serialize_loader(fieldset)).filter_by(
+            client_id=user.user_id).order_by(Appointment.appointment_date.desc()).all()
     elif user.role in ("barbero", "admin"):
-        appts = Appointment.query.filter_by(barber_id=user.user_id).order_by(
-            Appointment.appointment_date.desc()).all()
+        appts = Appointment.query.options(*Appointment.serialize_loader(fieldset)).filter_by(
+            barber_id=user.user_id).order_by(Appointment.appointment_date.desc()).all()
     else:
         return jsonify({"ok": False, "message": "Rol no soportado"}), 400
 
-    return jsonify({"ok": True, "data": [a.serialize() for a in appts]}), 200
+    body = {"ok": True, "data": [a.serialize(fieldset) for a in appts]}
+    if normalized:
+        body["included"] = load_included(fieldset, appts)
+    return jsonify(body), 200
 
 
 # administrar citas, admin todas, barbero las de el, cliente solo las de el
@@ -607,8 +869,13 @@ def update_appointment_status(appointment_id):
     else:
         return jsonify({"ok": False, "message": "No autorizado"}), 403
 
+    was_free = appt.status == "cancelada"
     appt.status = new_status
     db.session.commit()
+    if new_status == "cancelada" and not was_free:
+        unindex_appointment(appt)
+    elif was_free and new_status != "cancelada":
+        index_appointment(appt)
     return jsonify({"ok": True, "data": appt.serialize()}), 200
 
 
@@ -620,6 +887,7 @@ def delete_appointments(appointment_id):
     try:
         appointments_a_eliminar = Appointment.query.get_or_404(
             appointment_id)  # Busca por ID
+        unindex_appointment(appointments_a_eliminar)
         db.session.delete(appointments_a_eliminar)  # Marca para eliminar
         db.session.commit()  # Confirma la eliminación
         return jsonify({"message": "Appointments eliminada", "ok": True, "details": "none"}), 200
@@ -702,6 +970,7 @@ def update_miperfilcliente(userId):
             return jsonify({"ok": False, "message": "El nombre es obligatorio"}), 400
 
         db.session.commit()
+        invalidate("barbers")
 
         return jsonify({
 
@@ -732,7 +1001,9 @@ def admin_list_appointments():
     status = request.args.get("status")
     date_str = request.args.get("date")  # YYYY-MM-DD
 
-    q = Appointment.query
+    normalized = wants_normalized()
+    fieldset = requested_fields(Appointment, normalized)
+    q = Appointment.query.options(*Appointment.serialize_loader(fieldset))
 
     if status:
         q = q.filter(Appointment.status == status)
@@ -748,8 +1019,15 @@ def admin_list_appointments():
         except Exception:
             return jsonify({"ok": False, "message": "date inválida (usa YYYY-MM-DD)"}), 400
 
-    appts = q.order_by(Appointment.appointment_date.desc()).all()
-    return jsonify({"ok": True, "data": [a.serialize() for a in appts]}), 200
+    keys = [(Appointment.appointment_date, True),
+            (Appointment.appointment_id, True)]
+    if wants_ndjson():
+        return ndjson_response(order_keyset(q, keys), lambda a: a.serialize(fieldset))
+    appts, next_cursor = paginate(q, keys)
+    body = {"ok": True, "data": [a.serialize(fieldset) for a in appts], "next_cursor": next_cursor}
+    if normalized:
+        body["included"] = load_included(fieldset, appts)
+    return jsonify(body), 200
 
 
 @api.route("/admin/users/<int:user_id>", methods=["PUT"])
@@ -780,15 +1058,16 @@ def admin_update_user(user_id):
         user.is_active = bool(data.get("is_active"))
 
     if data.get("password"):
-        user.password = bcrypt.generate_password_hash(
-            data["password"]).decode("utf-8")
+        user.password = hash_password(data["password"])
 
     db.session.commit()
+    invalidate("barbers", "auth")
     return jsonify({"ok": True, "data": user.serialize()}), 200
 
 
 @api.route("/payments", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_payment():
     user = get_current_user()
     if not user:
@@ -835,48 +1114,108 @@ def create_payment():
 
 
 @api.route("/admin/payments", methods=["GET"])
-# @require_roles("admin")
+@require_roles("admin")
 def admin_list_payments():
-    payments = Payment.query.order_by(Payment.paid_at.desc()).all()
-    return jsonify({"ok": True, "data": [p.serialize() for p in payments]}), 200
+    normalized = wants_normalized()
+    fieldset = requested_fields(Payment, normalized)
+    q = Payment.query.options(*Payment.serialize_loader(fieldset))
+    keys = [(Payment.paid_at, True), (Payment.payment_id, True)]
+    if wants_ndjson():
+        return ndjson_response(order_keyset(q, keys), lambda p: p.serialize(fieldset))
+    payments, next_cursor = paginate(q, keys)
+    body = {"ok": True, "data": [p.serialize(fieldset) for p in payments], "next_cursor": next_cursor}
+    if normalized:
+        # included.usuarios trae email/telefono de pagadores y barberos: solo admin (require_roles)
+        body["included"] = load_included(fieldset, payments)
+    return jsonify(body), 200
 
 
 @api.route("/admin/payments/recent", methods=["GET"])
 @require_roles("admin")
 def admin_recent_payments():
     limit = int(request.args.get("limit", 10))
-    payments = Payment.query.order_by(
+    normalized = wants_normalized()
+    fieldset = requested_fields(Payment, normalized)
+    payments = Payment.query.options(*Payment.serialize_loader(fieldset)).order_by(
         Payment.paid_at.desc()).limit(limit).all()
-    return jsonify({"ok": True, "data": [p.serialize() for p in payments]}), 200
+    body = {"ok": True, "data": [p.serialize(fieldset) for p in payments]}
+    if normalized:
+        body["included"] = load_included(fieldset, payments)
+    return jsonify(body), 200
 
 
 @api.route("/admin/sales/today", methods=["GET"])
 @require_roles("admin")
 def admin_sales_today():
-    # hoy en UTC
-    """     now = datetime.now(timezone.utc)
-    start = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
-    end = start.replace(hour=23, minute=59, second=59) """
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD&tz=America/Caracas&group_by=day|barber|method|status
+    # sin from/to: hoy en la zona de la barberia
+    zone = shop_zone(request.args.get("tz"))
+    today = datetime.now(zone).date()
+    try:
+        day_from = parser.isoparse(request.args["from"]).date() if request.args.get("from") else today
+        day_to = parser.isoparse(request.args["to"]).date() if request.args.get("to") else day_from
+    except Exception:
+        return jsonify({"ok": False, "message": "from/to inválidos (usa YYYY-MM-DD)"}), 400
+    if day_to < day_from:
+        return jsonify({"ok": False, "message": "to debe ser >= from"}), 400
 
-    """    paid = Payment.query.filter(
-        Payment.status == "pagado",
-        Payment.paid_at >= start,
-        Payment.paid_at <= end
-    ).all() """
+    group_by = request.args.get("group_by", "day")
+    if group_by not in GROUP_BY_CHOICES:
+        return jsonify({"ok": False, "message": f"group_by inválido {GROUP_BY_CHOICES}"}), 400
+    status = request.args.get("status")
 
-    paid = Payment.query.filter().all()
+    start, end = local_day_bounds(day_from, day_to, zone)
+    if zone.key == SHOP_TIMEZONE:
+        groups = aggregate_rollup(day_from, day_to, group_by, status)
+    else:
+        groups = aggregate_sales(start, end, group_by, zone, status)
+
+    data = {
+        "from": day_from,
+        "to": day_to,
+        "timezone": zone.key,
+        "group_by": group_by,
+        "count": sum(g["count"] for g in groups),
+        "total": sum(g["total"] for g in groups),
+        "groups": groups
+    }
+
+    # lista de pagos del rango; ?include_payments=0 la omite. Siempre va paginada
+    # (API_PAGE_SIZE por defecto, ?limit=&cursor= para moverse): un rango largo
+    # no puede volcar todos los pagos en una respuesta
+    if request.args.get("include_payments") not in ("0", "false"):
+        fieldset = requested_fields(Payment)
+        q = Payment.query.options(*Payment.serialize_loader(fieldset)).filter(
+            Payment.paid_at >= start, Payment.paid_at < end)
+        if status:
+            q = q.filter(Payment.status == status)
+        paid, next_cursor = paginate(
+            q, [(Payment.paid_at, True), (Payment.payment_id, True)], limit=page_size())
+        data["payments"] = [p.serialize(fieldset) for p in paid]
+        data["next_cursor"] = next_cursor
+
+    return jsonify({"ok": True, "data": data}), 200
+
+
+@api.route("/admin/slow-queries", methods=["GET"])
+@require_roles("admin")
+def admin_slow_queries():
+    # ?limit=N&order=total|max|count|slow  (agregados de este proceso)
+    try:
+        limit = max(1, min(int(request.args.get("limit", 20)), 200))
+    except ValueError:
+        return jsonify({"ok": False, "message": "limit inválido"}), 400
+    order = request.args.get("order", "total")
+    if order not in ORDER_CHOICES:
+        return jsonify({"ok": False, "message": f"order inválido {ORDER_CHOICES}"}), 400
+    return jsonify({"ok": True, "data": query_stats.top(limit, order)}), 200
 
-    total = sum([float(p.amount) for p in paid])
 
-    return jsonify({
-        "ok": True,
-        "data": {
-            # "date": start.date().isoformat(),
-            "count": len(paid),
-            "total": float(total),
-            "payments": [p.serialize() for p in paid]
-        }
-    }), 200
+@api.route("/admin/slow-queries", methods=["DELETE"])
+@require_roles("admin")
+def admin_reset_slow_queries():
+    query_stats.reset()
+    return jsonify({"ok": True, "message": "Estadísticas reiniciadas"}), 200
 
 
 # rutas para pagos stripe
@@ -885,7 +1224,12 @@ def admin_sales_today():
 # POST /api/stripe/checkout/appointment/<appointment_id>
 # ==========================================================
 @api.route("/stripe/checkout/appointment/<int:appointment_id>", methods=["POST"])
+@jwt_required()
+@idempotent
 def stripe_checkout_appointment(appointment_id):
+    # el job queda a nombre de quien paga: solo el puede consultarlo
+    user_id = int(get_jwt_identity())
+
     appt = Appointment.query.get(appointment_id)
     if not appt:
         return jsonify({"ok": False, "message": "Cita no encontrada"}), 404
@@ -897,7 +1241,9 @@ def stripe_checkout_appointment(appointment_id):
     amount_cents = _to_cents(service.price)
 
     try:
-        session = stripe.checkout.Session.create(
+        # la sesion la crea el worker; el cliente consulta poll_url
+        job = enqueue_checkout(
+            user_id,
             mode="payment",
             line_items=[{
                 "price_data": {
@@ -922,8 +1268,8 @@ def stripe_checkout_appointment(appointment_id):
             }
         )
 
-        # Devuelve el URL para redirigir
-        return jsonify({"ok": True, "checkout_url": session.url, "session_id": session.id}), 200
+        # 202 con job_id y poll_url (el worker crea la sesion)
+        return checkout_response(job)
 
     except Exception as e:
         return jsonify({"ok": False, "message": f"Stripe error: {str(e)}"}), 500
@@ -974,6 +1320,7 @@ def stripe_checkout_appointment(appointment_id):
 #        return jsonify({"ok": False, "message": f"Stripe error: {str(e)}"}), 500
 
 @api.route("/stripe/checkout/direct", methods=["POST"])
+@idempotent
 def stripe_checkout_direct():
     verify_jwt_in_request()
     payer_user_id = int(get_jwt_identity())
@@ -991,7 +1338,8 @@ def stripe_checkout_direct():
     amount_cents = int(float(service.price) * 100)
 
     try:
-        session = stripe.checkout.Session.create(
+        job = enqueue_checkout(
+            payer_user_id,
             mode="payment",
             line_items=[{
                 "price_data": {
@@ -1010,11 +1358,32 @@ def stripe_checkout_direct():
                 "payer_user_id": str(payer_user_id),
             }
         )
-        return jsonify({"ok": True, "checkout_url": session.url, "session_id": session.id}), 200
+        return checkout_response(job)
     except Exception as e:
         return jsonify({"ok": False, "message": f"Stripe error: {str(e)}"}), 500
 
 
+# ==========================================================
+# Estado de un checkout encolado (respuesta 202 de las rutas de arriba)
+# GET /api/stripe/checkout/jobs/<job_id>?wait=1  (solo el dueño del job)
+# ==========================================================
+@api.route("/stripe/checkout/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def stripe_checkout_job(job_id):
+    try:
+        wait = min(float(request.args.get("wait", 0)), CHECKOUT_POLL_MAX_SECONDS)
+    except ValueError:
+        return jsonify({"ok": False, "message": "wait inválido"}), 400
+    job = db.session.get(CheckoutJob, job_id)
+    if not job:
+        return jsonify({"ok": False, "message": "Job no encontrado"}), 404
+    if job.created_by_user_id != jwt_user_id():
+        return jsonify({"ok": False, "message": "No autorizado"}), 403
+    if job.status not in ("listo", "error") and wait > 0:
+        job = wait_for_job(job_id, wait)
+    return jsonify({"ok": job.status != "error", "data": job.serialize()}), 200
+
+
 # ==========================================================
 # 3) Webhook Stripe: confirma pago y crea Payment en SQLite
 # POST /api/stripe/webhook
@@ -1103,69 +1472,14 @@ def stripe_webhook():
     except stripe.error.SignatureVerificationError:
         return "Invalid signature", 400
 
-    #  Evento principal de Checkout
-    if event.get("type") == "checkout.session.completed":
-        session = event["data"]["object"]
-        md = session.get("metadata", {}) or {}
-
-        stripe_session_id = session.get("id")  # ej: cs_test_...
-        kind = md.get("kind")                  # "appointment" | "direct"
-        # string/decimal (lo guardas en Numeric)
-        amount = md.get("amount")
-
-        #  1) Anti-duplicados por sesión (Stripe puede reintentar)
-        existing = Payment.query.filter_by(
-            stripe_session_id=stripe_session_id).first()
-        if existing:
-            return "OK", 200
-
-        #  2) Determinar appointment_id, payer_user_id, created_by_user_id
-        appointment_id = None
-
-        # payer_user_id: preferimos metadata payer_user_id (nuevo),
-        # si no existe usamos client_id (compatibilidad con lo viejo)
-        payer_user_id = None
-        if md.get("payer_user_id"):
-            try:
-                payer_user_id = int(md.get("payer_user_id"))
-            except Exception:
-                payer_user_id = None
-        elif md.get("client_id"):
-            try:
-                payer_user_id = int(md.get("client_id"))
-            except Exception:
-                payer_user_id = None
-
-        # created_by_user_id:
-        # - si viene barber_id lo usamos
-        # - si no, dejamos 1 (admin por defecto)
-        created_by_user_id = 1
-        if md.get("barber_id"):
-            try:
-                created_by_user_id = int(md.get("barber_id"))
-            except Exception:
-                created_by_user_id = 1
-
-        # appointment_id si es pago por cita
-        if kind == "appointment" and md.get("appointment_id"):
-            try:
-                appointment_id = int(md.get("appointment_id"))
-            except Exception:
-                appointment_id = None
-
-        #  3) Crear registro de pago (confirmado)
-        payment = Payment(
-            appointment_id=appointment_id,
-            payer_user_id=payer_user_id,
-            amount=amount,
-            method="stripe",
-            status="pagado",
-            paid_at=datetime.now(timezone.utc),
-            created_by_user_id=created_by_user_id,
-            stripe_session_id=stripe_session_id
-        )
-        db.session.add(payment)
-        db.session.commit()
+    # firma verificada: guardamos el evento crudo en el inbox y respondemos ya;
+    # el worker crea los pagos (idempotente por event_id y por stripe_session_id)
+    # (con stripe>=8 el Event ya no es un dict: leemos el JSON verificado)
+    data = json.loads(payload)
+    if not data.get("id"):
+        return "Invalid payload", 400
+    store_event(data["id"], data.get("type", ""), payload.decode("utf-8"))
+    webhook_worker.notify()
 
     return "OK", 200
 
@@ -1196,19 +1510,28 @@ def payments_me():
 
     # Pagos directos: Payment.payer_user_id == user_id
     # Pagos por cita: appointment.client_id == user_id (aunque payer_user_id sea null)
+    # UNION en vez de OR sobre el outer join para que cada rama use su indice
+    mine = union(
+        select(Payment.payment_id).where(Payment.payer_user_id == user_id),
+        select(Payment.payment_id)
+        .join(Appointment, Payment.appointment_id == Appointment.appointment_id)
+        .where(Appointment.client_id == user_id)
+    )
+    normalized = wants_normalized()
+    fieldset = requested_fields(Payment, normalized)
     payments = (
         Payment.query
-        .outerjoin(Appointment, Payment.appointment_id == Appointment.appointment_id)
-        .filter(or_(
-            Payment.payer_user_id == user_id,
-            Appointment.client_id == user_id
-        ))
+        .options(*Payment.serialize_loader(fieldset))
+        .filter(Payment.payment_id.in_(mine))
         .order_by(Payment.paid_at.desc())
         .limit(50)
         .all()
     )
 
-    return jsonify({"ok": True, "data": [p.serialize() for p in payments]}), 200
+    body = {"ok": True, "data": [p.serialize(fieldset) for p in payments]}
+    if normalized:
+        body["included"] = load_included(fieldset, payments)
+    return jsonify(body), 200
 
 
 # @api.route("/appointments/<int:appointment_id>/complete-and-pay", methods=["POST"])
@@ -1251,6 +1574,7 @@ def payments_me():
 
 
 @api.route("/appointments/<int:appointment_id>/complete-and-pay", methods=["POST"])
+@idempotent
 def complete_and_pay(appointment_id):
     verify_jwt_in_request()
     claims = get_jwt()
@@ -1275,7 +1599,8 @@ def complete_and_pay(appointment_id):
     service = appt.service
     amount_cents = int(float(service.price) * 100)
 
-    session = stripe.checkout.Session.create(
+    job = enqueue_checkout(
+        user_id,
         mode="payment",
         line_items=[{
             "price_data": {
@@ -1296,4 +1621,4 @@ def complete_and_pay(appointment_id):
         }
     )
 
-    return jsonify({"ok": True, "checkout_url": session.url}), 200
+    return checkout_response(job)
@@ -0,0 +1,93 @@
+"""
+Agregados de ventas calculados en SQL (SUM/COUNT + GROUP BY).
+
+Los dias se cuentan en la zona horaria de la barberia (SHOP_TIMEZONE)
+aunque paid_at se guarda en UTC. Para esa zona se lee daily_sales_rollup
+(ver rollup.py); para otra zona se agrega directamente sobre payments.
+"""
+import os
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import func, select
+from api.models import db, Appointment, Payment, DailySalesRollup
+from api.utils import APIException
+
+SHOP_TIMEZONE = os.getenv("SHOP_TIMEZONE", "UTC")
+GROUP_BY_CHOICES = ("day", "barber", "method", "status")
+
+
+def shop_zone(name=None):
+    try:
+        return ZoneInfo(name or SHOP_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise APIException("timezone inválida", 400, {"ok": False})
+
+
+def local_day_bounds(day_from, day_to, zone):
+    """[inicio de day_from, fin de day_to) en la zona local, pasado a UTC."""
+    start = datetime.combine(day_from, time.min, zone).astimezone(timezone.utc)
+    end = datetime.combine(day_to + timedelta(days=1), time.min,
+                           zone).astimezone(timezone.utc)
+    return start, end
+
+
+def day_bucket(zone, at):
+    """Expresion SQL con el dia local de paid_at."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone(zone.key, Payment.paid_at))
+    # SQLite no sabe de zonas: usamos el offset del inicio del rango
+    # (en un rango que cruza un cambio de horario la hora del cambio cae en el dia vecino)
+    offset = int(at.astimezone(zone).utcoffset().total_seconds() // 60)
+    return func.date(Payment.paid_at, f"{offset:+d} minutes")
+
+
+def barber_key():
+    # pagos sin cita (pago directo) no tienen barbero: 0
+    return func.coalesce(Appointment.barber_id, 0)
+
+
+def aggregate_sales(start, end, group_by, zone, status=None):
+    """Lista de {key, count, total} para pagos con paid_at en [start, end)."""
+    if group_by == "day":
+        key = day_bucket(zone, start)
+    elif group_by == "barber":
+        key = barber_key()
+    elif group_by == "method":
+        key = Payment.method
+    else:
+        key = Payment.status
+
+    q = (
+        select(key.label("key"), func.count(Payment.payment_id),
+               func.coalesce(func.sum(Payment.amount), 0))
+        .where(Payment.paid_at >= start, Payment.paid_at < end)
+        .group_by(key)
+        .order_by(key)
+    )
+    if group_by == "barber":
+        q = q.outerjoin(Appointment,
+                        Payment.appointment_id == Appointment.appointment_id)
+    if status:
+        q = q.where(Payment.status == status)
+
+    return [{"key": str(k) if group_by == "day" else k, "count": count, "total": float(total)}
+            for k, count, total in db.session.execute(q)]
+
+
+def aggregate_rollup(day_from, day_to, group_by, status=None):
+    """Igual que aggregate_sales pero leyendo daily_sales_rollup (dias en SHOP_TIMEZONE)."""
+    key = getattr(DailySalesRollup, "barber_id" if group_by == "barber" else group_by)
+    q = (
+        select(key, func.sum(DailySalesRollup.count),
+               func.coalesce(func.sum(DailySalesRollup.total), 0))
+        .where(DailySalesRollup.day >= day_from, DailySalesRollup.day <= day_to)
+        .group_by(key)
+        .having(func.sum(DailySalesRollup.count) > 0)
+        .order_by(key)
+    )
+    if status:
+        q = q.where(DailySalesRollup.status == status)
+
+    return [{"key": k.isoformat() if group_by == "day" else k, "count": int(count), "total": float(total)}
+            for k, count, total in db.session.execute(q)]
@@ -0,0 +1,184 @@
+"""
+Generador de datos sinteticos con forma de produccion (flask seed-load).
+
+Por cada unidad de escala: 10 barberos, 2000 clientes y la agenda de cada
+barbero durante `years` anos (8 citas por dia laborable, sin solapes),
+mas los pagos de las citas completadas y algunos pagos directos.
+scale=1, years=3 son ~55k citas y ~50k pagos; scale=20 pasa del millon de citas.
+
+Todo se escribe con INSERT por lotes (executemany) en una sola transaccion,
+con ids explicitos para no necesitar RETURNING. En PostgreSQL los ids
+explicitos no avanzan las secuencias: al final se ajustan con setval.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, text
+from api.models import db, Usuario, Service, Appointment, Payment
+from api.passwords import hash_password
+
+SEED_PASSWORD = "123456"
+BARBERS_PER_SCALE = 10
+CLIENTS_PER_SCALE = 2000
+APPOINTMENTS_PER_DAY = 8
+SLOT_MINUTES = 30
+OPEN_HOUR, CLOSE_HOUR = 9, 19
+
+CATALOG = [
+    ("Corte clásico", 12, 30), ("Corte + barba", 18, 60), ("Barba", 8, 30),
+    ("Fade", 15, 45), ("Afeitado con navaja", 10, 30), ("Corte niño", 9, 30),
+    ("Tinte", 25, 60), ("Cejas", 5, 15), ("Diseño", 7, 15),
+    ("Mascarilla", 10, 30), ("Corte + lavado", 14, 45), ("Keratina", 40, 90),
+]
+PAYMENT_METHODS = (["efectivo"] * 5 + ["tarjeta"] * 3 +
+                   ["transferencia", "zelle", "stripe", "stripe"])
+
+
+def _next_id(column):
+    return (db.session.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _sync_sequences(*columns):
+    """PostgreSQL: deja la secuencia de cada PK en max(id), si no el proximo INSERT choca."""
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+    for column in columns:
+        table, name = column.table.name, column.name
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence(:table, :column), "
+            f"COALESCE(MAX({name}), 1), MAX({name}) IS NOT NULL) FROM {table}"),
+            {"table": table, "column": name})
+
+
+class _BatchWriter:
+    def __init__(self, table, batch_size):
+        self.table = table
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            db.session.execute(insert(self.table), self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def seed_load(scale=1, seed=42, years=3, batch_size=10000, log=print):
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    password = hash_password(SEED_PASSWORD)
+
+    # servicios
+    first_service = _next_id(Service.service_id)
+    services = [{"service_id": first_service + i, "name": name, "price": price,
+                 "duration_minutes": minutes}
+                for i, (name, price, minutes) in enumerate(CATALOG)]
+    db.session.execute(insert(Service.__table__), services)
+
+    # usuarios
+    users = _BatchWriter(Usuario.__table__, batch_size)
+    first_user = _next_id(Usuario.user_id)
+    n_barbers = BARBERS_PER_SCALE * scale
+    n_clients = CLIENTS_PER_SCALE * scale
+    barbers = range(first_user, first_user + n_barbers)
+    clients = range(first_user + n_barbers, first_user + n_barbers + n_clients)
+    for user_id in range(first_user, first_user + n_barbers + n_clients):
+        is_barber = user_id in barbers
+        users.add({
+            "user_id": user_id,
+            "name": f"{'Barbero' if is_barber else 'Cliente'} {user_id}",
+            "email": f"{'barbero' if is_barber else 'cliente'}{user_id}@seed.test",
+            "password": password,
+            "role": "barbero" if is_barber else "cliente",
+            "is_active": True,
+            "is_admin": False,
+            "phone": f"+58 412 {rnd.randrange(10**7):07d}",
+            "address": f"Calle {rnd.randint(1, 200)} #{rnd.randint(1, 99)}",
+            "specialties": "Fade, barba" if is_barber else None,
+            "created_at": now - timedelta(days=rnd.randint(0, 365 * years)),
+        })
+    users.flush()
+    log(f"  {users.count} usuarios")
+
+    # agenda de cada barbero dia a dia + pagos de las completadas
+    appts = _BatchWriter(Appointment.__table__, batch_size)
+    payments = _BatchWriter(Payment.__table__, batch_size)
+    appointment_id = _next_id(Appointment.appointment_id)
+    payment_id = _next_id(Payment.payment_id)
+    slots_per_day = (CLOSE_HOUR - OPEN_HOUR) * 60 // SLOT_MINUTES
+    first_day = (now - timedelta(days=365 * years)).replace(hour=0)
+    days = 365 * years + 30  # incluye un mes de citas futuras
+
+    for d in range(days):
+        day = first_day + timedelta(days=d)
+        if day.weekday() == 6:  # domingo cerrado
+            continue
+        for barber_id in barbers:
+            taken = set()
+            for _ in range(APPOINTMENTS_PER_DAY):
+                service = rnd.choice(services)
+                need = -(-service["duration_minutes"] // SLOT_MINUTES)
+                slot = rnd.randrange(slots_per_day - need + 1)
+                if taken.intersection(range(slot, slot + need)):
+                    continue
+                taken.update(range(slot, slot + need))
+
+                start = day + timedelta(hours=OPEN_HOUR, minutes=slot * SLOT_MINUTES)
+                if start < now:
+                    status = "cancelada" if rnd.random() < 0.08 else "completada"
+                else:
+                    status = rnd.choice(("pendiente", "confirmada"))
+                client_id = rnd.choice(clients)
+                appts.add({
+                    "appointment_id": appointment_id,
+                    "client_id": client_id,
+                    "barber_id": barber_id,
+                    "service_id": service["service_id"],
+                    "appointment_date": start,
+                    "status": status,
+                })
+                if status == "completada":
+                    payments.add({
+                        "payment_id": payment_id,
+                        "appointment_id": appointment_id,
+                        "payer_user_id": client_id,
+                        "amount": service["price"],
+                        "method": rnd.choice(PAYMENT_METHODS),
+                        "status": "pagado",
+                        "paid_at": start + timedelta(minutes=service["duration_minutes"]),
+                        "created_by_user_id": barber_id,
+                        "stripe_session_id": None,
+                    })
+                    payment_id += 1
+                appointment_id += 1
+
+            # de vez en cuando un pago directo (sin cita)
+            if rnd.random() < 0.05:
+                service = rnd.choice(services)
+                payments.add({
+                    "payment_id": payment_id,
+                    "appointment_id": None,
+                    "payer_user_id": rnd.choice(clients),
+                    "amount": service["price"],
+                    "method": "stripe",
+                    "status": "pagado",
+                    "paid_at": day + timedelta(hours=rnd.randint(OPEN_HOUR, CLOSE_HOUR - 1)),
+                    "created_by_user_id": barber_id,
+                    "stripe_session_id": f"cs_seed_{payment_id}",
+                })
+                payment_id += 1
+
+    appts.flush()
+    payments.flush()
+    log(f"  {appts.count} citas, {payments.count} pagos")
+    _sync_sequences(Service.service_id, Usuario.user_id,
+                    Appointment.appointment_id, Payment.payment_id)
+    db.session.commit()
+    return {"users": users.count, "services": len(services),
+            "appointments": appts.count, "payments": payments.count}
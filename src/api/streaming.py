@@ -0,0 +1,26 @@
+"""
+Respuestas NDJSON (una fila JSON por linea) para exportar listados grandes.
+
+Las filas salen de la base con yield_per (cursor de servidor en PostgreSQL)
+y se escriben segun llegan: no se arma ninguna lista en memoria, asi que
+la memoria del worker y el tiempo al primer byte no dependen del tamano
+de la tabla.
+"""
+import os
+
+from flask import Response, current_app, request, stream_with_context
+
+STREAM_BATCH_SIZE = int(os.getenv("NDJSON_BATCH_SIZE", 500))
+
+
+def wants_ndjson():
+    return request.args.get("format") == "ndjson"
+
+
+def ndjson_response(query, serialize, batch_size=STREAM_BATCH_SIZE):
+    def generate():
+        for row in query.yield_per(batch_size):
+            yield current_app.json.dumps(serialize(row)) + "\n"
+
+    return Response(stream_with_context(generate()),
+                    mimetype="application/x-ndjson")
@@ -0,0 +1,180 @@
+"""
+Inbox de webhooks de Stripe.
+
+La ruta solo verifica la firma, guarda el payload crudo en
+stripe_webhook_events (clave = id del evento, INSERT ... ON CONFLICT DO
+NOTHING: los reintentos de Stripe no duplican) y responde 200; su latencia
+no depende de la base de pagos ni de rafagas de reintentos.
+
+El worker drena el inbox en lotes de WEBHOOK_BATCH_SIZE: un solo INSERT de
+pagos con ON CONFLICT (stripe_session_id) DO NOTHING + RETURNING, asi dos
+eventos de la misma sesion nunca chocan con uq_payments_stripe_session_id.
+Los pagos insertados por Core no pasan por el after_flush de rollup.py:
+sus deltas se aplican aqui mismo, en la misma transaccion.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from api.database import dialect_insert
+from api.models import db, Payment, StripeWebhookEvent
+from api.rollup import apply_deltas, inserted_deltas
+from api.workers import BackgroundWorker
+
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 100))
+PAYMENT_EVENTS = ("checkout.session.completed",)
+
+_INSERTED = (Payment.appointment_id, Payment.amount, Payment.method,
+             Payment.status, Payment.paid_at)
+
+
+def store_event(event_id, event_type, payload):
+    """Guarda el evento en el inbox; devuelve False si ya estaba (reintento de Stripe)."""
+    table = StripeWebhookEvent.__table__
+    values = {"event_id": event_id, "type": event_type, "payload": payload,
+              "status": "pendiente", "received_at": datetime.now(timezone.utc)}
+    insert = dialect_insert(db.session.connection())
+    if insert is not None:
+        result = db.session.execute(
+            insert(table).values(**values)
+            .on_conflict_do_nothing(index_elements=[table.c.event_id]))
+        new = result.rowcount == 1
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(**values))
+            new = True
+        except IntegrityError:
+            new = False
+    db.session.commit()
+    return new
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def payment_row(session, paid_at):
+    """Fila de payments para un checkout.session.completed (misma logica que tenia la ruta)."""
+    md = session.get("metadata") or {}
+    # payer_user_id: preferimos metadata payer_user_id (nuevo),
+    # si no existe usamos client_id (compatibilidad con lo viejo)
+    payer_user_id = _int(md.get("payer_user_id") or md.get("client_id"))
+    # created_by_user_id: barber_id si viene, si no 1 (admin por defecto)
+    created_by_user_id = _int(md.get("barber_id")) or 1
+    appointment_id = None
+    if md.get("kind") == "appointment":
+        appointment_id = _int(md.get("appointment_id"))
+    return {
+        "appointment_id": appointment_id,
+        "payer_user_id": payer_user_id,
+        "amount": md.get("amount"),
+        "method": "stripe",
+        "status": "pagado",
+        "paid_at": paid_at,
+        "created_by_user_id": created_by_user_id,
+        "notes": None,
+        "stripe_session_id": session.get("id"),
+    }
+
+
+def insert_payments(conn, rows):
+    """INSERT de pagos ignorando sesiones ya registradas; devuelve las filas insertadas."""
+    table = Payment.__table__
+    insert = dialect_insert(conn)
+    if insert is not None:
+        stmt = (insert(table)
+                .on_conflict_do_nothing(index_elements=[table.c.stripe_session_id])
+                .returning(*_INSERTED))
+        return [dict(row) for row in conn.execute(stmt, rows).mappings()]
+
+    inserted = []
+    for row in rows:
+        exists = conn.execute(select(table.c.payment_id).where(
+            table.c.stripe_session_id == row["stripe_session_id"])).first()
+        if exists:
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(table.insert().values(**row))
+            inserted.append({column.key: row[column.key] for column in _INSERTED})
+        except IntegrityError:
+            pass  # otro proceso lo inserto entre el select y el insert
+    return inserted
+
+
+def _process(events):
+    now = datetime.now(timezone.utc)
+    rows, handled = [], []
+    for ev in events:
+        if ev.type not in PAYMENT_EVENTS:
+            ev.status, ev.processed_at = "ignorado", now
+            continue
+        try:
+            session = json.loads(ev.payload)["data"]["object"]
+            rows.append(payment_row(session, ev.received_at))
+        except (ValueError, KeyError, TypeError) as e:
+            ev.status, ev.error, ev.processed_at = "error", f"payload inválido: {e}", now
+            continue
+        handled.append(ev)
+
+    conn = db.session.connection()
+    if rows:
+        apply_deltas(conn, inserted_deltas(conn, insert_payments(conn, rows)))
+    for ev in handled:
+        ev.status, ev.processed_at = "procesado", now
+    db.session.commit()
+
+
+def _pending(limit):
+    return db.session.execute(
+        select(StripeWebhookEvent)
+        .where(StripeWebhookEvent.status == "pendiente")
+        .order_by(StripeWebhookEvent.received_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)).scalars().all()
+
+
+def process_webhook_events(limit=WEBHOOK_BATCH_SIZE):
+    """Procesa un lote del inbox; devuelve cuantos eventos tomo."""
+    events = _pending(limit)
+    if not events:
+        db.session.commit()
+        return 0
+    event_ids = [ev.event_id for ev in events]
+    try:
+        _process(events)
+        return len(event_ids)
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    # el lote fallo (p. ej. una cita que no existe): de a uno para aislar al culpable
+    for event_id in event_ids:
+        ev = db.session.get(StripeWebhookEvent, event_id, with_for_update={"skip_locked": True})
+        if ev is None or ev.status != "pendiente":
+            db.session.commit()
+            continue
+        try:
+            _process([ev])
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            db.session.execute(
+                update(StripeWebhookEvent).where(StripeWebhookEvent.event_id == event_id)
+                .values(status="error", error=str(getattr(e, "orig", None) or e)[:2000],
+                        processed_at=datetime.now(timezone.utc)))
+            db.session.commit()
+    return len(event_ids)
+
+
+webhook_worker = BackgroundWorker(
+    "webhooks", process_webhook_events, interval=5.0,
+    enabled=os.getenv("WEBHOOK_WORKER", "thread") != "off")
+
+
+def setup_webhooks(app):
+    webhook_worker.init_app(app)
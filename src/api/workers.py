@@ -0,0 +1,72 @@
+"""
+Workers en segundo plano (un hilo por proceso) para trabajos sacados del request.
+
+Cada worker llama a `fn()` dentro de un app context hasta que devuelve 0
+(nada mas que hacer) y luego duerme `interval` segundos o hasta notify().
+El hilo arranca con el primer request del api (nunca en comandos de CLI) y
+se vuelve a arrancar en cada worker de gunicorn tras el fork. Con
+<NOMBRE>_WORKER=off no arranca: se usa el comando de CLI en un proceso aparte.
+"""
+import logging
+import os
+import threading
+
+from api.models import db
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    def __init__(self, name, fn, interval=5.0, enabled=True):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.enabled = enabled
+        self.app = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self.ensure_started)
+
+    def ensure_started(self):
+        if not self.enabled or self.app is None:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self.run_forever, name=f"worker-{self.name}", daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        self.ensure_started()
+        self._wakeup.set()
+
+    def run_once(self):
+        """Procesa hasta vaciar la cola; devuelve cuantos trabajos hizo."""
+        total = 0
+        with self.app.app_context():
+            try:
+                while True:
+                    done = self.fn()
+                    if not done:
+                        break
+                    total += done
+            except Exception:
+                logger.exception("worker %s fallo", self.name)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+        return total
+
+    def run_forever(self):
+        while True:
+            self.run_once()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -10,6 +10,16 @@ from api.models import db
 from api.routes import api, stripe
 from api.admin import setup_admin
 from api.commands import setup_commands
+from api.rollup import setup_sales_rollup
+from api.metrics import setup_metrics
+from api.database import engine_options_from_env, setup_pool_logging, setup_sqlite
+from api.querylog import setup_query_log
+from api.checkout import setup_checkout
+from api.webhooks import setup_webhooks
+from api.idempotency import setup_idempotency
+from api.json_provider import FastJSONProvider
+from api.compression import send_static, setup_compression
+from api.agenda import setup_agenda
 
 # importaciones nuevas
 from flask_bcrypt import Bcrypt  # para encriptar y comparar
@@ -22,6 +32,8 @@ static_file_dir = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), '../dist/')
 app = Flask(__name__)
 app.url_map.strict_slashes = False
+# JSON con orjson si esta instalado; Decimal/datetime/Enum sin convertir a mano
+app.json = FastJSONProvider(app)
 
 # Nuevas configuraciones
 # clave secreta para firmar los tokens, cuanto mas largo mejor
@@ -50,10 +62,16 @@ else:
 
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# pool, pre_ping, recycle, timeouts y cache de sentencias (variables DB_*)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(
+    app.config["SQLALCHEMY_DATABASE_URI"])
 
 
 MIGRATE = Migrate(app, db, compare_type=True)
 db.init_app(app)
+# sqlite: WAL + pragmas + un solo escritor entre workers (SQLITE_TUNING=0 lo apaga)
+setup_sqlite(app)
+setup_pool_logging(app)
 
 # add the admin
 setup_admin(app)
@@ -61,6 +79,30 @@ setup_admin(app)
 # add the admin
 setup_commands(app)
 
+# mantiene daily_sales_rollup al insertar/modificar pagos
+setup_sales_rollup(app)
+
+# metricas Prometheus de los requests del api en /api/metrics
+setup_metrics(app)
+
+# huellas de queries y log de las lentas (SLOW_QUERY_MS)
+setup_query_log(app)
+
+# sesiones de Stripe Checkout creadas por un worker (timeouts de Stripe, STRIPE_API_BASE)
+setup_checkout(app)
+
+# inbox de webhooks de Stripe procesado por lotes
+setup_webhooks(app)
+
+# purga periodica de Idempotency-Key vencidas
+setup_idempotency(app)
+
+# bitmaps de agenda por barbero y dia, al dia con cada flush de citas
+setup_agenda(app)
+
+# gzip/brotli de las respuestas grandes de la API (COMPRESS_MIN_SIZE)
+setup_compression(app)
+
 # Add all endpoints form the API with a "api" prefix
 app.register_blueprint(api, url_prefix='/api')
 
@@ -78,7 +120,7 @@ def handle_invalid_usage(error):
 def sitemap():
     if ENV == "development":
         return generate_sitemap(app)
-    return send_from_directory(static_file_dir, 'index.html')
+    return send_static(static_file_dir, 'index.html')
 
 # any other endpoint will try to serve it like a static file
 
@@ -87,7 +129,8 @@ def sitemap():
 def serve_any_other_file(path):
     if not os.path.isfile(os.path.join(static_file_dir, path)):
         path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
+    # .br/.gz precomprimidos en el build (flask precompress-dist) si el cliente los acepta
+    response = send_static(static_file_dir, path)
     response.cache_control.max_age = 0  # avoid cache memory
     return response
 
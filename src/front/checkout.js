@@ -0,0 +1,33 @@
+// Respuesta de las rutas de Stripe Checkout -> URL de pago.
+// El backend responde 202 con poll_url y el worker crea la sesion en segundo
+// plano: consultamos poll_url (con el JWT, solo el dueño del job puede) hasta
+// que tenga checkout_url. El backend espera como mucho 1s por consulta.
+const POLL_WAIT_SECONDS = 1;
+const POLL_MAX_TRIES = 60;
+
+export async function checkoutUrlFrom(res, data) {
+  if (!res.ok || !data.ok) {
+    throw new Error(data.message || data.error || "No se pudo iniciar el pago");
+  }
+  if (data.checkout_url) return data.checkout_url;
+  if (!data.poll_url) throw new Error("No se pudo iniciar el pago");
+
+  const pollUrl = new URL(data.poll_url, import.meta.env.VITE_BACKEND_URL);
+  pollUrl.searchParams.set("wait", POLL_WAIT_SECONDS);
+  for (let i = 0; i < POLL_MAX_TRIES; i++) {
+    const pollRes = await fetch(pollUrl, {
+      headers: { Authorization: `Bearer ${localStorage.getItem("access_token")}` },
+    });
+    const job = await pollRes.json();
+    if (!pollRes.ok || !job.ok) {
+      throw new Error(job.data?.error || job.message || "No se pudo iniciar el pago");
+    }
+    if (job.data?.checkout_url) return job.data.checkout_url;
+  }
+  throw new Error("Stripe está tardando demasiado, intenta de nuevo");
+}
+
+export async function redirectToCheckout(res) {
+  const data = await res.json();
+  window.location.href = await checkoutUrlFrom(res, data);
+}
@@ -1,8 +1,11 @@
 import React, { useState } from "react";
+import useGlobalReducer from "../hooks/useGlobalReducer";
+import { redirectToCheckout } from "../checkout";
 
 export default function PayAppointmentButton({ appointmentId }) {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  const { store } = useGlobalReducer();
 
   const pay = async () => {
     setLoading(true);
@@ -10,11 +13,9 @@ export default function PayAppointmentButton({ appointmentId }) {
     try {
       const res = await fetch(
         `${import.meta.env.VITE_BACKEND_URL}api/stripe/checkout/appointment/${appointmentId}`,
-        { method: "POST" }
+        { method: "POST", headers: { Authorization: `Bearer ${store.token}` } }
       );
-      const data = await res.json();
-      if (!res.ok || !data.ok) throw new Error(data.message || "No se pudo iniciar el pago");
-      window.location.href = data.checkout_url;
+      await redirectToCheckout(res);
     } catch (e) {
       setError(e.message);
     } finally {
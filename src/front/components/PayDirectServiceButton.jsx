@@ -1,5 +1,6 @@
 import React, { useState } from "react";
 import useGlobalReducer from "../hooks/useGlobalReducer";
+import { redirectToCheckout } from "../checkout";
 
 export default function PayDirectServiceButton({ serviceId, className = "btn btn-dark" }) {
     const [loading, setLoading] = useState(false);
@@ -19,10 +20,7 @@ export default function PayDirectServiceButton({ serviceId, className = "btn btn
                 body: JSON.stringify({ service_id: serviceId })
             });
 
-            const data = await res.json();
-            if (!res.ok || !data.ok) throw new Error(data.error || "No se pudo iniciar el pago");
-
-            window.location.href = data.checkout_url; // Stripe Checkout
+            await redirectToCheckout(res); // Stripe Checkout (espera al worker si responde 202)
         } catch (e) {
             setError(e.message, e.err);
         } finally {
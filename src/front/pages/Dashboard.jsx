@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import useGlobalReducer from "../hooks/useGlobalReducer";
+import { redirectToCheckout } from "../checkout";
 
 export default function Dashboard() {
   const { store, dispatch } = useGlobalReducer();
@@ -150,11 +151,17 @@ export default function Dashboard() {
     }
   };
 async function pagarCita(appointment_id) {
+  const token = localStorage.getItem("access_token");
+
   const res = await fetch(`${import.meta.env.VITE_BACKEND_URL}/api/stripe/checkout/appointment/${appointment_id}`, {
-    method: "POST"
+    method: "POST",
+    headers: { Authorization: `Bearer ${token}` }
   });
-  const data = await res.json();
-  if (data.ok) window.location.href = data.checkout_url;
+  try {
+    await redirectToCheckout(res);
+  } catch (e) {
+    setError(e.message);
+  }
 }
 
 
@@ -166,19 +173,27 @@ async function completarYCobrar(appointmentId) {
     headers: { Authorization: `Bearer ${token}` }
   });
 
-  const data = await res.json();
-  if (data.ok) window.location.href = data.checkout_url;
+  try {
+    await redirectToCheckout(res);
+  } catch (e) {
+    setError(e.message);
+  }
 }
 
 
 async function pagarServicioDirecto(service_id) {
+  const token = localStorage.getItem("access_token");
+
   const res = await fetch(`${import.meta.env.VITE_BACKEND_URL}/api/stripe/checkout/direct`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers: { "Content-Type": "application/json", Authorization: `Bearer ${token}` },
     body: JSON.stringify({ service_id })
   });
-  const data = await res.json();
-  if (data.ok) window.location.href = data.checkout_url;
+  try {
+    await redirectToCheckout(res);
+  } catch (e) {
+    setError(e.message);
+  }
 }
 
 
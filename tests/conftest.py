@@ -0,0 +1,55 @@
+"""
+Fixtures comunes: una sola app (se importa una vez por proceso) sobre una
+base SQLite temporal, sin los workers en segundo plano; cada test que lo
+necesita arma su base con fresh_db.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+# antes de que algun test importe api.*: los workers leen esto al importarse
+os.environ["CHECKOUT_WORKER"] = "off"
+os.environ["WEBHOOK_WORKER"] = "off"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    os.environ["DATABASE_URL"] = "sqlite:///" + str(tmp_path_factory.mktemp("db") / "test.db")
+    from app import app
+    from api.idempotency import idempotency_purger
+    # los tests llaman a purge_expired ellos mismos
+    idempotency_purger.enabled = False
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture(scope="session")
+def models(app):
+    from api import models
+    return models
+
+
+@pytest.fixture
+def fresh_db(app, models):
+    """Base vacia con todas las tablas (y sin cache: los ids se repiten entre tests)."""
+    from api.cache import invalidate
+    with app.app_context():
+        models.db.drop_all()
+        models.db.create_all()
+    invalidate("auth", "services", "barbers")
+    return models.db
+
+
+@pytest.fixture(scope="session")
+def auth(app):
+    """auth(user_id, role, is_admin=False) -> cabecera Authorization con un JWT."""
+    from flask_jwt_extended import create_access_token
+
+    def headers(user_id, role, is_admin=False):
+        with app.app_context():
+            token = create_access_token(identity=str(user_id),
+                                        additional_claims={"role": role, "is_admin": is_admin})
+        return {"Authorization": f"Bearer {token}"}
+    return headers
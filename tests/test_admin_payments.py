@@ -0,0 +1,62 @@
+"""
+GET /api/admin/payments devuelve pagos con datos de quien pago
+(?expand=payer, y en ?shape=normalized included.usuarios con email y
+telefono de pagadores y barberos): solo un admin puede leerlo.
+
+    $ python -m pytest -q tests/test_admin_payments.py
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+
+@pytest.fixture
+def shop(app, models, fresh_db):
+    db, Usuario = models.db, models.Usuario
+    with app.app_context():
+        admin = Usuario(name="Admin", email="admin@test", password="x", role="admin", is_admin=True)
+        barber = Usuario(name="Barbero", email="barbero@test", password="x", role="barbero")
+        client = Usuario(name="Cliente", email="cliente@test", password="x", role="cliente")
+        db.session.add_all([admin, barber, client])
+        db.session.flush()
+        db.session.add(models.Payment(amount=20, method="efectivo", status="pagado",
+                                      paid_at=datetime(2030, 1, 7, 15, tzinfo=timezone.utc),
+                                      created_by_user_id=barber.user_id, payer_user_id=client.user_id))
+        db.session.commit()
+        return {"admin": admin.user_id, "barber": barber.user_id, "client": client.user_id}
+
+
+@pytest.mark.parametrize("query", ["", "?expand=payer", "?shape=normalized", "?format=ndjson"])
+def test_only_admins_list_payments(app, shop, auth, query):
+    client = app.test_client()
+    url = "/api/admin/payments" + query
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=auth(shop["client"], "cliente")).status_code == 403
+    assert client.get(url, headers=auth(shop["barber"], "barbero")).status_code == 403
+    # un token que dice is_admin no basta si el usuario no es admin
+    assert client.get(url, headers=auth(shop["client"], "admin", is_admin=True)).status_code == 403
+
+    response = client.get(url, headers=auth(shop["admin"], "admin", is_admin=True))
+    assert response.status_code == 200
+
+
+def test_admin_sees_the_payer(app, shop, auth):
+    response = app.test_client().get("/api/admin/payments?expand=payer",
+                                     headers=auth(shop["admin"], "admin", is_admin=True))
+    payment, = response.get_json()["data"]
+    assert payment["payer"]["user_id"] == shop["client"]
+
+
+@pytest.mark.parametrize("url", ["/api/admin/payments?shape=normalized",
+                                 "/api/admin/payments/recent?shape=normalized"])
+def test_normalized_users_only_for_admins(app, shop, auth, url):
+    client = app.test_client()
+    for headers in ({}, auth(shop["client"], "cliente"), auth(shop["barber"], "barbero")):
+        response = client.get(url, headers=headers)
+        assert response.status_code in (401, 403)
+        assert "included" not in response.get_json()
+
+    response = client.get(url, headers=auth(shop["admin"], "admin", is_admin=True))
+    users = response.get_json()["included"]["usuarios"]
+    assert set(users) == {str(shop["client"]), str(shop["barber"])}
+    assert users[str(shop["client"])]["email"] == "cliente@test"
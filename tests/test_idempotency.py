@@ -0,0 +1,165 @@
+"""
+Idempotency-Key a nivel de request (POST /api/payments): reserva y
+respuesta guardada, 409 mientras la primera sigue en curso, 422 con otro
+cuerpo, reserva abandonada o clave vencida que se vuelve a tomar, y la
+purga de claves vencidas.
+
+    $ python -m pytest -q tests/test_idempotency.py
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from api import idempotency
+from api.idempotency import IDEMPOTENCY_LEASE, purge_expired
+
+
+@pytest.fixture
+def shop(app, models, fresh_db):
+    db, Usuario = models.db, models.Usuario
+    with app.app_context():
+        barber = Usuario(name="Barbero", email="barbero@test", password="x", role="barbero")
+        client = Usuario(name="Cliente", email="cliente@test", password="x", role="cliente")
+        service = models.Service(name="Corte", price=15, duration_minutes=30)
+        appt = models.Appointment(client=client, barber=barber, service=service,
+                                  appointment_date=datetime(2030, 1, 7, 14, tzinfo=timezone.utc))
+        db.session.add(appt)
+        db.session.commit()
+        return {"barber": barber.user_id, "appointment": appt.appointment_id}
+
+
+@pytest.fixture
+def pay(app, shop, auth):
+    """pay(key, amount) -> response de POST /api/payments con esa Idempotency-Key."""
+    client = app.test_client()
+    headers = auth(shop["barber"], "barbero")
+
+    def post(key, amount=20):
+        return client.post("/api/payments", data=body(shop, amount), content_type="application/json",
+                           headers={**headers, "Idempotency-Key": key})
+    return post
+
+
+def body(shop, amount=20):
+    return json.dumps({"appointment_id": shop["appointment"], "amount": amount})
+
+
+def payments(app, models):
+    with app.app_context():
+        return models.db.session.scalar(select(func.count(models.Payment.payment_id)))
+
+
+def put_key(app, models, shop, key, status="procesando", created_ago=timedelta(0),
+            expires_in=timedelta(hours=1), amount=20):
+    """Reserva escrita a mano, como si otra peticion la hubiera tomado."""
+    now = datetime.now(timezone.utc)
+    with app.app_context():
+        models.db.session.add(models.IdempotencyKey(
+            scope=f"POST /api/payments {shop['barber']}", key=key,
+            fingerprint=hashlib.sha256(body(shop, amount).encode()).hexdigest(),
+            status=status, response_status=201 if status == "listo" else None,
+            response_body='{"ok": true, "data": "guardada"}' if status == "listo" else None,
+            response_mimetype="application/json" if status == "listo" else None,
+            created_at=now - created_ago, expires_at=now + expires_in))
+        models.db.session.commit()
+
+
+def key_status(app, models, key):
+    with app.app_context():
+        return models.db.session.scalar(
+            select(models.IdempotencyKey.status).where(models.IdempotencyKey.key == key))
+
+
+def test_claim_then_replay(app, models, pay):
+    first = pay("k1")
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    assert key_status(app, models, "k1") == "listo"
+
+    again = pay("k1")
+    assert again.status_code == 201
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.get_json() == first.get_json()
+    assert payments(app, models) == 1
+
+    # otra clave es otra peticion
+    assert pay("k2").status_code == 201
+    assert payments(app, models) == 2
+
+
+def test_without_key_is_not_idempotent(app, models, shop, auth):
+    client = app.test_client()
+    headers = auth(shop["barber"], "barbero")
+    for _ in range(2):
+        response = client.post("/api/payments", data=body(shop), content_type="application/json",
+                               headers=headers)
+        assert response.status_code == 201
+    assert payments(app, models) == 2
+
+
+def test_other_body_is_422(app, models, pay):
+    assert pay("k1", amount=20).status_code == 201
+    response = pay("k1", amount=25)
+    assert response.status_code == 422
+    assert payments(app, models) == 1
+
+
+def test_in_flight_is_409(app, models, shop, pay):
+    put_key(app, models, shop, "k1")
+    response = pay("k1")
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+    assert payments(app, models) == 0
+    assert key_status(app, models, "k1") == "procesando"
+
+
+def test_abandoned_claim_is_reclaimed_after_the_lease(app, models, shop, pay):
+    put_key(app, models, shop, "k1", created_ago=IDEMPOTENCY_LEASE + timedelta(seconds=5))
+    response = pay("k1")
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert key_status(app, models, "k1") == "listo"
+    assert payments(app, models) == 1
+    assert pay("k1").headers["Idempotent-Replayed"] == "true"
+
+
+def test_lease_is_read_at_request_time(app, models, shop, pay, monkeypatch):
+    put_key(app, models, shop, "k1", created_ago=timedelta(seconds=30))
+    assert pay("k1").status_code == 409
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEASE", timedelta(seconds=10))
+    assert pay("k1").status_code == 201
+
+
+def test_expired_key_is_a_new_request(app, models, shop, pay):
+    # respuesta guardada pero vencida (aun sin purgar): no se reproduce, y el cuerpo puede cambiar
+    put_key(app, models, shop, "k1", status="listo", created_ago=timedelta(days=2),
+            expires_in=-timedelta(hours=1))
+    response = pay("k1", amount=25)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert response.get_json()["data"]["amount"] == 25
+    assert payments(app, models) == 1
+
+
+def test_stored_response_is_replayed_verbatim(app, models, shop, pay):
+    put_key(app, models, shop, "k1", status="listo")
+    response = pay("k1")
+    assert response.status_code == 201
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.get_json() == {"ok": True, "data": "guardada"}
+    assert payments(app, models) == 0
+
+
+def test_purge_expired(app, models, shop):
+    for i in range(3):
+        put_key(app, models, shop, f"old{i}", status="listo", expires_in=-timedelta(minutes=1))
+    put_key(app, models, shop, "live", status="listo")
+    with app.app_context():
+        assert purge_expired(batch_size=2) == 2
+        assert purge_expired(batch_size=2) == 1
+        assert purge_expired(batch_size=2) == 0
+        keys = models.db.session.scalars(select(models.IdempotencyKey.key)).all()
+    assert keys == ["live"]
@@ -0,0 +1,124 @@
+"""
+Paginacion por cursor (pagination.py) sobre GET /api/admin/appointments:
+el cursor ida y vuelta, empates en la clave de orden, cursores invalidos
+o manipulados -> 400, sin ?limit/?cursor la lista completa de siempre, y
+recorrer todas las paginas sin repetidos ni huecos.
+
+    $ python -m pytest -q tests/test_pagination.py
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.pagination import decode_cursor, encode_cursor
+from api.utils import APIException
+
+START = datetime(2030, 1, 7, 9, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def appointments(app, models, fresh_db):
+    """13 citas repartidas en 4 horas (varias con la misma fecha: empates)."""
+    db, Usuario = models.db, models.Usuario
+    with app.app_context():
+        admin = Usuario(name="Admin", email="admin@test", password="x", role="admin", is_admin=True)
+        barber = Usuario(name="Barbero", email="barbero@test", password="x", role="barbero")
+        client = Usuario(name="Cliente", email="cliente@test", password="x", role="cliente")
+        service = models.Service(name="Corte", price=15, duration_minutes=30)
+        db.session.add_all([models.Appointment(client=client, barber=barber, service=service,
+                                               appointment_date=START + timedelta(hours=i % 4))
+                            for i in range(13)] + [admin])
+        db.session.commit()
+        return admin.user_id
+
+
+@pytest.fixture
+def get(app, appointments, auth):
+    client = app.test_client()
+    headers = auth(appointments, "admin", is_admin=True)
+    return lambda query="": client.get("/api/admin/appointments" + query, headers=headers)
+
+
+def expected_order(response):
+    """(fecha, id) descendentes: el orden de las claves del listado."""
+    return sorted(((a["appointment_date"], a["appointment_id"]) for a in response.get_json()["data"]),
+                  reverse=True)
+
+
+def b64(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_cursor_round_trip(app):
+    values = [START, 42]
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    with app.test_request_context():
+        assert decode_cursor(cursor, 2) == values
+
+
+@pytest.mark.parametrize("cursor", [
+    "%%%",                                          # no es base64
+    b64(b"no es json"),
+    b64(json.dumps([42]).encode()),                 # falta una clave
+    b64(json.dumps([{"dt": "ayer"}, 1]).encode()),  # fecha invalida
+    b64(json.dumps([{"x": 1}, 1]).encode()),
+    b64(json.dumps({"dt": "2030-01-07"}).encode()),
+])
+def test_invalid_cursor_is_400(app, get, cursor):
+    with app.test_request_context(), pytest.raises(APIException) as error:
+        decode_cursor(cursor, 2)
+    assert error.value.status_code == 400
+
+    response = get(f"?cursor={cursor}")
+    assert response.status_code == 400
+    assert response.get_json()["ok"] is False
+
+
+def test_no_limit_returns_the_full_list(get):
+    response = get()
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["data"]) == 13
+    assert body["next_cursor"] is None
+    # mismo orden que las paginas
+    assert [(a["appointment_date"], a["appointment_id"]) for a in body["data"]] == expected_order(response)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 13, 50])
+def test_walk_all_pages(get, limit):
+    full = expected_order(get())
+    seen, cursor, pages = [], None, 0
+    while True:
+        response = get(f"?limit={limit}" + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        body = response.get_json()
+        assert 0 < len(body["data"]) <= limit
+        seen += [(a["appointment_date"], a["appointment_id"]) for a in body["data"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    # sin repetidos ni huecos, en orden
+    assert seen == full
+    assert pages == -(-len(full) // limit)
+
+
+def test_ties_on_the_sort_key_split_across_pages(get):
+    # 3 citas comparten la fecha mas reciente: con limit=2 el cursor corta dentro del empate
+    first = get("?limit=2").get_json()
+    dates = {a["appointment_date"] for a in first["data"]}
+    assert len(dates) == 1
+    second = get(f"?limit=2&cursor={first['next_cursor']}").get_json()
+    tied = second["data"][0]
+    assert tied["appointment_date"] in dates
+    # el desempate es el id (descendente): ni se repite ni se salta la tercera
+    assert tied["appointment_id"] < min(a["appointment_id"] for a in first["data"])
+    assert second["data"][1]["appointment_date"] < tied["appointment_date"]
+
+
+def test_limit_is_clamped(get):
+    assert len(get("?limit=0").get_json()["data"]) == 1
+    assert len(get("?limit=100000").get_json()["data"]) == 13
@@ -0,0 +1,70 @@
+"""
+Las listas de citas no deben hacer una consulta por fila (N+1): con 1 y con
+50 citas (cada una con su cliente, barbero y servicio) el numero de
+consultas por request tiene que ser el mismo.
+
+    $ python -m pytest -q tests
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+
+def seed(app, models, n):
+    """Base nueva con un admin y n citas de un mismo cliente, cada una con otro barbero y servicio."""
+    from api.cache import invalidate
+    invalidate("auth")  # los ids se repiten entre una base y la siguiente
+    db, Usuario = models.db, models.Usuario
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = Usuario(name="Admin", email="admin@test", password="x", role="admin", is_admin=True)
+        client = Usuario(name="Cliente", email="cliente@test", password="x", role="cliente")
+        db.session.add_all([admin, client])
+        start = datetime(2030, 1, 7, 9, tzinfo=timezone.utc)
+        for i in range(n):
+            barber = Usuario(name=f"Barbero {i}", email=f"barbero{i}@test", password="x", role="barbero")
+            service = models.Service(name=f"Servicio {i}", price=10 + i, duration_minutes=30)
+            db.session.add(models.Appointment(client=client, barber=barber, service=service,
+                                              appointment_date=start + timedelta(hours=i)))
+        db.session.commit()
+        return admin.user_id, client.user_id
+
+
+def count_queries(app, models, url, headers):
+    """Consultas que hace un GET (despues de uno de calentamiento) y el numero de filas devueltas."""
+    client = app.test_client()
+    client.get(url, headers=headers)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = models.db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.get_json()
+    return len(statements), len(response.get_json()["data"])
+
+
+@pytest.mark.parametrize("url, as_admin", [
+    ("/api/appointments/mine", False),
+    ("/api/appointments/mine?shape=normalized", False),
+    ("/api/admin/appointments", True),
+    ("/api/admin/appointments?shape=normalized", True),
+    ("/api/admin/appointments?expand=client,barber,service", True),
+])
+def test_appointment_lists_do_not_query_per_row(app, models, auth, url, as_admin):
+    counts = {}
+    for n in (1, 50):
+        admin_id, client_id = seed(app, models, n)
+        headers = (auth(admin_id, "admin", is_admin=True) if as_admin
+                   else auth(client_id, "cliente"))
+        counts[n], rows = count_queries(app, models, url, headers)
+        assert rows == n
+    assert counts[1] == counts[50]
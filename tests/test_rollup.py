@@ -0,0 +1,167 @@
+"""
+daily_sales_rollup se mantiene en cada flush: despues de cada cambio de
+pagos (API, webhook, cambio de barbero, pago que cruza la medianoche de la
+barberia) los reportes leidos del rollup tienen que ser iguales a los
+calculados sobre payments, y la tabla igual a la de rebuild_rollup.
+
+    $ python -m pytest -q tests/test_rollup.py
+"""
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from api import routes, sales
+from api.rollup import rebuild_rollup
+
+# sin horario de verano desde 2016: el dia SQL de aggregate_sales es exacto
+SHOP_TZ = "America/Caracas"
+DAY_FROM, DAY_TO = date(2020, 1, 1), date(2035, 12, 31)
+
+
+@pytest.fixture
+def shop(app, models, fresh_db, monkeypatch):
+    monkeypatch.setattr(sales, "SHOP_TIMEZONE", SHOP_TZ)
+    db, Usuario = models.db, models.Usuario
+    with app.app_context():
+        admin = Usuario(name="Admin", email="admin@test", password="x", role="admin", is_admin=True)
+        barber = Usuario(name="Barbero", email="barbero@test", password="x", role="barbero")
+        other = Usuario(name="Otro", email="otro@test", password="x", role="barbero")
+        client = Usuario(name="Cliente", email="cliente@test", password="x", role="cliente")
+        service = models.Service(name="Corte", price=15, duration_minutes=30)
+        appt = models.Appointment(client=client, barber=barber, service=service,
+                                  appointment_date=datetime(2030, 1, 7, 14, tzinfo=timezone.utc))
+        db.session.add_all([admin, other, appt])
+        db.session.commit()
+        return {"admin": admin.user_id, "barber": barber.user_id, "other": other.user_id,
+                "client": client.user_id, "appointment": appt.appointment_id}
+
+
+def rollup_table(models):
+    rollup = models.DailySalesRollup
+    rows = models.db.session.execute(select(rollup).where(rollup.count != 0)).scalars()
+    return {(r.day, r.barber_id, r.method, r.status): (r.count, r.total) for r in rows}
+
+
+def assert_rollup_matches(app, models):
+    """Cada group_by igual desde el rollup y desde payments; la tabla igual a un rebuild."""
+    with app.app_context():
+        zone = sales.shop_zone()
+        start, end = sales.local_day_bounds(DAY_FROM, DAY_TO, zone)
+        for group_by in sales.GROUP_BY_CHOICES:
+            assert (sales.aggregate_rollup(DAY_FROM, DAY_TO, group_by)
+                    == sales.aggregate_sales(start, end, group_by, zone)), group_by
+        incremental = rollup_table(models)
+        rebuild_rollup()
+        assert rollup_table(models) == incremental
+        return incremental
+
+
+def add_payment(app, models, shop, paid_at, amount=20, appointment=True):
+    with app.app_context():
+        payment = models.Payment(
+            appointment_id=shop["appointment"] if appointment else None,
+            amount=amount, method="efectivo", status="pagado", paid_at=paid_at,
+            created_by_user_id=shop["admin"], payer_user_id=shop["client"])
+        models.db.session.add(payment)
+        models.db.session.commit()
+        return payment.payment_id
+
+
+def test_create_payment_via_api(app, models, shop, auth):
+    client = app.test_client()
+    headers = auth(shop["barber"], "barbero")
+    for amount in (None, 12.5):
+        body = {"appointment_id": shop["appointment"]}
+        if amount is not None:
+            body["amount"] = amount
+        response = client.post("/api/payments", json=body, headers=headers)
+        assert response.status_code == 201, response.get_json()
+        assert_rollup_matches(app, models)
+
+    with app.app_context():
+        (count, total), = rollup_table(models).values()
+    assert (count, total) == (2, 27.5)
+
+
+def test_webhook_payment(app, models, shop, monkeypatch):
+    from api.webhooks import process_webhook_events
+    monkeypatch.setattr(routes, "STRIPE_WEBHOOK_SECRET", "whsec_test")
+    monkeypatch.setattr(routes.stripe.Webhook, "construct_event",
+                        lambda payload, sig_header, secret: json.loads(payload))
+    event = {"id": "evt_1", "type": "checkout.session.completed", "data": {"object": {
+        "id": "cs_1", "metadata": {"kind": "appointment", "appointment_id": str(shop["appointment"]),
+                                   "amount": "15.00", "payer_user_id": str(shop["client"]),
+                                   "barber_id": str(shop["barber"])}}}}
+
+    client = app.test_client()
+    # Stripe reintenta: el mismo evento dos veces no cuenta doble
+    for _ in range(2):
+        response = client.post("/api/stripe/webhook", data=json.dumps(event),
+                               headers={"Stripe-Signature": "t=1,v1=x"})
+        assert response.status_code == 200
+    with app.app_context():
+        assert process_webhook_events() == 1
+
+    table = assert_rollup_matches(app, models)
+    assert [(key[1], key[2], value) for key, value in table.items()] == [
+        (shop["barber"], "stripe", (1, 15))]
+
+
+def test_barber_reassignment_moves_payments(app, models, shop):
+    add_payment(app, models, shop, datetime(2030, 1, 7, 15, tzinfo=timezone.utc))
+    add_payment(app, models, shop, datetime(2030, 1, 7, 16, tzinfo=timezone.utc), amount=5)
+    assert {key[1] for key in assert_rollup_matches(app, models)} == {shop["barber"]}
+
+    with app.app_context():
+        appt = models.db.session.get(models.Appointment, shop["appointment"])
+        appt.barber_id = shop["other"]
+        models.db.session.commit()
+    table = assert_rollup_matches(app, models)
+    assert [(key[1], value) for key, value in table.items()] == [(shop["other"], (2, 25))]
+
+    # cambio de barbero y de un pago en el mismo flush
+    with app.app_context():
+        appt = models.db.session.get(models.Appointment, shop["appointment"])
+        payment = models.db.session.scalars(select(models.Payment).limit(1)).one()
+        appt.barber_id = shop["barber"]
+        payment.amount = 30
+        models.db.session.commit()
+    assert {key[1] for key in assert_rollup_matches(app, models)} == {shop["barber"]}
+
+
+def test_payment_crossing_shop_midnight(app, models, shop):
+    # 03:30 UTC del 8 = 23:30 del 7 en Caracas
+    payment_id = add_payment(app, models, shop, datetime(2030, 1, 8, 3, 30, tzinfo=timezone.utc))
+    add_payment(app, models, shop, datetime(2030, 1, 8, 3, 59, tzinfo=timezone.utc),
+                amount=7, appointment=False)
+    table = assert_rollup_matches(app, models)
+    assert {key[0] for key in table} == {date(2030, 1, 7)}
+
+    # pasa a las 00:30 del 8 (hora local): cambia de fila
+    with app.app_context():
+        payment = models.db.session.get(models.Payment, payment_id)
+        payment.paid_at = datetime(2030, 1, 8, 4, 30, tzinfo=timezone.utc)
+        models.db.session.commit()
+    table = assert_rollup_matches(app, models)
+    assert sorted((key[0], key[1], value) for key, value in table.items()) == [
+        (date(2030, 1, 7), 0, (1, 7)), (date(2030, 1, 8), shop["barber"], (1, 20))]
+
+    with app.app_context():
+        models.db.session.delete(models.db.session.get(models.Payment, payment_id))
+        models.db.session.commit()
+    assert {key[0] for key in assert_rollup_matches(app, models)} == {date(2030, 1, 7)}
+
+
+def test_rebuild_matches_incremental(app, models, shop):
+    for hour in range(0, 24, 5):
+        add_payment(app, models, shop, datetime(2030, 1, 9, hour, tzinfo=timezone.utc),
+                    amount=hour + 1, appointment=hour % 2 == 0)
+    with app.app_context():
+        incremental = rollup_table(models)
+        models.db.session.execute(models.DailySalesRollup.__table__.delete())
+        models.db.session.commit()
+        assert rollup_table(models) == {}
+        rebuild_rollup()
+        assert rollup_table(models) == incremental